@@ -0,0 +1,23 @@
+# ARCHIVO: benchmarks/__init__.py
+"""Benchmarks reproducibles de TechFlow.
+
+Siembra catálogos sintéticos de distintos tamaños, recorre todas las rutas
+con el test client de Flask y con un servidor HTTP real (`main.py serve`),
+y guarda throughput y percentiles en JSON para compararlos contra una
+línea base:
+
+    python -m benchmarks run --sizes 10,1000,100000 --out resultados.json
+    python -m benchmarks run --sizes 10,1000 --baseline resultados.json
+    python -m benchmarks compare base.json nuevo.json
+
+`reservas` lanza cientos de reservas simultáneas contra un servicio en
+promoción y comprueba que el stock nunca queda negativo:
+
+    python -m benchmarks reservas --stock 500 --requests 2000 --concurrency 200
+
+`conexiones` retiene cientos de conexiones ociosas o con la cabecera a
+medias contra un solo worker (con hilos y con `serve --async`) y mide si
+sigue atendiendo peticiones nuevas:
+
+    python -m benchmarks conexiones --connections 8,64,512,2048
+"""
@@ -0,0 +1,249 @@
+# ARCHIVO: benchmarks/__main__.py
+"""CLI: python -m benchmarks {run,compare,reservas,conexiones}"""
+import argparse
+import contextlib
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from . import catalogo, conexiones, escenarios, reporte, reservas
+
+
+# Los escenarios inician sesión cientos de veces por minuto desde la misma
+# IP: se desactiva el limitador de intentos de login (no el costo del KDF)
+ENTORNO = {'TECHFLOW_LOGIN_MAX_PER_USER': '0', 'TECHFLOW_LOGIN_MAX_PER_IP': '0'}
+
+
+def puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def medir_rutas(driver, tamano, modo, args, ruta_db):
+    resultados = []
+    # Un modo anterior sobre la misma base ya avanzó el contador AUTOINCREMENT
+    primer_id = catalogo.siguiente_id(ruta_db)
+    for ruta, metodo, generar, con_sesion in escenarios.escenarios(tamano, primer_id):
+        if args.routes and ruta not in args.routes:
+            continue
+        # Calentamiento: llena pools, cachés y el page cache de SQLite
+        escenarios.medir(driver, metodo, generar, con_sesion, min(args.warmup, args.requests), 1)
+        latencias, errores, duracion = escenarios.medir(
+            driver, metodo, generar, con_sesion, args.requests, args.concurrency)
+        resultados.append(reporte.resumir(tamano, modo, ruta, latencias, errores, duracion))
+    return resultados
+
+
+def ejecutar_cliente(args):
+    """Subproceso: mide con el test client contra la base de TECHFLOW_DB"""
+    sys.path.insert(0, catalogo.RAIZ)
+    import main
+    resultados = medir_rutas(escenarios.ClienteFlask(main.app), args.size, 'client', args, main.DATABASE)
+    json.dump(resultados, sys.stdout)
+
+
+@contextlib.contextmanager
+def servidor_http(ruta_db, args, **extra):
+    """Arranca `main.py serve` sobre `ruta_db` y entrega un ClienteHTTP listo.
+
+    `extra` son variables de entorno adicionales para el servidor; el
+    Popen queda en cliente.servidor.
+    """
+    puerto = puerto_libre()
+    entorno = dict(os.environ, **ENTORNO, TECHFLOW_DB=ruta_db, TECHFLOW_HOST='127.0.0.1',
+                   TECHFLOW_PORT=str(puerto), TECHFLOW_WORKERS=str(args.workers),
+                   TECHFLOW_THREADS=str(args.threads), **extra)
+    entorno.pop('TECHFLOW_METRICS_DIR', None)
+    servidor = subprocess.Popen([sys.executable, 'main.py', 'serve'], cwd=catalogo.RAIZ, env=entorno,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        limite = time.monotonic() + 30
+        while True:
+            try:
+                socket.create_connection(('127.0.0.1', puerto), timeout=1).close()
+                break
+            except OSError:
+                if time.monotonic() > limite or servidor.poll() is not None:
+                    raise RuntimeError('El servidor HTTP no arrancó')
+                time.sleep(0.1)
+        cliente = escenarios.ClienteHTTP('127.0.0.1', puerto)
+        cliente.servidor = servidor
+        yield cliente
+    finally:
+        servidor.terminate()
+        servidor.wait()
+
+
+def medir_http(ruta_db, tamano, args):
+    with servidor_http(ruta_db, args) as cliente:
+        return medir_rutas(cliente, tamano, 'http', args, ruta_db)
+
+
+def ejecutar(args):
+    tamanos = [int(t) for t in args.sizes.split(',')]
+    modos = args.modes.split(',')
+    directorio = args.workdir or tempfile.mkdtemp(prefix='techflow-bench-')
+    resultados = []
+    for tamano in tamanos:
+        ruta_db = os.path.join(directorio, 'catalogo_%d.db' % tamano)
+        inicio = time.perf_counter()
+        catalogo.sembrar(ruta_db, tamano)
+        print('🌱 Catálogo de %d servicios sembrado en %.1f s' % (tamano, time.perf_counter() - inicio),
+              file=sys.stderr)
+        if 'client' in modos:
+            comando = [sys.executable, '-m', 'benchmarks', '_cliente', '--size', str(tamano)] + args.reenviar
+            salida = subprocess.run(comando, cwd=catalogo.RAIZ, env=dict(os.environ, **ENTORNO, TECHFLOW_DB=ruta_db),
+                                    capture_output=True, text=True, check=True).stdout
+            resultados += json.loads(salida)
+        if 'http' in modos:
+            resultados += medir_http(ruta_db, tamano, args)
+
+    reporte.imprimir_tabla(resultados)
+    meta = reporte.metadatos({k: v for k, v in vars(args).items() if k not in ('func', 'reenviar')})
+    if args.out:
+        reporte.guardar(args.out, meta, resultados)
+        print('💾 Resultados guardados en %s' % args.out)
+    if args.baseline:
+        regresiones = reporte.comparar(reporte.cargar(args.baseline), {'resultados': resultados}, args.threshold)
+        reporte.imprimir_regresiones(regresiones, args.threshold)
+        return 1 if regresiones else 0
+    return 0
+
+
+def comparar(args):
+    regresiones = reporte.comparar(reporte.cargar(args.base), reporte.cargar(args.nuevo), args.threshold)
+    reporte.imprimir_regresiones(regresiones, args.threshold)
+    return 1 if regresiones else 0
+
+
+def estresar_reservas(args):
+    ruta_db = os.path.join(args.workdir or tempfile.mkdtemp(prefix='techflow-bench-'), 'reservas.db')
+    catalogo.sembrar(ruta_db, args.size)
+    servicio_id = reservas.preparar(ruta_db, args.stock)
+    if args.mode == 'http':
+        with servidor_http(ruta_db, args) as cliente:
+            conteo, duracion = reservas.estresar(cliente, servicio_id, args.requests, args.concurrency)
+    else:
+        comando = [sys.executable, '-m', 'benchmarks', '_reservas', '--servicio', str(servicio_id),
+                   '--requests', str(args.requests), '--concurrency', str(args.concurrency)]
+        salida = subprocess.run(comando, cwd=catalogo.RAIZ, env=dict(os.environ, TECHFLOW_DB=ruta_db),
+                                capture_output=True, text=True, check=True).stdout
+        conteo, duracion = json.loads(salida)
+    fallas = reservas.verificar(ruta_db, servicio_id, args.stock, conteo)
+    reservas.imprimir(conteo, duracion, args.stock, fallas)
+    return 1 if fallas else 0
+
+
+def ejecutar_reservas_cliente(args):
+    """Subproceso: estresa reservas con el test client contra la base de TECHFLOW_DB"""
+    sys.path.insert(0, catalogo.RAIZ)
+    import main
+    json.dump(reservas.estresar(escenarios.ClienteFlask(main.app), args.servicio, args.requests,
+                                args.concurrency), sys.stdout)
+
+
+def medir_conexiones(args):
+    # Cada conexión retenida es un descriptor en el cliente y en el servidor (que lo hereda)
+    _, duro = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (duro, duro))
+    ruta_db = os.path.join(args.workdir or tempfile.mkdtemp(prefix='techflow-bench-'), 'conexiones.db')
+    catalogo.sembrar(ruta_db, args.size)
+    args.workers = 1
+    resultados = []
+    for modo in args.modes.split(','):
+        # Keep-alive largo en ambos modos para que ninguno cierre las ociosas durante la medición
+        extra = {'TECHFLOW_ASYNC': '1' if modo == 'async' else '0', 'TECHFLOW_KEEPALIVE_TIMEOUT': '120'}
+        with servidor_http(ruta_db, args, **extra) as cliente:
+            for cantidad in (int(c) for c in args.connections.split(',')):
+                for tipo in ('ociosas', 'lentas'):
+                    resultados.append(conexiones.medir(cliente.puerto, cliente.servidor.pid, modo, tipo,
+                                                       cantidad, args.probes, args.timeout))
+    conexiones.imprimir(resultados)
+    if args.out:
+        reporte.guardar(args.out, reporte.metadatos({k: v for k, v in vars(args).items() if k != 'func'}),
+                        resultados)
+        print('💾 Resultados guardados en %s' % args.out)
+    return 0
+
+
+def opciones_de_carga(parser):
+    parser.add_argument('--requests', type=int, default=200, help='peticiones medidas por ruta')
+    parser.add_argument('--concurrency', type=int, default=4, help='hilos cliente simultáneos')
+    parser.add_argument('--warmup', type=int, default=10, help='peticiones de calentamiento por ruta')
+    parser.add_argument('--routes', type=lambda s: s.split(','), default=None,
+                        help='limitar a estas rutas (separadas por comas)')
+
+
+def cli(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Benchmarks de TechFlow')
+    comandos = parser.add_subparsers(dest='comando', required=True)
+
+    run = comandos.add_parser('run', help='sembrar catálogos y medir todas las rutas')
+    run.add_argument('--sizes', default='10,1000,100000', help='tamaños de catálogo, p. ej. 10,1000,1000000')
+    run.add_argument('--modes', default='client,http', help='client (test client), http (servidor real) o ambos')
+    run.add_argument('--workers', type=int, default=2, help='workers del servidor HTTP')
+    run.add_argument('--threads', type=int, default=8, help='hilos por worker del servidor HTTP')
+    run.add_argument('--workdir', help='directorio para las bases sembradas (por defecto, temporal)')
+    run.add_argument('--out', help='guardar resultados en este JSON')
+    run.add_argument('--baseline', help='JSON de una corrida anterior para detectar regresiones')
+    run.add_argument('--threshold', type=float, default=0.15, help='tolerancia relativa (0.15 = 15%%)')
+    opciones_de_carga(run)
+    run.set_defaults(func=ejecutar)
+
+    comp = comandos.add_parser('compare', help='comparar dos archivos de resultados')
+    comp.add_argument('base')
+    comp.add_argument('nuevo')
+    comp.add_argument('--threshold', type=float, default=0.15)
+    comp.set_defaults(func=comparar)
+
+    res = comandos.add_parser('reservas', help='estresar reservas concurrentes sobre un servicio en promoción')
+    res.add_argument('--size', type=int, default=100, help='servicios del catálogo sembrado')
+    res.add_argument('--stock', type=int, default=500, help='stock inicial del servicio estresado')
+    res.add_argument('--requests', type=int, default=2000, help='reservas intentadas (de 1 unidad)')
+    res.add_argument('--concurrency', type=int, default=200, help='clientes simultáneos')
+    res.add_argument('--mode', choices=('http', 'client'), default='http')
+    res.add_argument('--workers', type=int, default=2, help='workers del servidor HTTP')
+    res.add_argument('--threads', type=int, default=64, help='hilos por worker del servidor HTTP')
+    res.add_argument('--workdir', help='directorio para la base sembrada (por defecto, temporal)')
+    res.set_defaults(func=estresar_reservas)
+
+    con = comandos.add_parser('conexiones', help='conexiones ociosas y lentas que retiene un worker, con hilos y con asyncio')
+    con.add_argument('--connections', default='8,64,512,2048', help='conexiones retenidas por medición')
+    con.add_argument('--modes', default='threads,async', help='threads (un hilo por conexión), async o ambos')
+    con.add_argument('--threads', type=int, default=8, help='hilos del worker')
+    con.add_argument('--probes', type=int, default=10, help='peticiones medidas mientras se retienen las conexiones')
+    con.add_argument('--timeout', type=float, default=2.0, help='segundos antes de dar una sonda por fallida')
+    con.add_argument('--size', type=int, default=1000, help='servicios del catálogo sembrado')
+    con.add_argument('--workdir', help='directorio para la base sembrada (por defecto, temporal)')
+    con.add_argument('--out', help='guardar resultados en este JSON')
+    con.set_defaults(func=medir_conexiones)
+
+    res_cliente = comandos.add_parser('_reservas', help=argparse.SUPPRESS)
+    res_cliente.add_argument('--servicio', type=int, required=True)
+    res_cliente.add_argument('--requests', type=int, required=True)
+    res_cliente.add_argument('--concurrency', type=int, required=True)
+    res_cliente.set_defaults(func=ejecutar_reservas_cliente)
+
+    cliente = comandos.add_parser('_cliente', help=argparse.SUPPRESS)
+    cliente.add_argument('--size', type=int, required=True)
+    opciones_de_carga(cliente)
+    cliente.set_defaults(func=ejecutar_cliente)
+
+    args = parser.parse_args(argv)
+    if args.comando == 'run':
+        # Las opciones de carga se reenvían tal cual al subproceso del test client
+        args.reenviar = ['--requests', str(args.requests), '--concurrency', str(args.concurrency),
+                         '--warmup', str(args.warmup)]
+        if args.routes:
+            args.reenviar += ['--routes', ','.join(args.routes)]
+    return args.func(args) or 0
+
+
+if __name__ == '__main__':
+    sys.exit(cli())
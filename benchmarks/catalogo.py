@@ -0,0 +1,67 @@
+# ARCHIVO: benchmarks/catalogo.py
+"""Siembra de catálogos sintéticos en un archivo techflow.db aislado"""
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ICONOS = ['💻', '📱', '☁️', '🔐', '🤖', '🎨', '📊', '🔧', '🌐', '📈']
+PALABRAS = ['Desarrollo', 'Cloud', 'Seguridad', 'Datos', 'Consultoría', 'Soporte',
+            'Diseño', 'Migración', 'Analítica', 'Automatización', 'Integración', 'Auditoría']
+
+
+def servicios_sinteticos(cantidad, semilla=42):
+    """Genera filas (nombre, descripcion, precio, stock, promocion, icono) reproducibles"""
+    aleatorio = random.Random(semilla)
+    for i in range(cantidad):
+        palabras = aleatorio.sample(PALABRAS, 3)
+        yield (
+            'Servicio %07d %s' % (i, palabras[0]),
+            'Servicio de %s, %s y %s para empresas' % tuple(p.lower() for p in palabras),
+            aleatorio.randrange(500000, 9000000, 50000),
+            aleatorio.randrange(0, 40),
+            1 if aleatorio.random() < 0.2 else 0,
+            aleatorio.choice(ICONOS),
+        )
+
+
+def sembrar(ruta, cantidad, lote=50000):
+    """Crea (o recrea) la base en `ruta` con el esquema de main.py y `cantidad` servicios.
+
+    El esquema se crea en un subproceso con TECHFLOW_DB apuntando a `ruta`
+    para usar exactamente las migraciones de main.init_db().
+    """
+    for sufijo in ('', '-wal', '-shm'):
+        if os.path.exists(ruta + sufijo):
+            os.remove(ruta + sufijo)
+    entorno = dict(os.environ, TECHFLOW_DB=ruta)
+    subprocess.run([sys.executable, '-c', 'import main; main.init_db()'],
+                   cwd=RAIZ, env=entorno, check=True, stdout=subprocess.DEVNULL)
+
+    conn = sqlite3.connect(ruta)
+    # Vaciar también el contador AUTOINCREMENT: los ids sintéticos son 1..cantidad
+    conn.execute('DELETE FROM servicios')
+    conn.execute("DELETE FROM sqlite_sequence WHERE name = 'servicios'")
+    filas = servicios_sinteticos(cantidad)
+    while True:
+        bloque = [f for _, f in zip(range(lote), filas)]
+        if not bloque:
+            break
+        conn.executemany('''INSERT INTO servicios (nombre, descripcion, precio, stock, promocion, icono)
+                            VALUES (?, ?, ?, ?, ?, ?)''', bloque)
+        conn.commit()
+    conn.execute('ANALYZE')
+    conn.commit()
+    conn.close()
+
+
+def siguiente_id(ruta):
+    """Id que recibirá el próximo servicio insertado en la base de `ruta`"""
+    conn = sqlite3.connect(ruta)
+    try:
+        fila = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'servicios'").fetchone()
+    finally:
+        conn.close()
+    return (fila[0] if fila else 0) + 1
@@ -0,0 +1,108 @@
+# ARCHIVO: benchmarks/conexiones.py
+"""Conexiones ociosas y lentas: cuántas retiene un proceso sin dejar de atender"""
+import os
+import socket
+import time
+
+from .reporte import percentil
+
+# Petición que se mide mientras las demás conexiones siguen abiertas
+SONDA = b'GET /api/servicios?limit=20 HTTP/1.1\r\nHost: bench\r\nConnection: close\r\n\r\n'
+# Una conexión lenta manda la cabecera a medias y no la termina nunca
+CABECERA_LENTA = b'GET /api/servicios HTTP/1.1\r\nHost: bench\r\nX-Lento: '
+
+
+def abrir(puerto, cantidad, tipo):
+    """Abre `cantidad` conexiones: 'ociosas' no envían nada, 'lentas' una cabecera incompleta"""
+    conexiones = []
+    for _ in range(cantidad):
+        s = socket.create_connection(('127.0.0.1', puerto), timeout=5)
+        if tipo == 'lentas':
+            s.sendall(CABECERA_LENTA)
+        conexiones.append(s)
+    return conexiones
+
+
+def sondear(puerto, cantidad, timeout):
+    """`cantidad` peticiones en conexiones nuevas, una tras otra; devuelve (latencias_s, fallidas)"""
+    latencias = []
+    fallidas = 0
+    for _ in range(cantidad):
+        inicio = time.perf_counter()
+        try:
+            with socket.create_connection(('127.0.0.1', puerto), timeout=timeout) as s:
+                s.sendall(SONDA)
+                respuesta = b''
+                while True:
+                    parte = s.recv(65536)
+                    if not parte:
+                        break
+                    respuesta += parte
+            if not respuesta.startswith(b'HTTP/1.1 200'):
+                raise OSError('respuesta inesperada')
+            latencias.append(time.perf_counter() - inicio)
+        except OSError:
+            fallidas += 1
+    return latencias, fallidas
+
+
+def abiertas(conexiones):
+    """Cuántas conexiones no cerró el servidor"""
+    vivas = 0
+    for s in conexiones:
+        try:
+            s.setblocking(False)
+            if s.recv(1, socket.MSG_PEEK):
+                vivas += 1
+        except BlockingIOError:
+            vivas += 1  # sin datos y sin EOF: sigue abierta
+        except OSError:
+            pass
+    return vivas
+
+
+def memoria_workers(pid_maestro):
+    """RSS total (KB) de los workers hijos de `pid_maestro`, leído de /proc"""
+    total = 0
+    for nombre in os.listdir('/proc'):
+        if not nombre.isdigit():
+            continue
+        try:
+            with open('/proc/%s/status' % nombre) as f:
+                campos = dict(linea.split(':', 1) for linea in f if ':' in linea)
+        except OSError:
+            continue
+        if int(campos.get('PPid', 0)) == pid_maestro:
+            total += int(campos.get('VmRSS', '0 kB').split()[0])
+    return total
+
+
+def medir(puerto, pid_maestro, modo, tipo, cantidad, sondas, timeout):
+    conexiones = abrir(puerto, cantidad, tipo)
+    try:
+        time.sleep(0.5)  # que el servidor termine de aceptarlas
+        latencias, fallidas = sondear(puerto, sondas, timeout)
+        ordenadas = sorted(latencias)
+        return {
+            'mode': modo,
+            'kind': tipo,
+            'connections': cantidad,
+            'still_open': abiertas(conexiones),
+            'probes': sondas,
+            'probe_failures': fallidas,
+            'probe_p50_ms': round(percentil(ordenadas, 50) * 1000, 2),
+            'probe_max_ms': round(ordenadas[-1] * 1000, 2) if ordenadas else 0.0,
+            'worker_rss_kb': memoria_workers(pid_maestro),
+        }
+    finally:
+        for s in conexiones:
+            s.close()
+
+
+def imprimir(resultados):
+    print('%-7s %-8s %8s %8s %12s %9s %9s %10s' %
+          ('modo', 'tipo', 'conex.', 'abiertas', 'sondas ok', 'p50 ms', 'máx ms', 'RSS MB'))
+    for r in resultados:
+        print('%-7s %-8s %8d %8d %8d/%-3d %9.2f %9.2f %10.1f' %
+              (r['mode'], r['kind'], r['connections'], r['still_open'], r['probes'] - r['probe_failures'],
+               r['probes'], r['probe_p50_ms'], r['probe_max_ms'], r['worker_rss_kb'] / 1024))
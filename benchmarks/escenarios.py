@@ -0,0 +1,136 @@
+# ARCHIVO: benchmarks/escenarios.py
+"""Rutas a medir y los dos clientes que las recorren (test client y HTTP real)"""
+import http.client
+import itertools
+import random
+import threading
+import time
+from urllib.parse import urlencode
+
+CREDENCIALES = {'username': 'admin', 'password': 'admin123'}
+
+
+def escenarios(tamano, primer_id=None, semilla=7):
+    """Lista ordenada de (nombre, método, generador de (ruta, datos), requiere sesión).
+
+    El orden importa: admin_agregar crea filas con ids primer_id,
+    primer_id+1... (por defecto tamano+1) que admin_eliminar borra después,
+    así el catálogo vuelve a su tamaño. detalle asume ids 1..tamano, como
+    los deja catalogo.sembrar().
+    """
+    aleatorio = random.Random(semilla)
+    nombres = itertools.count()
+    agregados = itertools.count(primer_id or tamano + 1)
+    maximo = max(tamano, 1)
+    return [
+        ('home', 'GET', lambda: ('/', None), False),
+        ('servicios', 'GET', lambda: ('/servicios', None), False),
+        ('detalle', 'GET', lambda: ('/detalle/%d' % aleatorio.randint(1, maximo), None), False),
+        ('api_servicios', 'GET', lambda: ('/api/servicios', None), False),
+        ('api_servicios_precio', 'GET', lambda: ('/api/servicios?sort=-precio&limit=50&promocion=1', None), False),
+        ('login', 'POST', lambda: ('/login', CREDENCIALES), False),
+        ('admin', 'GET', lambda: ('/admin', None), True),
+        ('admin_agregar', 'POST', lambda: ('/admin/agregar', {
+            'nombre': 'Bench %d' % next(nombres), 'descripcion': 'Creado por el benchmark',
+            'precio': '1000000', 'stock': '5', 'icono': '🔧'}), True),
+        ('admin_eliminar', 'GET', lambda: ('/admin/eliminar/%d' % next(agregados), None), True),
+    ]
+
+
+class ClienteFlask:
+    """Driver en proceso con el test client de Flask (uno por hilo)"""
+
+    def __init__(self, app):
+        self.app = app
+        self.local = threading.local()
+
+    def _cliente(self, con_sesion):
+        # Un cliente con sesión y otro anónimo por hilo, como las cookies de ClienteHTTP
+        clave = 'con_sesion' if con_sesion else 'anonimo'
+        cliente = getattr(self.local, clave, None)
+        if cliente is None:
+            cliente = self.app.test_client()
+            setattr(self.local, clave, cliente)
+            if con_sesion:
+                cliente.post('/login', data=CREDENCIALES)
+        return cliente
+
+    def pedir(self, metodo, ruta, datos, con_sesion):
+        respuesta = self._cliente(con_sesion).open(ruta, method=metodo, data=datos)
+        # Consumir el cuerpo completo, también en respuestas en streaming
+        for _ in respuesta.iter_encoded():
+            pass
+        respuesta.close()
+        return respuesta.status_code
+
+
+class ClienteHTTP:
+    """Driver contra un servidor real; una conexión keep-alive por hilo"""
+
+    def __init__(self, host, puerto):
+        self.host = host
+        self.puerto = puerto
+        self.local = threading.local()
+
+    def _conexion(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.local.conn = http.client.HTTPConnection(self.host, self.puerto, timeout=120)
+            conn.request('POST', '/login', body=urlencode(CREDENCIALES),
+                         headers={'Content-Type': 'application/x-www-form-urlencoded'})
+            respuesta = conn.getresponse()
+            respuesta.read()
+            cookie = respuesta.getheader('Set-Cookie', '')
+            self.local.cookie = cookie.split(';', 1)[0]
+        return conn
+
+    def pedir(self, metodo, ruta, datos, con_sesion):
+        conn = self._conexion()
+        cabeceras = {'Cookie': self.local.cookie} if con_sesion else {}
+        cuerpo = None
+        if datos is not None:
+            cuerpo = urlencode(datos)
+            cabeceras['Content-Type'] = 'application/x-www-form-urlencoded'
+        try:
+            conn.request(metodo, ruta, body=cuerpo, headers=cabeceras)
+            respuesta = conn.getresponse()
+            respuesta.read()
+        except (http.client.HTTPException, OSError):
+            conn.close()
+            self.local.conn = None
+            raise
+        return respuesta.status
+
+
+def medir(driver, metodo, generar, con_sesion, peticiones, concurrencia):
+    """Ejecuta `peticiones` repartidas en `concurrencia` hilos; devuelve (latencias_s, errores, duracion_s)"""
+    latencias = []
+    errores = [0]
+    lock = threading.Lock()
+    pendientes = itertools.count()
+
+    def trabajador():
+        propias = []
+        fallos = 0
+        while next(pendientes) < peticiones:
+            with lock:
+                ruta, datos = generar()
+            inicio = time.perf_counter()
+            try:
+                estado = driver.pedir(metodo, ruta, datos, con_sesion)
+                if estado >= 400:
+                    fallos += 1
+            except Exception:
+                fallos += 1
+            propias.append(time.perf_counter() - inicio)
+        with lock:
+            latencias.extend(propias)
+            errores[0] += fallos
+
+    hilos = [threading.Thread(target=trabajador) for _ in range(concurrencia)]
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    return latencias, errores[0], time.perf_counter() - inicio
@@ -0,0 +1,94 @@
+# ARCHIVO: benchmarks/reporte.py
+"""Percentiles, archivo de resultados JSON y comparación contra una línea base"""
+import json
+import platform
+import sqlite3
+import subprocess
+from datetime import datetime, timezone
+
+
+def percentil(ordenadas, p):
+    """Percentil por el método del rango más cercano sobre una lista ordenada"""
+    if not ordenadas:
+        return 0.0
+    indice = max(0, min(len(ordenadas) - 1, int(round(p / 100 * len(ordenadas) + 0.5)) - 1))
+    return ordenadas[indice]
+
+
+def resumir(tamano, modo, ruta, latencias, errores, duracion):
+    ordenadas = sorted(latencias)
+    ms = lambda s: round(s * 1000, 3)
+    return {
+        'size': tamano,
+        'mode': modo,
+        'route': ruta,
+        'requests': len(ordenadas),
+        'errors': errores,
+        'throughput_rps': round(len(ordenadas) / duracion, 2) if duracion else 0.0,
+        'mean_ms': ms(sum(ordenadas) / len(ordenadas)) if ordenadas else 0.0,
+        'p50_ms': ms(percentil(ordenadas, 50)),
+        'p95_ms': ms(percentil(ordenadas, 95)),
+        'p99_ms': ms(percentil(ordenadas, 99)),
+    }
+
+
+def metadatos(config):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'fecha': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'plataforma': platform.platform(),
+        'config': config,
+    }
+
+
+def guardar(ruta, meta, resultados):
+    with open(ruta, 'w') as f:
+        json.dump({'meta': meta, 'resultados': resultados}, f, indent=2, ensure_ascii=False)
+
+
+def cargar(ruta):
+    with open(ruta) as f:
+        return json.load(f)
+
+
+def imprimir_tabla(resultados):
+    print('%-8s %-6s %-22s %8s %6s %10s %9s %9s %9s' %
+          ('tamaño', 'modo', 'ruta', 'pet.', 'err.', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms'))
+    for r in resultados:
+        print('%-8d %-6s %-22s %8d %6d %10.1f %9.2f %9.2f %9.2f' %
+              (r['size'], r['mode'], r['route'], r['requests'], r['errors'],
+               r['throughput_rps'], r['p50_ms'], r['p95_ms'], r['p99_ms']))
+
+
+def comparar(base, nuevo, umbral):
+    """Devuelve las regresiones: p95 más alto o throughput más bajo que `umbral` (fracción)"""
+    indice = {(r['size'], r['mode'], r['route']): r for r in base['resultados']}
+    regresiones = []
+    for r in nuevo['resultados']:
+        anterior = indice.get((r['size'], r['mode'], r['route']))
+        if anterior is None:
+            continue
+        if anterior['p95_ms'] and r['p95_ms'] > anterior['p95_ms'] * (1 + umbral):
+            regresiones.append((r, 'p95_ms', anterior['p95_ms'], r['p95_ms']))
+        if anterior['throughput_rps'] and r['throughput_rps'] < anterior['throughput_rps'] * (1 - umbral):
+            regresiones.append((r, 'throughput_rps', anterior['throughput_rps'], r['throughput_rps']))
+        if r['errors'] > anterior['errors']:
+            regresiones.append((r, 'errors', anterior['errors'], r['errors']))
+    return regresiones
+
+
+def imprimir_regresiones(regresiones, umbral):
+    if not regresiones:
+        print('✅ Sin regresiones (umbral %d%%)' % (umbral * 100))
+        return
+    print('❌ %d regresiones (umbral %d%%):' % (len(regresiones), umbral * 100))
+    for r, metrica, antes, ahora in regresiones:
+        print('   %-8d %-6s %-22s %-15s %10.2f -> %10.2f' %
+              (r['size'], r['mode'], r['route'], metrica, antes, ahora))
@@ -0,0 +1,84 @@
+# ARCHIVO: benchmarks/reservas.py
+"""Estrés de reservas: muchos clientes a la vez contra un mismo servicio en promoción"""
+import itertools
+import sqlite3
+import threading
+import time
+
+
+def preparar(ruta, stock):
+    """Pone el primer servicio en promoción con `stock` unidades; devuelve su id"""
+    conn = sqlite3.connect(ruta)
+    servicio_id = conn.execute('SELECT MIN(id) FROM servicios').fetchone()[0]
+    conn.execute('UPDATE servicios SET stock = ?, promocion = 1 WHERE id = ?', (stock, servicio_id))
+    conn.commit()
+    conn.close()
+    return servicio_id
+
+
+def estresar(driver, servicio_id, peticiones, concurrencia):
+    """Reparte `peticiones` reservas de 1 unidad en `concurrencia` hilos.
+
+    Devuelve ({código HTTP: cantidad}, duración en segundos). Todos los
+    hilos arrancan juntos para que las reservas lleguen a la vez.
+    """
+    ruta = '/api/servicios/%d/reservas' % servicio_id
+    pendientes = itertools.count()
+    conteo = {}
+    lock = threading.Lock()
+    salida = threading.Barrier(concurrencia + 1)
+
+    def trabajador(n):
+        propios = {}
+        datos = {'cantidad': '1', 'nombre': 'Cliente %d' % n, 'email': 'cliente%d@bench.local' % n}
+        salida.wait()
+        while next(pendientes) < peticiones:
+            try:
+                estado = driver.pedir('POST', ruta, datos, False)
+            except Exception:
+                estado = 'excepción'
+            propios[estado] = propios.get(estado, 0) + 1
+        with lock:
+            for estado, cantidad in propios.items():
+                conteo[estado] = conteo.get(estado, 0) + cantidad
+
+    hilos = [threading.Thread(target=trabajador, args=(n,)) for n in range(concurrencia)]
+    for hilo in hilos:
+        hilo.start()
+    salida.wait()
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.join()
+    return {str(k): v for k, v in conteo.items()}, time.perf_counter() - inicio
+
+
+def verificar(ruta, servicio_id, stock_inicial, conteo):
+    """Lista de invariantes violadas (vacía si todo cuadra)"""
+    exitos = conteo.get('201', 0)
+    conn = sqlite3.connect(ruta)
+    stock = conn.execute('SELECT stock FROM servicios WHERE id = ?', (servicio_id,)).fetchone()[0]
+    filas, unidades = conn.execute('SELECT COUNT(*), COALESCE(SUM(cantidad), 0) FROM reservas WHERE servicio_id = ?',
+                                   (servicio_id,)).fetchone()
+    conn.close()
+    fallas = []
+    if stock < 0:
+        fallas.append('stock negativo: %d' % stock)
+    if stock != stock_inicial - unidades:
+        fallas.append('stock %d no cuadra con %d unidades reservadas de %d' % (stock, unidades, stock_inicial))
+    if filas != exitos:
+        fallas.append('%d reservas guardadas pero %d respuestas 201' % (filas, exitos))
+    if exitos < min(stock_inicial, sum(conteo.values())) and not set(conteo) - {'201', '409'}:
+        fallas.append('se rechazaron reservas con stock disponible')
+    return fallas
+
+
+def imprimir(conteo, duracion, stock_inicial, fallas):
+    total = sum(conteo.values())
+    print('🎟️  %d reservas en %.2f s: %.0f reservas/s (stock inicial %d)' % (total, duracion, total / duracion,
+                                                                        stock_inicial))
+    for estado, cantidad in sorted(conteo.items()):
+        print('   %s: %d' % (estado, cantidad))
+    for falla in fallas:
+        print('❌ %s' % falla)
+    if not fallas:
+        print('✅ El stock nunca quedó negativo y cada 201 tiene su reserva')
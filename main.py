@@ -1,18 +1,139 @@
 # ARCHIVO: server.py
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify
+from flask import Flask, Request, Response, abort, has_request_context, make_response, render_template, request, redirect, send_from_directory, stream_with_context, url_for, session, jsonify
+from markupsafe import Markup
 import sqlite3
+import argparse
+import asyncio
+import base64
+import bisect
+import contextlib
+import cProfile
+import csv
+import fcntl
+import functools
+import io
+import itertools
 import hashlib
-from datetime import datetime
+import hmac
+import json
+import math
+import os
+import queue
+import random
+import re
+import secrets
+import select
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+import zlib
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import unquote_to_bytes
+from werkzeug.security import check_password_hash, generate_password_hash
+from werkzeug.exceptions import HTTPException
+from werkzeug.http import http_date
+from werkzeug.middleware.proxy_fix import ProxyFix
+from werkzeug.serving import ThreadedWSGIServer, WSGIRequestHandler
+
+try:
+    import brotli
+except ImportError:  # opcional: sin él solo se generan variantes gzip
+    brotli = None
 
 app = Flask(__name__)
 app.secret_key = 'techflow_secret_key_2024'
+# Detrás de Firebase Hosting (firebase.json) Cloud Run solo recibe la cookie __session
+app.config['SESSION_COOKIE_NAME'] = os.environ.get('TECHFLOW_SESSION_COOKIE', 'session')
+
+# Servidor: dirección, procesos, hilos por proceso y tiempos de apagado
+HOST = os.environ.get('TECHFLOW_HOST', '0.0.0.0')
+PORT = int(os.environ.get('TECHFLOW_PORT', '5000'))
+DEBUG = os.environ.get('TECHFLOW_DEBUG', '0') == '1'
+WORKERS = int(os.environ.get('TECHFLOW_WORKERS', str(os.cpu_count() or 2)))
+THREADS = int(os.environ.get('TECHFLOW_THREADS', '8'))
+GRACEFUL_TIMEOUT = float(os.environ.get('TECHFLOW_GRACEFUL_TIMEOUT', '30'))
+KEEPALIVE_TIMEOUT = float(os.environ.get('TECHFLOW_KEEPALIVE_TIMEOUT', '5'))
+
+# Directorio compartido donde cada proceso vuelca sus métricas (lo fija `serve`)
+METRICS_DIR = os.environ.get('TECHFLOW_METRICS_DIR')
+METRICS_FLUSH = float(os.environ.get('TECHFLOW_METRICS_FLUSH', '1'))
+
+# Ruta del archivo SQLite y tamaño del pool (configurables por entorno)
+DATABASE = os.environ.get('TECHFLOW_DB', 'techflow.db')
+DB_POOL_SIZE = int(os.environ.get('TECHFLOW_DB_POOL_SIZE', '8'))
+DB_POOL_TIMEOUT = float(os.environ.get('TECHFLOW_DB_POOL_TIMEOUT', '10'))
+# Filas por transacción en las importaciones masivas
+IMPORT_CHUNK = int(os.environ.get('TECHFLOW_IMPORT_CHUNK', '5000'))
+# Eventos de plantilla que se agrupan antes de enviar cada bloque en streaming
+STREAM_BUFFER = int(os.environ.get('TECHFLOW_STREAM_BUFFER', '64'))
+PAGE_CACHE_BYTES = int(os.environ.get('TECHFLOW_PAGE_CACHE_BYTES', str(32 * 1024 * 1024)))
+# Cada cuánto (segundos) se revisa si otro proceso cambió el catálogo
+CATALOG_STATE_TTL = float(os.environ.get('TECHFLOW_CATALOG_STATE_TTL', '1'))
+# Conexiones SSE simultáneas por proceso (cada una ocupa un hilo) y su duración máxima
+SSE_MAX_CLIENTS = int(os.environ.get('TECHFLOW_SSE_MAX_CLIENTS', str(max(1, THREADS // 2))))
+SSE_MAX_DURATION = float(os.environ.get('TECHFLOW_SSE_MAX_DURATION', '300'))
+# Contraseñas: método de werkzeug (con su costo) y hashes simultáneos por proceso
+PASSWORD_METHOD = os.environ.get('TECHFLOW_PASSWORD_METHOD', 'scrypt:32768:8:1')
+PASSWORD_CONCURRENCY = int(os.environ.get('TECHFLOW_PASSWORD_CONCURRENCY', '2'))
+# Intentos de login por usuario y por IP dentro de la ventana (segundos); 0 desactiva
+LOGIN_WINDOW = float(os.environ.get('TECHFLOW_LOGIN_WINDOW', '60'))
+LOGIN_MAX_PER_USER = int(os.environ.get('TECHFLOW_LOGIN_MAX_PER_USER', '5'))
+LOGIN_MAX_PER_IP = int(os.environ.get('TECHFLOW_LOGIN_MAX_PER_IP', '20'))
+# Proxies de confianza delante de la app (Firebase Hosting, el balanceador
+# de Cloud Run) cuyos X-Forwarded-For/-Proto se aceptan; 0 = conexión directa
+TRUSTED_PROXIES = int(os.environ.get('TECHFLOW_TRUSTED_PROXIES', '0'))
+# Reservas: máximo por transacción, espera extra para juntar un lote (ms) y cola máxima
+RESERVAS_LOTE = int(os.environ.get('TECHFLOW_RESERVAS_LOTE', '256'))
+RESERVAS_ESPERA_MS = float(os.environ.get('TECHFLOW_RESERVAS_ESPERA_MS', '0'))
+RESERVAS_COLA = int(os.environ.get('TECHFLOW_RESERVAS_COLA', '10000'))
+# Compresión de respuestas dinámicas: tamaño mínimo (bytes) y niveles
+# elegidos por latencia (los archivos estáticos usan el máximo, una vez)
+COMPRESS_MIN_BYTES = int(os.environ.get('TECHFLOW_COMPRESS_MIN_BYTES', '1024'))
+GZIP_LEVEL = int(os.environ.get('TECHFLOW_GZIP_LEVEL', '5'))
+BROTLI_QUALITY = int(os.environ.get('TECHFLOW_BROTLI_QUALITY', '4'))
+# Modo asyncio de `serve`: hilos del executor de la base y conexiones por proceso
+ASYNC_MODE = os.environ.get('TECHFLOW_ASYNC', '0') == '1'
+ASYNC_DB_THREADS = int(os.environ.get('TECHFLOW_ASYNC_DB_THREADS', str(DB_POOL_SIZE)))
+ASYNC_MAX_CONNECTIONS = int(os.environ.get('TECHFLOW_ASYNC_MAX_CONNECTIONS', '10000'))
+# Perfilado: carpeta de capturas y cuántas se conservan, umbral de petición
+# lenta (ms; 0 desactiva), fracción de peticiones perfiladas con cProfile,
+# token de la cabecera X-Profile e intervalo del muestreo de pilas (ms)
+PROFILE_DIR = os.environ.get('TECHFLOW_PROFILE_DIR', 'perfiles')
+PROFILE_KEEP = int(os.environ.get('TECHFLOW_PROFILE_KEEP', '200'))
+SLOW_REQUEST_MS = float(os.environ.get('TECHFLOW_SLOW_REQUEST_MS', '1000'))
+PROFILE_SAMPLE = float(os.environ.get('TECHFLOW_PROFILE_SAMPLE', '0'))
+PROFILE_TOKEN = os.environ.get('TECHFLOW_PROFILE_TOKEN', '')
+PROFILE_INTERVAL_MS = float(os.environ.get('TECHFLOW_PROFILE_INTERVAL_MS', '10'))
 
 # Configuración de la base de datos
-def init_db():
-    """Inicializa la base de datos con las tablas necesarias"""
-    conn = sqlite3.connect('techflow.db')
-    cursor = conn.cursor()
-    
+
+SERVICIOS_EJEMPLO = [
+    ('Desarrollo Web', 'Sitios web modernos y responsivos con las últimas tecnologías', 2500000, 15, 1, '💻'),
+    ('Apps Móviles', 'Aplicaciones nativas para iOS y Android', 4500000, 8, 0, '📱'),
+    ('Cloud Computing', 'Migración y gestión de servicios en la nube', 3200000, 12, 1, '☁️'),
+    ('Ciberseguridad', 'Auditorías de seguridad y protección de datos', 2800000, 6, 0, '🔐'),
+    ('Inteligencia Artificial', 'Soluciones de IA y Machine Learning personalizadas', 6500000, 4, 1, '🤖'),
+    ('UI/UX Design', 'Diseño de interfaces centradas en el usuario', 1800000, 20, 0, '🎨'),
+    ('Business Intelligence', 'Análisis de datos y reportes empresariales', 3800000, 10, 0, '📊'),
+    ('Mantenimiento IT', 'Soporte técnico especializado 24/7', 1200000, 25, 0, '🔧'),
+    ('E-commerce', 'Tiendas online completas y optimizadas', 3500000, 7, 1, '🌐'),
+    ('Consultoría Digital', 'Estrategias de transformación digital', 2200000, 18, 0, '📈')
+]
+
+# MIGRACIONES
+# Cada migración recibe un cursor dentro de una transacción y debe poder
+# aplicarse sobre bases creadas por versiones anteriores de init_db (que
+# no tenían tabla schema_version), por eso usan IF NOT EXISTS.
+
+def migracion_tablas_base(cursor):
     # Tabla de usuarios
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS usuarios (
@@ -37,612 +158,4247 @@ def init_db():
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     ''')
-    
-    # Insertar usuario admin por defecto
+
+def migracion_updated_at(cursor):
+    columnas = [columna[1] for columna in cursor.execute('PRAGMA table_info(servicios)')]
+    if 'updated_at' not in columnas:
+        # ALTER TABLE no admite DEFAULT CURRENT_TIMESTAMP; se rellena a mano
+        cursor.execute('ALTER TABLE servicios ADD COLUMN updated_at TIMESTAMP')
+        cursor.execute('UPDATE servicios SET updated_at = created_at')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_servicios_updated_at
+        AFTER UPDATE ON servicios
+        WHEN NEW.updated_at IS OLD.updated_at
+        BEGIN
+            UPDATE servicios SET updated_at = CURRENT_TIMESTAMP WHERE id = NEW.id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_servicios_insert_updated_at
+        AFTER INSERT ON servicios
+        WHEN NEW.updated_at IS NULL
+        BEGIN
+            UPDATE servicios SET updated_at = CURRENT_TIMESTAMP WHERE id = NEW.id;
+        END
+    ''')
+
+def migracion_version_servicios(cursor):
+    # Versión por fila para control de concurrencia optimista: cada UPDATE
+    # de la aplicación la incrementa y las ediciones la comparan en el WHERE
+    columnas = [columna[1] for columna in cursor.execute('PRAGMA table_info(servicios)')]
+    if 'version' not in columnas:
+        cursor.execute('ALTER TABLE servicios ADD COLUMN version INTEGER NOT NULL DEFAULT 1')
+
+def migracion_nombre_unico(cursor):
+    # Las versiones anteriores de init_db duplicaban el catálogo de ejemplo
+    # en cada arranque; se conserva la fila más antigua de cada nombre
+    cursor.execute('''
+        DELETE FROM servicios
+        WHERE id NOT IN (SELECT MIN(id) FROM servicios GROUP BY nombre)
+    ''')
+    # El índice único (nombre) + rowid cubre también ORDER BY nombre, id
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_servicios_nombre_unico ON servicios (nombre)')
+
+def migracion_indice_precio(cursor):
+    # Los filtros y el orden de /api/servicios se resuelven en memoria
+    # (CatalogStore); en SQL solo se busca por precio para el mínimo y el
+    # máximo del catálogo
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_servicios_precio ON servicios (precio, id)')
+
+def migracion_carga_masiva(cursor):
+    # Mientras la tabla carga_masiva tiene una fila, los INSERT no indexan
+    # fila a fila en servicios_fts, no incrementan catalogo_estado, no
+    # escriben en servicios_cambios ni suman a catalogo_resumen: la
+    # importación hace todo eso una vez por bloque y vacía la tabla antes
+    # del COMMIT, así que ninguna otra conexión ve nunca la marca
+    cursor.execute('CREATE TABLE IF NOT EXISTS carga_masiva (id INTEGER PRIMARY KEY CHECK (id = 1))')
+
+# Columnas que escribe la aplicación. Los triggers de UPDATE se limitan a
+# ellas (UPDATE OF) para que el UPDATE anidado de trg_servicios_updated_at,
+# que solo toca updated_at, no cuente como un segundo cambio; toda
+# escritura de la aplicación sube version
+COLUMNAS_ESCRITURA = 'nombre, descripcion, precio, stock, promocion, icono, version'
+
+def migracion_catalogo_estado(cursor):
+    # Estado global del catálogo: versión y fecha de la última escritura,
+    # mantenidas por triggers para que sirvan de ETag/Last-Modified
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS catalogo_estado (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('INSERT OR IGNORE INTO catalogo_estado (id, version) VALUES (1, 0)')
+    eventos = {
+        'insert': 'INSERT',
+        'update': f'UPDATE OF {COLUMNAS_ESCRITURA}',
+        'delete': 'DELETE',
+    }
+    for nombre, evento in eventos.items():
+        # Las importaciones suben la versión una vez por bloque (ver carga_masiva)
+        marca = '' if nombre == 'delete' else 'WHEN NOT EXISTS (SELECT 1 FROM carga_masiva)'
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_servicios_{nombre}_estado
+            AFTER {evento} ON servicios
+            {marca}
+            BEGIN
+                UPDATE catalogo_estado
+                SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+                WHERE id = 1;
+            END
+        ''')
+
+def migracion_busqueda(cursor):
+    # Índice de texto completo sobre nombre/descripcion con contenido externo
+    # (no duplica el texto) y prefijos de 2 y 3 letras para búsquedas parciales
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS servicios_fts USING fts5(
+            nombre, descripcion,
+            content='servicios', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+    ''')
+    # Las importaciones indexan cada bloque con un solo INSERT ... SELECT
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_servicios_fts_insert AFTER INSERT ON servicios
+        WHEN NOT EXISTS (SELECT 1 FROM carga_masiva)
+        BEGIN
+            INSERT INTO servicios_fts (rowid, nombre, descripcion)
+            VALUES (NEW.id, NEW.nombre, NEW.descripcion);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_servicios_fts_delete AFTER DELETE ON servicios
+        BEGIN
+            INSERT INTO servicios_fts (servicios_fts, rowid, nombre, descripcion)
+            VALUES ('delete', OLD.id, OLD.nombre, OLD.descripcion);
+        END
+    ''')
+    # Solo cuando cambia el texto: los cambios de precio o stock no
+    # reindexan, ni los upsert de una importación que reescriben la misma
+    # descripcion (sin el WHEN, un upsert de precios iba 3 veces más lento)
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_servicios_fts_update AFTER UPDATE OF nombre, descripcion ON servicios
+        WHEN NEW.nombre IS NOT OLD.nombre OR NEW.descripcion IS NOT OLD.descripcion
+        BEGIN
+            INSERT INTO servicios_fts (servicios_fts, rowid, nombre, descripcion)
+            VALUES ('delete', OLD.id, OLD.nombre, OLD.descripcion);
+            INSERT INTO servicios_fts (rowid, nombre, descripcion)
+            VALUES (NEW.id, NEW.nombre, NEW.descripcion);
+        END
+    ''')
+    cursor.execute("INSERT INTO servicios_fts (servicios_fts) VALUES ('rebuild')")
+
+def migracion_registro_cambios(cursor):
+    # Registro de cambios con secuencia monótona (AUTOINCREMENT no reutiliza
+    # números) para que los clientes sincronicen solo las diferencias
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS servicios_cambios (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            servicio_id INTEGER NOT NULL,
+            operacion TEXT NOT NULL CHECK (operacion IN ('insert', 'update', 'delete')),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    # Las importaciones registran sus inserciones en bloque (ver carga_masiva)
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_servicios_insert_cambios AFTER INSERT ON servicios
+        WHEN NOT EXISTS (SELECT 1 FROM carga_masiva)
+        BEGIN
+            INSERT INTO servicios_cambios (servicio_id, operacion) VALUES (NEW.id, 'insert');
+        END
+    ''')
+    # Un upsert que no cambia nada tampoco cuenta como cambio
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_servicios_update_cambios AFTER UPDATE OF {COLUMNAS_ESCRITURA} ON servicios
+        WHEN NEW.version IS NOT OLD.version
+            OR NEW.nombre IS NOT OLD.nombre OR NEW.descripcion IS NOT OLD.descripcion
+            OR NEW.precio IS NOT OLD.precio OR NEW.stock IS NOT OLD.stock
+            OR NEW.promocion IS NOT OLD.promocion OR NEW.icono IS NOT OLD.icono
+        BEGIN
+            INSERT INTO servicios_cambios (servicio_id, operacion) VALUES (NEW.id, 'update');
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_servicios_delete_cambios AFTER DELETE ON servicios
+        BEGIN
+            INSERT INTO servicios_cambios (servicio_id, operacion) VALUES (OLD.id, 'delete');
+        END
+    ''')
+    # Se conservan los últimos 100k cambios; un cliente más atrasado recibe
+    # 410 y vuelve a descargar el catálogo completo
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_servicios_cambios_retencion AFTER INSERT ON servicios_cambios
+        BEGIN
+            DELETE FROM servicios_cambios WHERE seq <= NEW.seq - 100000;
+        END
+    ''')
+
+def migracion_reservas(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS reservas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            servicio_id INTEGER NOT NULL REFERENCES servicios (id),
+            cantidad INTEGER NOT NULL CHECK (cantidad > 0),
+            nombre TEXT NOT NULL,
+            email TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_reservas_servicio ON reservas (servicio_id)')
+
+# Tramos del histograma de precios: [desde, hasta); el último no tiene tope
+TRAMOS_PRECIO = (0, 500000, 1000000, 2000000, 3000000, 5000000, 10000000, 20000000)
+
+# Mismas condiciones en los triggers y en sumar_al_resumen
+EN_TRAMO_OLD = '(OLD.precio >= desde AND (hasta IS NULL OR OLD.precio < hasta))'
+EN_TRAMO_NEW = '(NEW.precio >= desde AND (hasta IS NULL OR NEW.precio < hasta))'
+
+def migracion_resumen_catalogo(cursor):
+    # Totales del catálogo mantenidos por triggers, para responder
+    # /api/servicios/stats y el panel sin recorrer servicios. El mínimo y
+    # el máximo solo se recalculan (con idx_servicios_precio, O(log n))
+    # cuando sale la fila que los tenía. Las importaciones suman cada
+    # bloque con sumar_al_resumen (ver carga_masiva)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS catalogo_resumen (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            servicios INTEGER NOT NULL DEFAULT 0,
+            stock_total INTEGER NOT NULL DEFAULT 0,
+            en_promocion INTEGER NOT NULL DEFAULT 0,
+            suma_precios NUMERIC NOT NULL DEFAULT 0,
+            precio_min NUMERIC,
+            precio_max NUMERIC
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS catalogo_tramos_precio (
+            tramo INTEGER PRIMARY KEY,
+            desde NUMERIC NOT NULL,
+            hasta NUMERIC,
+            servicios INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('INSERT OR IGNORE INTO catalogo_resumen (id) VALUES (1)')
+    limites = list(TRAMOS_PRECIO)
+    cursor.executemany('INSERT OR IGNORE INTO catalogo_tramos_precio (tramo, desde, hasta) VALUES (?, ?, ?)',
+                       [(i, desde, hasta) for i, (desde, hasta) in enumerate(zip(limites, limites[1:] + [None]))])
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_servicios_insert_resumen AFTER INSERT ON servicios
+        WHEN NOT EXISTS (SELECT 1 FROM carga_masiva)
+        BEGIN
+            UPDATE catalogo_resumen SET
+                servicios = servicios + 1,
+                stock_total = stock_total + COALESCE(NEW.stock, 0),
+                en_promocion = en_promocion + (COALESCE(NEW.promocion, 0) != 0),
+                suma_precios = suma_precios + NEW.precio,
+                precio_min = MIN(COALESCE(precio_min, NEW.precio), NEW.precio),
+                precio_max = MAX(COALESCE(precio_max, NEW.precio), NEW.precio)
+            WHERE id = 1;
+            UPDATE catalogo_tramos_precio SET servicios = servicios + 1 WHERE {EN_TRAMO_NEW};
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_servicios_delete_resumen AFTER DELETE ON servicios
+        BEGIN
+            UPDATE catalogo_resumen SET
+                servicios = servicios - 1,
+                stock_total = stock_total - COALESCE(OLD.stock, 0),
+                en_promocion = en_promocion - (COALESCE(OLD.promocion, 0) != 0),
+                suma_precios = suma_precios - OLD.precio,
+                precio_min = CASE WHEN OLD.precio > precio_min THEN precio_min
+                                  ELSE (SELECT MIN(precio) FROM servicios) END,
+                precio_max = CASE WHEN OLD.precio < precio_max THEN precio_max
+                                  ELSE (SELECT MAX(precio) FROM servicios) END
+            WHERE id = 1;
+            UPDATE catalogo_tramos_precio SET servicios = servicios - 1 WHERE {EN_TRAMO_OLD};
+        END
+    ''')
+    # Sin marca de carga_masiva: los upsert de una importación pasan por aquí
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_servicios_update_resumen
+        AFTER UPDATE OF precio, stock, promocion ON servicios
+        WHEN NEW.precio IS NOT OLD.precio OR NEW.stock IS NOT OLD.stock
+            OR NEW.promocion IS NOT OLD.promocion
+        BEGIN
+            UPDATE catalogo_resumen SET
+                stock_total = stock_total - COALESCE(OLD.stock, 0) + COALESCE(NEW.stock, 0),
+                en_promocion = en_promocion - (COALESCE(OLD.promocion, 0) != 0)
+                                            + (COALESCE(NEW.promocion, 0) != 0),
+                suma_precios = suma_precios - OLD.precio + NEW.precio,
+                precio_min = CASE WHEN NEW.precio <= precio_min THEN NEW.precio
+                                  WHEN OLD.precio > precio_min THEN precio_min
+                                  ELSE (SELECT MIN(precio) FROM servicios) END,
+                precio_max = CASE WHEN NEW.precio >= precio_max THEN NEW.precio
+                                  WHEN OLD.precio < precio_max THEN precio_max
+                                  ELSE (SELECT MAX(precio) FROM servicios) END
+            WHERE id = 1;
+            UPDATE catalogo_tramos_precio SET servicios = servicios - {EN_TRAMO_OLD} + {EN_TRAMO_NEW}
+            WHERE NEW.precio IS NOT OLD.precio AND ({EN_TRAMO_OLD} OR {EN_TRAMO_NEW});
+        END
+    ''')
+    sumar_al_resumen(cursor, 0)
+
+def sumar_al_resumen(cursor, ultimo_id):
+    """Suma al resumen las filas con id > ultimo_id (insertadas sin triggers)"""
+    cursor.execute('''
+        UPDATE catalogo_resumen AS r SET
+            servicios = r.servicios + nuevos.servicios,
+            stock_total = r.stock_total + nuevos.stock_total,
+            en_promocion = r.en_promocion + nuevos.en_promocion,
+            suma_precios = r.suma_precios + nuevos.suma_precios,
+            precio_min = MIN(COALESCE(r.precio_min, nuevos.precio_min), nuevos.precio_min),
+            precio_max = MAX(COALESCE(r.precio_max, nuevos.precio_max), nuevos.precio_max)
+        FROM (SELECT COUNT(*) AS servicios, COALESCE(SUM(stock), 0) AS stock_total,
+                     COALESCE(SUM(COALESCE(promocion, 0) != 0), 0) AS en_promocion,
+                     COALESCE(SUM(precio), 0) AS suma_precios,
+                     MIN(precio) AS precio_min, MAX(precio) AS precio_max
+              FROM servicios WHERE id > ?) AS nuevos
+        WHERE r.id = 1 AND nuevos.servicios > 0
+    ''', (ultimo_id,))
+    cursor.execute('''
+        UPDATE catalogo_tramos_precio SET servicios = servicios + (
+            SELECT COUNT(*) FROM servicios
+            WHERE id > ? AND precio >= desde AND (hasta IS NULL OR precio < hasta))
+    ''', (ultimo_id,))
+
+MIGRACIONES = [
+    (1, 'tablas usuarios y servicios', migracion_tablas_base),
+    (2, 'columna updated_at', migracion_updated_at),
+    (3, 'versión por servicio', migracion_version_servicios),
+    (4, 'nombre de servicio único', migracion_nombre_unico),
+    (5, 'índice de precios', migracion_indice_precio),
+    (6, 'marca de importación en curso', migracion_carga_masiva),
+    (7, 'tabla catalogo_estado y triggers', migracion_catalogo_estado),
+    (8, 'búsqueda de texto completo', migracion_busqueda),
+    (9, 'registro de cambios de servicios', migracion_registro_cambios),
+    (10, 'tabla de reservas', migracion_reservas),
+    (11, 'resumen del catálogo por triggers', migracion_resumen_catalogo),
+]
+
+def aplicar_migraciones(conn):
+    """Aplica en orden las migraciones pendientes; devuelve [(version, descripcion, ms)].
+
+    Cada migración corre en su propia transacción BEGIN IMMEDIATE y la
+    versión se vuelve a leer con el lock tomado, así que varios workers
+    arrancando a la vez no aplican dos veces la misma.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            descripcion TEXT NOT NULL,
+            duracion_ms REAL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    aplicadas = []
+    for version, descripcion, migracion in MIGRACIONES:
+        if version <= version_esquema(conn):
+            continue
+        inicio = time.perf_counter()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if version <= version_esquema(conn):
+                conn.execute('ROLLBACK')
+                continue
+            migracion(conn.cursor())
+            duracion = (time.perf_counter() - inicio) * 1000
+            conn.execute('INSERT INTO schema_version (version, descripcion, duracion_ms) VALUES (?, ?, ?)',
+                         (version, descripcion, duracion))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        aplicadas.append((version, descripcion, round(duracion, 2)))
+    return aplicadas
+
+def version_esquema(conn):
+    return conn.execute('SELECT COALESCE(MAX(version), 0) FROM schema_version').fetchone()[0]
+
+def sembrar_datos(conn):
+    """Crea el admin por defecto y, solo si el catálogo está vacío, los servicios de ejemplo"""
+    conn.execute('BEGIN IMMEDIATE')
     try:
-        password_hash = hashlib.md5('admin123'.encode()).hexdigest()
-        cursor.execute('INSERT INTO usuarios (username, password) VALUES (?, ?)', 
-                      ('admin', password_hash))
-    except:
-        pass  # Usuario ya existe
-    
-    # Insertar servicios de ejemplo
-    servicios_ejemplo = [
-        ('Desarrollo Web', 'Sitios web modernos y responsivos con las últimas tecnologías', 2500000, 15, 1, '💻'),
-        ('Apps Móviles', 'Aplicaciones nativas para iOS y Android', 4500000, 8, 0, '📱'),
-        ('Cloud Computing', 'Migración y gestión de servicios en la nube', 3200000, 12, 1, '☁️'),
-        ('Ciberseguridad', 'Auditorías de seguridad y protección de datos', 2800000, 6, 0, '🔐'),
-        ('Inteligencia Artificial', 'Soluciones de IA y Machine Learning personalizadas', 6500000, 4, 1, '🤖'),
-        ('UI/UX Design', 'Diseño de interfaces centradas en el usuario', 1800000, 20, 0, '🎨'),
-        ('Business Intelligence', 'Análisis de datos y reportes empresariales', 3800000, 10, 0, '📊'),
-        ('Mantenimiento IT', 'Soporte técnico especializado 24/7', 1200000, 25, 0, '🔧'),
-        ('E-commerce', 'Tiendas online completas y optimizadas', 3500000, 7, 1, '🌐'),
-        ('Consultoría Digital', 'Estrategias de transformación digital', 2200000, 18, 0, '📈')
-    ]
-    
-    for servicio in servicios_ejemplo:
+        # Solo se paga el hash si el admin no existe
+        if conn.execute("SELECT 1 FROM usuarios WHERE username = 'admin'").fetchone() is None:
+            conn.execute('INSERT INTO usuarios (username, password) VALUES (?, ?)',
+                         ('admin', hash_password('admin123')))
+        sembrados = 0
+        if conn.execute('SELECT 1 FROM servicios LIMIT 1').fetchone() is None:
+            conn.executemany('''INSERT OR IGNORE INTO servicios 
+                                (nombre, descripcion, precio, stock, promocion, icono) 
+                                VALUES (?, ?, ?, ?, ?, ?)''', SERVICIOS_EJEMPLO)
+            sembrados = len(SERVICIOS_EJEMPLO)
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    return sembrados
+
+def init_db():
+    """Inicializa la base de datos: migraciones pendientes y datos iniciales.
+
+    Es idempotente y barata cuando el esquema ya está al día (una lectura
+    de schema_version y otra de servicios). Devuelve un reporte de tiempos.
+    """
+    inicio = time.perf_counter()
+    conn = sqlite3.connect(DATABASE, isolation_level=None, timeout=30)
+    try:
+        conn.execute('PRAGMA journal_mode = WAL')
+        aplicadas = aplicar_migraciones(conn)
+        t_migraciones = time.perf_counter()
+        sembrados = sembrar_datos(conn)
+        version = version_esquema(conn)
+    finally:
+        conn.close()
+    fin = time.perf_counter()
+    return {
+        'schema_version': version,
+        'migraciones': aplicadas,
+        'migraciones_ms': round((t_migraciones - inicio) * 1000, 2),
+        'servicios_sembrados': sembrados,
+        'seed_ms': round((fin - t_migraciones) * 1000, 2),
+        'total_ms': round((fin - inicio) * 1000, 2),
+    }
+
+def imprimir_reporte_inicio(reporte):
+    """Resumen legible de lo que costó init_db()"""
+    print(f"✅ Base de datos inicializada (esquema v{reporte['schema_version']}, {reporte['total_ms']} ms)")
+    for version, descripcion, ms in reporte['migraciones']:
+        print(f"   ↳ migración {version}: {descripcion} ({ms} ms)")
+    if reporte['servicios_sembrados']:
+        print(f"   ↳ {reporte['servicios_sembrados']} servicios de ejemplo ({reporte['seed_ms']} ms)")
+
+# MÉTRICAS
+# Contadores e histogramas en memoria por proceso. Con `serve`, cada
+# worker vuelca los suyos a METRICS_DIR/<pid>.json cada METRICS_FLUSH
+# segundos y /metrics suma los de todos los procesos. Cuando un worker
+# termina, el maestro suma su volcado a METRICS_DIR/retirados.json y lo
+# borra, así los contadores no retroceden tras una recarga y el
+# directorio no crece con cada generación de workers.
+
+BUCKETS_LATENCIA = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+DESCRIPCIONES = {
+    'techflow_http_requests_total': ('counter', 'Peticiones HTTP por endpoint, método y código'),
+    'techflow_http_request_duration_seconds': ('histogram', 'Latencia de las peticiones HTTP hasta el último byte'),
+    'techflow_db_statement_duration_seconds': ('histogram', 'Tiempo de execute() por sentencia SQL'),
+    'techflow_db_fetch_seconds_total': ('counter', 'Tiempo leyendo filas por sentencia SQL'),
+    'techflow_db_rows_total': ('counter', 'Filas leídas o modificadas por sentencia SQL'),
+    'techflow_db_pool_checkouts_total': ('counter', 'Préstamos de conexiones del pool'),
+    'techflow_db_pool_waits_total': ('counter', 'Préstamos que tuvieron que esperar una conexión libre'),
+    'techflow_db_pool_created_total': ('counter', 'Conexiones SQLite abiertas por el pool'),
+    'techflow_page_cache_hits_total': ('counter', 'Aciertos de la caché de páginas'),
+    'techflow_page_cache_misses_total': ('counter', 'Fallos de la caché de páginas'),
+    'techflow_login_attempts_total': ('counter', 'Intentos de login por resultado'),
+    'techflow_login_rate_limited_total': ('counter', 'Intentos de login rechazados por el limitador, antes de hashear o consultar'),
+    'techflow_login_limiter_keys': ('gauge', 'Usuarios o IPs con intentos dentro de la ventana'),
+    'techflow_password_hash_seconds': ('histogram', 'Tiempo de cada hash o verificación de contraseña'),
+    'techflow_password_rehash_total': ('counter', 'Contraseñas MD5 o de costo anterior rehasheadas al iniciar sesión'),
+    'techflow_reservations_total': ('counter', 'Reservas procesadas por resultado'),
+    'techflow_reservation_batches_total': ('counter', 'Transacciones de reservas confirmadas'),
+    'techflow_reservation_commit_seconds': ('histogram', 'Duración de cada transacción de reservas'),
+    'techflow_compression_responses_total': ('counter', 'Respuestas comprimidas por codificación y origen (al vuelo, caché o precomprimida)'),
+    'techflow_compression_input_bytes_total': ('counter', 'Bytes sin comprimir de las respuestas comprimidas'),
+    'techflow_compression_output_bytes_total': ('counter', 'Bytes enviados tras comprimir'),
+    'techflow_compression_saved_bytes_total': ('counter', 'Bytes ahorrados por la compresión (entrada - salida)'),
+    'techflow_compression_seconds': ('histogram', 'Tiempo de CPU comprimiendo cada respuesta'),
+    'techflow_profile_captures_total': ('counter', 'Peticiones guardadas en PROFILE_DIR por motivo (cabecera, admin, muestreo o lenta)'),
+}
+
+
+class Metricas:
+    """Registro de contadores e histogramas, seguro entre hilos"""
+
+    def __init__(self, buckets=BUCKETS_LATENCIA):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._contadores = {}
+        self._histogramas = {}
+
+    def inc(self, nombre, etiquetas, valor=1):
+        clave = (nombre, etiquetas)
+        with self._lock:
+            self._contadores[clave] = self._contadores.get(clave, 0) + valor
+
+    def observar(self, nombre, etiquetas, valor):
+        clave = (nombre, etiquetas)
+        with self._lock:
+            h = self._histogramas.get(clave)
+            if h is None:
+                h = self._histogramas[clave] = [0] * (len(self.buckets) + 2)
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    h[i] += 1
+                    break
+            h[-2] += valor
+            h[-1] += 1
+
+    def snapshot(self):
+        """Estado serializable a JSON (incluye contadores del pool y la caché)"""
+        with self._lock:
+            contadores = [[n, list(e), v] for (n, e), v in self._contadores.items()]
+            histogramas = [[n, list(e), list(h)] for (n, e), h in self._histogramas.items()]
+        pool = db_pool.stats()
+        cache = page_cache.stats()
+        contadores += [
+            ['techflow_db_pool_checkouts_total', [], pool['checkouts']],
+            ['techflow_db_pool_waits_total', [], pool['waits']],
+            ['techflow_db_pool_created_total', [], pool['created']],
+            ['techflow_page_cache_hits_total', [], cache['hits']],
+            ['techflow_page_cache_misses_total', [], cache['misses']],
+        ]
+        for limitador in (limitador_ip, limitador_usuario):
+            contadores.append(['techflow_login_limiter_keys', [['limitador', limitador.nombre]], limitador.claves()])
+        return {'contadores': contadores, 'histogramas': histogramas}
+
+    def volcar(self):
+        """Escribe el snapshot de este proceso en METRICS_DIR (atómicamente)"""
+        if not METRICS_DIR:
+            return
+        destino = os.path.join(METRICS_DIR, '%d.json' % os.getpid())
+        temporal = destino + '.tmp'
+        with open(temporal, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(temporal, destino)
+
+    def agregadas(self):
+        """Suma este proceso (en vivo) con los volcados de los demás"""
+        snapshots = [self.snapshot()]
+        if METRICS_DIR and os.path.isdir(METRICS_DIR):
+            propio = '%d.json' % os.getpid()
+            with bloqueo_metricas(fcntl.LOCK_SH):
+                for nombre in os.listdir(METRICS_DIR):
+                    if nombre.endswith('.json') and nombre != propio:
+                        try:
+                            with open(os.path.join(METRICS_DIR, nombre)) as f:
+                                snapshots.append(json.load(f))
+                        except (OSError, ValueError):
+                            pass
+        return sumar_snapshots(snapshots)
+
+    def texto_prometheus(self):
+        """Formato de exposición de texto de Prometheus (0.0.4)"""
+        contadores, histogramas = self.agregadas()
+        por_nombre = {}
+        for (nombre, etiquetas), valor in contadores.items():
+            por_nombre.setdefault(nombre, []).append((etiquetas, valor))
+        for (nombre, etiquetas), valores in histogramas.items():
+            por_nombre.setdefault(nombre, []).append((etiquetas, valores))
+        lineas = []
+        for nombre in sorted(por_nombre):
+            tipo, ayuda = DESCRIPCIONES.get(nombre, ('untyped', nombre))
+            lineas.append('# HELP %s %s' % (nombre, ayuda))
+            lineas.append('# TYPE %s %s' % (nombre, tipo))
+            for etiquetas, valor in sorted(por_nombre[nombre]):
+                if tipo != 'histogram':
+                    lineas.append('%s%s %s' % (nombre, formato_etiquetas(etiquetas), valor))
+                    continue
+                acumulado = 0
+                for limite, cuenta in zip(self.buckets + ('+Inf',), valor[:-2] + [valor[-1]]):
+                    acumulado = cuenta if limite == '+Inf' else acumulado + cuenta
+                    lineas.append('%s_bucket%s %s' % (nombre, formato_etiquetas(etiquetas + (('le', str(limite)),)), acumulado))
+                lineas.append('%s_sum%s %s' % (nombre, formato_etiquetas(etiquetas), valor[-2]))
+                lineas.append('%s_count%s %s' % (nombre, formato_etiquetas(etiquetas), valor[-1]))
+        return '\n'.join(lineas) + '\n'
+
+
+def sumar_snapshots(snapshots):
+    """Suma contadores e histogramas de varios snapshots por (nombre, etiquetas)"""
+    contadores = {}
+    histogramas = {}
+    for snap in snapshots:
+        for nombre, etiquetas, valor in snap['contadores']:
+            clave = (nombre, tuple(map(tuple, etiquetas)))
+            contadores[clave] = contadores.get(clave, 0) + valor
+        for nombre, etiquetas, valores in snap['histogramas']:
+            clave = (nombre, tuple(map(tuple, etiquetas)))
+            acumulado = histogramas.setdefault(clave, [0] * len(valores))
+            for i, v in enumerate(valores):
+                acumulado[i] += v
+    return contadores, histogramas
+
+@contextlib.contextmanager
+def bloqueo_metricas(modo):
+    """flock sobre METRICS_DIR/.lock: compartido para leer, exclusivo para consolidar"""
+    with open(os.path.join(METRICS_DIR, '.lock'), 'a') as f:
+        fcntl.flock(f, modo)
         try:
-            cursor.execute('''INSERT INTO servicios 
-                             (nombre, descripcion, precio, stock, promocion, icono) 
-                             VALUES (?, ?, ?, ?, ?, ?)''', servicio)
-        except:
-            pass  # Servicio ya existe
-    
-    conn.commit()
-    conn.close()
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
 
-def get_db_connection():
-    """Obtiene conexión a la base de datos"""
-    conn = sqlite3.connect('techflow.db')
-    conn.row_factory = sqlite3.Row
-    return conn
+def consolidar_metricas(pid):
+    """Suma el volcado de un worker terminado a retirados.json y lo borra.
 
-# RUTAS PRINCIPALES (MOCKUPS)
+    Los gauges del worker se descartan: describen un estado que ya no existe.
+    """
+    if not METRICS_DIR:
+        return
+    origen = os.path.join(METRICS_DIR, '%d.json' % pid)
+    destino = os.path.join(METRICS_DIR, 'retirados.json')
+    with bloqueo_metricas(fcntl.LOCK_EX):
+        try:
+            with open(origen) as f:
+                snapshots = [json.load(f)]
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError):
+            snapshots = []
+        try:
+            with open(destino) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            pass
+        contadores, histogramas = sumar_snapshots(snapshots)
+        retirados = {
+            'contadores': [[n, list(e), v] for (n, e), v in contadores.items()
+                           if DESCRIPCIONES.get(n, ('counter',))[0] != 'gauge'],
+            'histogramas': [[n, list(e), h] for (n, e), h in histogramas.items()],
+        }
+        with open(destino + '.tmp', 'w') as f:
+            json.dump(retirados, f)
+        os.replace(destino + '.tmp', destino)
+        os.remove(origen)
 
-@app.route('/')
-def home():
-    """MOCKUP 1: Página principal/home"""
-    return '''
-<!DOCTYPE html>
-<html lang="es">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>TechFlow Solutions - Home</title>
-    <style>
-        * { margin: 0; padding: 0; box-sizing: border-box; }
-        body { font-family: Arial, sans-serif; background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); min-height: 100vh; }
-        .header { background: rgba(255,255,255,0.95); padding: 1rem 2rem; position: fixed; width: 100%; top: 0; z-index: 1000; }
-        .navbar { display: flex; justify-content: space-between; align-items: center; max-width: 1200px; margin: 0 auto; }
-        .logo { font-size: 1.8rem; font-weight: bold; color: #667eea; }
-        .nav-links { display: flex; gap: 2rem; list-style: none; }
-        .nav-links a { text-decoration: none; color: #333; font-weight: 500; }
-        .nav-links a:hover { color: #667eea; }
-        .hero { text-align: center; padding: 8rem 2rem 4rem; color: white; }
-        .hero h1 { font-size: 3.5rem; margin-bottom: 1rem; text-shadow: 2px 2px 4px rgba(0,0,0,0.3); }
-        .hero p { font-size: 1.3rem; max-width: 600px; margin: 0 auto; }
-        .slider { background: rgba(255,255,255,0.1); backdrop-filter: blur(10px); border-radius: 15px; margin: 2rem auto; max-width: 800px; padding: 2rem; text-align: center; color: white; }
-        .company-info { background: rgba(255,255,255,0.95); margin: 3rem 2rem; padding: 3rem; border-radius: 15px; text-align: center; }
-        .stats { display: flex; justify-content: center; gap: 3rem; margin-top: 2rem; }
-        .stat h3 { font-size: 2rem; color: #667eea; }
-        .footer { background: rgba(0,0,0,0.8); color: white; padding: 2rem; text-align: center; margin-top: 3rem; }
-    </style>
-</head>
-<body>
-    <header class="header">
-        <nav class="navbar">
-            <div class="logo">TechFlow Solutions</div>
-            <ul class="nav-links">
-                <li><a href="/">Inicio</a></li>
-                <li><a href="/servicios">Servicios</a></li>
-                <li><a href="/login">Admin</a></li>
-            </ul>
-        </nav>
-    </header>
-
-    <main>
-        <section class="hero">
-            <h1>TechFlow Solutions</h1>
-            <p>Transformamos ideas en soluciones tecnológicas innovadoras que impulsan el crecimiento de tu negocio</p>
-        </section>
-
-        <section class="slider">
-            <h3>🚀 Innovación Tecnológica</h3>
-            <p>Desarrollamos software personalizado con las últimas tecnologías</p>
-        </section>
-
-        <section class="company-info">
-            <h2>¿Quiénes Somos?</h2>
-            <p>Somos una empresa líder en servicios tecnológicos con más de 10 años de experiencia. 
-            Nos especializamos en desarrollo de software, consultoría IT y soluciones digitales.</p>
-            
-            <div class="stats">
-                <div class="stat"><h3>500+</h3><p>Proyectos</p></div>
-                <div class="stat"><h3>50+</h3><p>Clientes</p></div>
-                <div class="stat"><h3>24/7</h3><p>Soporte</p></div>
-            </div>
-        </section>
-    </main>
-
-    <footer class="footer">
-        <p>&copy; 2024 TechFlow Solutions. Todos los derechos reservados.</p>
-        <p>📧 info@techflowsolutions.com | 📱 +57 300 123 4567</p>
-    </footer>
-</body>
-</html>
-    '''
+def formato_etiquetas(etiquetas):
+    if not etiquetas:
+        return ''
+    escapar = lambda v: str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{%s}' % ','.join('%s="%s"' % (k, escapar(v)) for k, v in etiquetas)
 
-@app.route('/servicios')
-def servicios():
-    """MOCKUP 2: Lista de servicios"""
-    conn = get_db_connection()
-    servicios = conn.execute('SELECT * FROM servicios ORDER BY id').fetchall()
-    conn.close()
-    
-    servicios_html = ''
-    for servicio in servicios:
-        servicios_html += f'''
-        <div class="service-card" onclick="location.href='/detalle/{servicio['id']}'">
-            <div class="service-icon">{servicio['icono']}</div>
-            <h3>{servicio['nombre']}</h3>
-            <p>{servicio['descripcion'][:50]}...</p>
-            <div class="price">${servicio['precio']:,.0f}</div>
-        </div>
-        '''
-    
-    return f'''
-<!DOCTYPE html>
-<html lang="es">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>TechFlow Solutions - Servicios</title>
-    <style>
-        * {{ margin: 0; padding: 0; box-sizing: border-box; }}
-        body {{ font-family: Arial, sans-serif; background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); min-height: 100vh; }}
-        .header {{ background: rgba(255,255,255,0.95); padding: 1rem 2rem; position: fixed; width: 100%; top: 0; z-index: 1000; }}
-        .navbar {{ display: flex; justify-content: space-between; align-items: center; max-width: 1200px; margin: 0 auto; }}
-        .logo {{ font-size: 1.8rem; font-weight: bold; color: #667eea; }}
-        .nav-links {{ display: flex; gap: 2rem; list-style: none; }}
-        .nav-links a {{ text-decoration: none; color: #333; font-weight: 500; }}
-        .nav-links a:hover {{ color: #667eea; }}
-        .hero {{ text-align: center; padding: 8rem 2rem 4rem; color: white; }}
-        .hero h1 {{ font-size: 3rem; margin-bottom: 1rem; text-shadow: 2px 2px 4px rgba(0,0,0,0.3); }}
-        .services-grid {{ display: grid; grid-template-columns: repeat(auto-fit, minmax(300px, 1fr)); gap: 2rem; padding: 2rem; max-width: 1200px; margin: 0 auto; }}
-        .service-card {{ background: rgba(255,255,255,0.95); border-radius: 15px; padding: 2rem; text-align: center; box-shadow: 0 10px 30px rgba(0,0,0,0.1); transition: transform 0.3s ease; cursor: pointer; }}
-        .service-card:hover {{ transform: translateY(-5px); }}
-        .service-icon {{ font-size: 3rem; margin-bottom: 1rem; }}
-        .service-card h3 {{ margin-bottom: 1rem; color: #333; }}
-        .price {{ font-size: 1.5rem; font-weight: bold; color: #667eea; }}
-    </style>
-</head>
-<body>
-    <header class="header">
-        <nav class="navbar">
-            <div class="logo">TechFlow Solutions</div>
-            <ul class="nav-links">
-                <li><a href="/">Inicio</a></li>
-                <li><a href="/servicios">Servicios</a></li>
-                <li><a href="/login">Admin</a></li>
-            </ul>
-        </nav>
-    </header>
-
-    <main>
-        <section class="hero">
-            <h1>Nuestros Servicios</h1>
-            <p>Soluciones tecnológicas completas para tu empresa</p>
-        </section>
-
-        <section class="services-grid">
-            {servicios_html}
-        </section>
-    </main>
-</body>
-</html>
-    '''
+# Máximo de sentencias distintas como etiqueta; el resto se agrupa en 'otras'
+SQL_MAX_ETIQUETAS = 256
+sentencias_etiquetadas = set()
 
-@app.route('/detalle/<int:servicio_id>')
-def detalle_servicio(servicio_id):
-    """MOCKUP 3: Detalle de servicio"""
-    conn = get_db_connection()
-    servicio = conn.execute('SELECT * FROM servicios WHERE id = ?', (servicio_id,)).fetchone()
-    conn.close()
-    
-    if not servicio:
-        return redirect(url_for('servicios'))
-    
-    promocion_badge = f'<span class="promotion-badge">¡En Promoción! 20% OFF</span>' if servicio['promocion'] else ''
-    
-    return f'''
-<!DOCTYPE html>
-<html lang="es">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>TechFlow Solutions - {servicio['nombre']}</title>
-    <style>
-        * {{ margin: 0; padding: 0; box-sizing: border-box; }}
-        body {{ font-family: Arial, sans-serif; background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); min-height: 100vh; }}
-        .header {{ background: rgba(255,255,255,0.95); padding: 1rem 2rem; position: fixed; width: 100%; top: 0; z-index: 1000; }}
-        .navbar {{ display: flex; justify-content: space-between; align-items: center; max-width: 1200px; margin: 0 auto; }}
-        .logo {{ font-size: 1.8rem; font-weight: bold; color: #667eea; }}
-        .nav-links {{ display: flex; gap: 2rem; list-style: none; }}
-        .nav-links a {{ text-decoration: none; color: #333; font-weight: 500; }}
-        .detail-container {{ max-width: 1000px; margin: 8rem auto 2rem; padding: 0 2rem; }}
-        .detail-header {{ background: rgba(255,255,255,0.95); border-radius: 15px; padding: 3rem; margin-bottom: 2rem; display: flex; align-items: center; gap: 2rem; }}
-        .detail-icon {{ font-size: 4rem; background: #667eea; color: white; width: 120px; height: 120px; border-radius: 15px; display: flex; align-items: center; justify-content: center; }}
-        .price {{ font-size: 1.5rem; font-weight: bold; color: #667eea; }}
-        .promotion-badge {{ background: #ff4757; color: white; padding: 0.5rem 1rem; border-radius: 20px; font-size: 0.9rem; margin-top: 1rem; display: inline-block; }}
-        .detail-content {{ background: rgba(255,255,255,0.95); border-radius: 15px; padding: 3rem; }}
-        .info-grid {{ display: grid; grid-template-columns: repeat(auto-fit, minmax(200px, 1fr)); gap: 1rem; margin: 2rem 0; }}
-        .info-item {{ background: #f8f9fa; padding: 1rem; border-radius: 8px; border-left: 4px solid #667eea; }}
-        .btn {{ padding: 1rem 2rem; border: none; border-radius: 8px; font-size: 1rem; cursor: pointer; margin: 0.5rem; }}
-        .btn-primary {{ background: #667eea; color: white; }}
-        .btn-secondary {{ background: #6c757d; color: white; }}
-    </style>
-</head>
-<body>
-    <header class="header">
-        <nav class="navbar">
-            <div class="logo">TechFlow Solutions</div>
-            <ul class="nav-links">
-                <li><a href="/">Inicio</a></li>
-                <li><a href="/servicios">Servicios</a></li>
-                <li><a href="/login">Admin</a></li>
-            </ul>
-        </nav>
-    </header>
-
-    <main>
-        <div class="detail-container">
-            <div class="detail-header">
-                <div class="detail-icon">{servicio['icono']}</div>
-                <div>
-                    <h1>{servicio['nombre']}</h1>
-                    <div class="price">${servicio['precio']:,.0f}</div>
-                    {promocion_badge}
-                </div>
-            </div>
-
-            <div class="detail-content">
-                <h3>Descripción del Servicio</h3>
-                <p>{servicio['descripcion']}</p>
-
-                <div class="info-grid">
-                    <div class="info-item">
-                        <strong>Servicios Disponibles:</strong><br>
-                        {servicio['stock']} proyectos
-                    </div>
-                    <div class="info-item">
-                        <strong>Tiempo de Entrega:</strong><br>
-                        4-6 semanas
-                    </div>
-                    <div class="info-item">
-                        <strong>Garantía:</strong><br>
-                        12 meses
-                    </div>
-                    <div class="info-item">
-                        <strong>Soporte:</strong><br>
-                        Incluido 6 meses
-                    </div>
-                </div>
-
-                <div style="margin-top: 2rem;">
-                    <button class="btn btn-primary">Solicitar Cotización</button>
-                    <button class="btn btn-secondary" onclick="window.history.back()">Volver</button>
-                </div>
-            </div>
-        </div>
-    </main>
-</body>
-</html>
-    '''
+@functools.lru_cache(maxsize=1024)
+def sql_normalizado(sql):
+    """Sentencia con espacios colapsados y listas de placeholders resumidas.
 
-@app.route('/login', methods=['GET', 'POST'])
-def login():
-    """MOCKUP 4: Login de administrador"""
-    if request.method == 'POST':
-        username = request.form['username']
-        password = request.form['password']
-        password_hash = hashlib.md5(password.encode()).hexdigest()
-        
-        conn = get_db_connection()
-        user = conn.execute('SELECT * FROM usuarios WHERE username = ? AND password = ?', 
-                           (username, password_hash)).fetchone()
-        conn.close()
-        
-        if user:
-            session['user_id'] = user['id']
-            session['username'] = user['username']
-            return redirect(url_for('admin'))
+    IN (?, ?, ?) y VALUES (?, ?), (?, ?) quedan como (?...) sin importar
+    cuántos elementos tengan, así el multi-get no crea una sentencia por
+    tamaño de lista.
+    """
+    texto = re.sub(r'\(\s*\?(?:\s*,\s*\?)*\s*\)', '(?...)', ' '.join(sql.split()))
+    return re.sub(r'\(\?\.\.\.\)(?:\s*,\s*\(\?\.\.\.\))+', '(?...)', texto)[:200]
+
+@functools.lru_cache(maxsize=1024)
+def etiqueta_sql(sql):
+    """Etiqueta de una sentencia: su texto normalizado, o 'otras' pasado SQL_MAX_ETIQUETAS"""
+    texto = sql_normalizado(sql)
+    if texto not in sentencias_etiquetadas:
+        if len(sentencias_etiquetadas) >= SQL_MAX_ETIQUETAS:
+            texto = 'otras'
         else:
-            error = 'Credenciales incorrectas'
-    else:
-        error = None
-    
-    error_msg = f'<div style="color: red; text-align: center; margin-bottom: 1rem;">{error}</div>' if error else ''
-    
-    return f'''
-<!DOCTYPE html>
-<html lang="es">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>TechFlow Solutions - Login Admin</title>
-    <style>
-        * {{ margin: 0; padding: 0; box-sizing: border-box; }}
-        body {{ font-family: Arial, sans-serif; background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); min-height: 100vh; display: flex; align-items: center; justify-content: center; }}
-        .login-container {{ background: rgba(255,255,255,0.95); border-radius: 15px; padding: 3rem; width: 400px; text-align: center; box-shadow: 0 20px 40px rgba(0,0,0,0.1); }}
-        .login-container h2 {{ color: #333; margin-bottom: 2rem; }}
-        .form-group {{ margin-bottom: 1.5rem; text-align: left; }}
-        .form-group label {{ display: block; margin-bottom: 0.5rem; font-weight: 500; }}
-        .form-group input {{ width: 100%; padding: 1rem; border: 2px solid #ddd; border-radius: 8px; font-size: 1rem; }}
-        .form-group input:focus {{ outline: none; border-color: #667eea; }}
-        .btn {{ width: 100%; padding: 1rem; background: #667eea; color: white; border: none; border-radius: 8px; font-size: 1rem; cursor: pointer; }}
-        .btn:hover {{ background: #5a6fd8; }}
-        .demo-info {{ background: #e7f3ff; padding: 1rem; border-radius: 8px; margin-top: 1rem; font-size: 0.9rem; }}
-    </style>
-</head>
-<body>
-    <div class="login-container">
-        <h2>🔐 Acceso Administrativo</h2>
-        {error_msg}
-        
-        <form method="POST">
-            <div class="form-group">
-                <label for="username">👤 Usuario:</label>
-                <input type="text" id="username" name="username" required>
-            </div>
-
-            <div class="form-group">
-                <label for="password">🔑 Contraseña:</label>
-                <input type="password" id="password" name="password" required>
-            </div>
-
-            <button type="submit" class="btn">Iniciar Sesión</button>
-        </form>
-
-        <div class="demo-info">
-            <strong>Credenciales de prueba:</strong><br>
-            Usuario: <strong>admin</strong><br>
-            Contraseña: <strong>admin123</strong>
-        </div>
-
-        <div style="margin-top: 1rem;">
-            <a href="/" style="color: #667eea; text-decoration: none;">← Volver al inicio</a>
-        </div>
-    </div>
-</body>
-</html>
-    '''
+            sentencias_etiquetadas.add(texto)
+    return (('statement', texto),)
 
-@app.route('/admin')
-def admin():
-    """MOCKUP 5: Panel de administración (CRUD)"""
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-    
-    conn = get_db_connection()
-    servicios = conn.execute('SELECT * FROM servicios ORDER BY id').fetchall()
-    conn.close()
-    
-    servicios_rows = ''
-    for servicio in servicios:
-        promocion_badge = '<span style="background: #d4edda; color: #155724; padding: 0.3rem 0.8rem; border-radius: 15px; font-size: 0.8rem;">Sí</span>' if servicio['promocion'] else '<span style="background: #f8d7da; color: #721c24; padding: 0.3rem 0.8rem; border-radius: 15px; font-size: 0.8rem;">No</span>'
-        
-        servicios_rows += f'''
-        <tr>
-            <td>{servicio['id']}</td>
-            <td>{servicio['icono']}</td>
-            <td>{servicio['nombre']}</td>
-            <td>${servicio['precio']:,.0f}</td>
-            <td>{servicio['stock']}</td>
-            <td>{promocion_badge}</td>
-            <td>
-                <a href="/admin/editar/{servicio['id']}" style="background: #17a2b8; color: white; padding: 0.5rem; border-radius: 5px; text-decoration: none; margin: 2px;">✏️</a>
-                <a href="/admin/eliminar/{servicio['id']}" onclick="return confirm('¿Eliminar este servicio?')" style="background: #dc3545; color: white; padding: 0.5rem; border-radius: 5px; text-decoration: none; margin: 2px;">🗑️</a>
-            </td>
-        </tr>
-        '''
-    
-    return f'''
-<!DOCTYPE html>
-<html lang="es">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>TechFlow Solutions - Panel Admin</title>
-    <style>
-        * {{ margin: 0; padding: 0; box-sizing: border-box; }}
-        body {{ font-family: Arial, sans-serif; background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); min-height: 100vh; padding-top: 80px; }}
-        .header {{ background: rgba(255,255,255,0.95); padding: 1rem 2rem; position: fixed; width: 100%; top: 0; z-index: 1000; }}
-        .navbar {{ display: flex; justify-content: space-between; align-items: center; max-width: 1200px; margin: 0 auto; }}
-        .logo {{ font-size: 1.8rem; font-weight: bold; color: #667eea; }}
-        .nav-links {{ display: flex; gap: 2rem; list-style: none; }}
-        .nav-links a {{ text-decoration: none; color: #333; font-weight: 500; }}
-        .container {{ max-width: 1200px; margin: 0 auto; padding: 0 2rem; }}
-        .admin-header {{ background: rgba(255,255,255,0.95); border-radius: 15px; padding: 2rem; margin-bottom: 2rem; display: flex; justify-content: space-between; align-items: center; }}
-        .crud-section {{ background: rgba(255,255,255,0.95); border-radius: 15px; padding: 2rem; }}
-        .crud-header {{ display: flex; justify-content: space-between; align-items: center; margin-bottom: 2rem; }}
-        .admin-table {{ width: 100%; border-collapse: collapse; background: white; border-radius: 8px; overflow: hidden; }}
-        .admin-table th, .admin-table td {{ padding: 1rem; text-align: left; border-bottom: 1px solid #ddd; }}
-        .admin-table th {{ background: #f8f9fa; font-weight: 600; }}
-        .admin-table tr:hover {{ background: #f8f9fa; }}
-        .btn {{ padding: 1rem 2rem; border: none; border-radius: 8px; font-size: 1rem; cursor: pointer; text-decoration: none; display: inline-block; }}
-        .btn-success {{ background: #28a745; color: white; }}
-        .btn-secondary {{ background: #6c757d; color: white; }}
-        .stat-badge {{ background: #667eea; color: white; padding: 0.5rem 1rem; border-radius: 20px; font-size: 0.9rem; margin-left: 1rem; }}
-    </style>
-</head>
-<body>
-    <header class="header">
-        <nav class="navbar">
-            <div class="logo">TechFlow Solutions</div>
-            <ul class="nav-links">
-                <li><a href="/">Inicio</a></li>
-                <li><a href="/servicios">Servicios</a></li>
-                <li><a href="/logout">Cerrar Sesión</a></li>
-            </ul>
-        </nav>
-    </header>
-
-    <main>
-        <div class="container">
-            <div class="admin-header">
-                <h1>🛠️ Panel de Administración</h1>
-                <div>
-                    <span class="stat-badge">Admin: {session['username']}</span>
-                </div>
-            </div>
-
-            <section class="crud-section">
-                <div class="crud-header">
-                    <h2>Gestión de Servicios</h2>
-                    <a href="/admin/agregar" class="btn btn-success">➕ Nuevo Servicio</a>
-                </div>
-
-                <div style="overflow-x: auto;">
-                    <table class="admin-table">
-                        <thead>
-                            <tr>
-                                <th>ID</th>
-                                <th>Icono</th>
-                                <th>Nombre</th>
-                                <th>Precio</th>
-                                <th>Stock</th>
-                                <th>Promoción</th>
-                                <th>Acciones</th>
-                            </tr>
-                        </thead>
-                        <tbody>
-                            {servicios_rows}
-                        </tbody>
-                    </table>
-                </div>
-            </section>
-        </div>
-    </main>
-</body>
-</html>
-    '''
 
-# RUTAS CRUD ADICIONALES
+metricas = Metricas()
 
-@app.route('/admin/agregar', methods=['GET', 'POST'])
-def agregar_servicio():
-    """Agregar nuevo servicio"""
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-    
-    if request.method == 'POST':
-        nombre = request.form['nombre']
-        descripcion = request.form['descripcion']
-        precio = float(request.form['precio'])
-        stock = int(request.form['stock'])
-        promocion = 1 if 'promocion' in request.form else 0
-        icono = request.form['icono']
-        
-        conn = get_db_connection()
-        conn.execute('''INSERT INTO servicios (nombre, descripcion, precio, stock, promocion, icono) 
-                       VALUES (?, ?, ?, ?, ?, ?)''', 
-                    (nombre, descripcion, precio, stock, promocion, icono))
-        conn.commit()
-        conn.close()
-        
-        return redirect(url_for('admin'))
-    
-    return '''
-<!DOCTYPE html>
-<html lang="es">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Agregar Servicio</title>
-    <style>
-        * { margin: 0; padding: 0; box-sizing: border-box; }
-        body { font-family: Arial, sans-serif; background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); min-height: 100vh; padding: 2rem; }
-        .container { max-width: 600px; margin: 0 auto; background: rgba(255,255,255,0.95); border-radius: 15px; padding: 3rem; }
-        .form-group { margin-bottom: 1.5rem; }
-        .form-group label { display: block; margin-bottom: 0.5rem; font-weight: 500; }
-        .form-group input, .form-group textarea { width: 100%; padding: 1rem; border: 2px solid #ddd; border-radius: 8px; font-size: 1rem; }
-        .form-group input:focus, .form-group textarea:focus { outline: none; border-color: #667eea; }
-        .btn { padding: 1rem 2rem; border: none; border-radius: 8px; font-size: 1rem; cursor: pointer; margin-right: 1rem; }
-        .btn-primary { background: #667eea; color: white; }
-        .btn-secondary { background: #6c757d; color: white; text-decoration: none; display: inline-block; text-align: center; }
-    </style>
-</head>
-<body>
-    <div class="container">
-        <h2>➕ Agregar Nuevo Servicio</h2>
-        
-        <form method="POST">
-            <div class="form-group">
-                <label>Nombre del Servicio:</label>
-                <input type="text" name="nombre" required>
-            </div>
-            
-            <div class="form-group">
-                <label>Icono (emoji):</label>
-                <input type="text" name="icono" maxlength="2" value="🔧">
-            </div>
-            
-            <div class="form-group">
-                <label>Precio:</label>
-                <input type="number" name="precio" required>
-            </div>
-            
-            <div class="form-group">
-                <label>Stock:</label>
-                <input type="number" name="stock" required>
-            </div>
-            
-            <div class="form-group">
-                <label>Descripción:</label>
-                <textarea name="descripcion" rows="3"></textarea>
-            </div>
-            
-            <div class="form-group">
-                <label>
-                    <input type="checkbox" name="promocion"> En promoción
-                </label>
-            </div>
-            
-            <button type="submit" class="btn btn-primary">💾 Guardar</button>
-            <a href="/admin" class="btn btn-secondary">❌ Cancelar</a>
-        </form>
-    </div>
-</body>
-</html>
-    '''
 
-@app.route('/admin/eliminar/<int:servicio_id>')
-def eliminar_servicio(servicio_id):
-    """Eliminar servicio"""
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-    
-    conn = get_db_connection()
-    conn.execute('DELETE FROM servicios WHERE id = ?', (servicio_id,))
-    conn.commit()
-    conn.close()
-    
-    return redirect(url_for('admin'))
+class MeteredCursor(sqlite3.Cursor):
+    """Cursor que registra el tiempo de execute() y las filas leídas"""
 
-@app.route('/logout')
-def logout():
-    """Cerrar sesión"""
-    session.clear()
-    return redirect(url_for('home'))
+    _etiquetas = ()
+    _sql = ''
+    _registro = None
 
-# API JSON para datos
-@app.route('/api/servicios')
-def api_servicios():
-    """API REST para obtener servicios en JSON"""
-    conn = get_db_connection()
-    servicios = conn.execute('SELECT * FROM servicios').fetchall()
-    conn.close()
-    
-    servicios_list = []
-    for servicio in servicios:
-        servicios_list.append({
-            'id': servicio['id'],
-            'nombre': servicio['nombre'],
-            'descripcion': servicio['descripcion'],
-            'precio': servicio['precio'],
-            'stock': servicio['stock'],
-            'promocion': bool(servicio['promocion']),
-            'icono': servicio['icono']
-        })
-    
-    return jsonify(servicios_list)
+    def execute(self, sql, params=()):
+        self._sql = sql_normalizado(sql)
+        self._etiquetas = etiqueta_sql(sql)
+        inicio = time.perf_counter()
+        try:
+            return super().execute(sql, params)
+        finally:
+            self._medir(inicio)
 
-if __name__ == '__main__':
-    # Inicializar base de datos
-    init_db()
-    print("✅ Base de datos inicializada")
-    print("🚀 Servidor iniciando en http://localhost:5000")
-    print("📝 Credenciales: admin / admin123")
-    
-    # Ejecutar servidor
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    def executemany(self, sql, filas):
+        self._sql = sql_normalizado(sql)
+        self._etiquetas = etiqueta_sql(sql)
+        inicio = time.perf_counter()
+        try:
+            return super().executemany(sql, filas)
+        finally:
+            self._medir(inicio)
+
+    def _medir(self, inicio):
+        duracion = time.perf_counter() - inicio
+        metricas.observar('techflow_db_statement_duration_seconds', self._etiquetas, duracion)
+        if self.rowcount > 0:
+            metricas.inc('techflow_db_rows_total', self._etiquetas, self.rowcount)
+        captura = getattr(peticion_en_curso, 'captura', None)
+        if captura is not None:
+            self._registro = captura.registrar_sql(self._sql, duracion, max(self.rowcount, 0))
+
+    def _leidas(self, filas, inicio):
+        duracion = time.perf_counter() - inicio
+        metricas.inc('techflow_db_fetch_seconds_total', self._etiquetas, duracion)
+        if filas:
+            metricas.inc('techflow_db_rows_total', self._etiquetas, filas)
+        if self._registro is not None:
+            self._registro['lectura_ms'] += duracion * 1000
+            self._registro['filas'] += filas
+
+    def fetchone(self):
+        inicio = time.perf_counter()
+        fila = super().fetchone()
+        self._leidas(0 if fila is None else 1, inicio)
+        return fila
+
+    def fetchmany(self, size=None):
+        inicio = time.perf_counter()
+        filas = super().fetchmany(self.arraysize if size is None else size)
+        self._leidas(len(filas), inicio)
+        return filas
+
+    def fetchall(self):
+        inicio = time.perf_counter()
+        filas = super().fetchall()
+        self._leidas(len(filas), inicio)
+        return filas
+
+
+class MetricsMiddleware:
+    """Middleware WSGI: cuenta peticiones y mide la latencia hasta cerrar la respuesta.
+
+    Se mide en close() del iterable y no en after_request para que las
+    respuestas en streaming cuenten su duración completa.
+    """
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        inicio = time.perf_counter()
+        estado = ['500']
+
+        def start(status, headers, exc_info=None):
+            estado[0] = status.split(' ', 1)[0]
+            return start_response(status, headers, exc_info)
+
+        cuerpo = self.wsgi_app(environ, start)
+        try:
+            yield from cuerpo
+        finally:
+            if hasattr(cuerpo, 'close'):
+                cuerpo.close()
+            contar_peticion(environ.get('techflow.endpoint') or 'desconocido', environ['REQUEST_METHOD'],
+                            estado[0], time.perf_counter() - inicio)
+
+
+def contar_peticion(endpoint, metodo, estado, duracion):
+    metricas.inc('techflow_http_requests_total', (('endpoint', endpoint), ('method', metodo), ('status', estado)))
+    metricas.observar('techflow_http_request_duration_seconds', (('endpoint', endpoint),), duracion)
+
+
+app.wsgi_app = MetricsMiddleware(app.wsgi_app)
+
+@app.before_request
+def anotar_endpoint():
+    request.environ['techflow.endpoint'] = request.endpoint
+
+# PERFILADO DE PETICIONES
+# Cada petición WSGI lleva una CapturaPeticion con sus sentencias SQL y,
+# mientras dura, un hilo muestrea su pila cada PROFILE_INTERVAL_MS. Si
+# tarda más de SLOW_REQUEST_MS se guarda en PROFILE_DIR con las pilas
+# muestreadas; si no, se descarta (SSE y exportaciones en streaming no
+# cuentan, ver es_respuesta_continua). Una petición también puede pedir
+# cProfile completo: con la cabecera X-Profile (sesión de admin o
+# PROFILE_TOKEN), con el interruptor de /admin/perfiles o por sorteo con
+# probabilidad PROFILE_SAMPLE; esas se guardan siempre. Las vistas async
+# de `serve --async` no pasan por aquí.
+
+peticion_en_curso = threading.local()
+# Hilo -> captura de las peticiones en curso; el muestreador las recorre con el lock tomado
+capturas_activas = {}
+lock_muestreo = threading.Lock()
+numeros_captura = itertools.count(1)
+
+
+class CapturaPeticion:
+    """SQL, pilas muestreadas y perfil cProfile de una petición en curso"""
+
+    MAX_SQL = 200
+
+    def __init__(self, environ):
+        self.environ = environ
+        self.inicio = time.perf_counter()
+        self.sql = []
+        self.sql_omitidas = 0
+        self.pilas = {}
+        self.perfil = None
+        self.motivo = None
+        self.respuesta_continua = False
+
+    def registrar_sql(self, sql, duracion, filas):
+        if len(self.sql) >= self.MAX_SQL:
+            self.sql_omitidas += 1
+            return None
+        registro = {'sql': sql, 'ms': duracion * 1000, 'lectura_ms': 0.0, 'filas': filas}
+        self.sql.append(registro)
+        return registro
+
+    def perfilar(self, motivo):
+        """Activa cProfile en el hilo actual (solo uno a la vez por hilo)"""
+        perfil = cProfile.Profile()
+        try:
+            perfil.enable()
+        except ValueError:  # otro perfilador ya está activo
+            return
+        self.perfil, self.motivo = perfil, motivo
+
+    def terminar(self, estado):
+        """Detiene cProfile y guarda la captura si corresponde; devuelve su nombre o None"""
+        if self.perfil is not None:
+            self.perfil.disable()
+        duracion = time.perf_counter() - self.inicio
+        lenta = SLOW_REQUEST_MS > 0 and duracion * 1000 >= SLOW_REQUEST_MS and not self.respuesta_continua
+        if self.motivo is None and not lenta:
+            return None
+        motivo = self.motivo or 'lenta'
+        nombre = '%s-%d-%06d' % (time.strftime('%Y%m%d-%H%M%S'), os.getpid(), next(numeros_captura))
+        datos = {
+            'nombre': nombre,
+            'fecha': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'motivo': motivo,
+            'metodo': self.environ['REQUEST_METHOD'],
+            'ruta': self.environ.get('PATH_INFO', ''),
+            'query': self.environ.get('QUERY_STRING', ''),
+            'endpoint': self.environ.get('techflow.endpoint'),
+            'estado': estado,
+            'duracion_ms': round(duracion * 1000, 3),
+            'sql_total_ms': round(sum(r['ms'] + r['lectura_ms'] for r in self.sql), 3),
+            'sql_omitidas': self.sql_omitidas,
+            'sql': [dict(r, ms=round(r['ms'], 3), lectura_ms=round(r['lectura_ms'], 3)) for r in self.sql],
+        }
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        if self.perfil is not None:
+            datos['perfil'] = nombre + '.prof'
+            self.perfil.dump_stats(os.path.join(PROFILE_DIR, datos['perfil']))
+            datos['funciones'] = resumen_perfil(self.perfil.stats)
+        elif self.pilas:
+            datos['perfil'] = nombre + '.pilas.txt'
+            lineas = ''.join('%s %d\n' % (pila, n) for pila, n in
+                             sorted(self.pilas.items(), key=lambda item: item[1], reverse=True))
+            escribir_atomico(os.path.join(PROFILE_DIR, datos['perfil']), lineas.encode())
+            datos['muestras'] = sum(self.pilas.values())
+        escribir_atomico(os.path.join(PROFILE_DIR, nombre + '.json'),
+                         json.dumps(datos, ensure_ascii=False, indent=1).encode())
+        metricas.inc('techflow_profile_captures_total', (('motivo', motivo),))
+        rotar_capturas()
+        return nombre
+
+
+def resumen_perfil(stats, n=30):
+    """Las n funciones con más tiempo acumulado de un perfil de cProfile"""
+    filas = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:n]
+    return [{'funcion': '%s:%d(%s)' % (os.path.basename(archivo), linea, funcion), 'llamadas': nc,
+             'propio_ms': round(tt * 1000, 3), 'acumulado_ms': round(ct * 1000, 3)}
+            for (archivo, linea, funcion), (cc, nc, tt, ct, _) in filas]
+
+def rotar_capturas():
+    """Borra las capturas más viejas de PROFILE_DIR por encima de PROFILE_KEEP"""
+    nombres = sorted(listar_nombres_capturas(), reverse=True)
+    for nombre in nombres[PROFILE_KEEP:]:
+        for sufijo in ('.json', '.prof', '.pilas.txt'):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, nombre + sufijo))
+            except FileNotFoundError:
+                pass
+
+def listar_nombres_capturas():
+    try:
+        return [archivo[:-5] for archivo in os.listdir(PROFILE_DIR) if archivo.endswith('.json')]
+    except FileNotFoundError:
+        return []
+
+def pila_colapsada(marco, hasta):
+    """Pila de un hilo en formato colapsado (raíz;...;hoja) desde el marco `hasta`"""
+    funciones = []
+    while marco is not None and marco.f_code is not hasta:
+        codigo = marco.f_code
+        funciones.append('%s:%s' % (os.path.basename(codigo.co_filename), getattr(codigo, 'co_qualname', codigo.co_name)))
+        marco = marco.f_back
+    return ';'.join(reversed(funciones))
+
+def muestrear_pilas():
+    """Hilo de fondo: suma una muestra de pila a cada petición en curso sin cProfile"""
+    hasta = PerfiladoMiddleware.__call__.__code__
+    while True:
+        time.sleep(PROFILE_INTERVAL_MS / 1000)
+        with lock_muestreo:
+            if capturas_activas:
+                sumar_muestra(hasta)
+
+def sumar_muestra(hasta):
+    """Una muestra de pila por petición en curso (con lock_muestreo tomado).
+
+    Los marcos no deben sobrevivir a la muestra: uno retenido hasta la
+    siguiente mantiene vivas sus variables locales, y un cursor con la
+    sentencia sin terminar hace fallar el COMMIT de su conexión.
+    """
+    marcos = sys._current_frames()
+    for ident, captura in capturas_activas.items():
+        marco = marcos.get(ident)
+        if marco is None or captura.perfil is not None or captura.respuesta_continua:
+            continue
+        pila = pila_colapsada(marco, hasta)
+        captura.pilas[pila] = captura.pilas.get(pila, 0) + 1
+
+def es_respuesta_continua(headers):
+    """¿Respuesta en streaming cuya duración depende del cliente (SSE, exportaciones)?
+
+    Un SSE dura a propósito y una exportación completa, o una descarga
+    hacia un cliente lento, tarda lo que tarda el cliente en leerla: no son
+    peticiones lentas. Las páginas HTML en streaming sí cuentan.
+    """
+    cabeceras = {n.lower(): v for n, v in headers}
+    tipo = cabeceras.get('content-type', '')
+    if tipo.startswith('text/event-stream') or cabeceras.get('content-disposition', '').startswith('attachment'):
+        return True
+    # ?stream= de /api/servicios y /admin/exportar: sin Content-Length
+    return 'content-length' not in cabeceras and tipo.startswith(('application/json', 'application/x-ndjson', 'text/csv'))
+
+
+class PerfiladoMiddleware:
+    """Middleware WSGI: abre la captura de cada petición y la cierra al terminar la respuesta"""
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+        self._muestreo = None
+
+    def __call__(self, environ, start_response):
+        if self._muestreo is None and SLOW_REQUEST_MS > 0:
+            with lock_muestreo:
+                if self._muestreo is None:
+                    self._muestreo = threading.Thread(target=muestrear_pilas, daemon=True, name='techflow-muestreo')
+                    self._muestreo.start()
+        captura = CapturaPeticion(environ)
+        estado = ['500']
+
+        def start(status, headers, exc_info=None):
+            estado[0] = status.split(' ', 1)[0]
+            captura.respuesta_continua = es_respuesta_continua(headers)
+            return start_response(status, headers, exc_info)
+
+        ident = threading.get_ident()
+        peticion_en_curso.captura = captura
+        with lock_muestreo:
+            capturas_activas[ident] = captura
+        try:
+            cuerpo = self.wsgi_app(environ, start)
+            try:
+                yield from cuerpo
+            finally:
+                if hasattr(cuerpo, 'close'):
+                    cuerpo.close()
+        finally:
+            with lock_muestreo:
+                capturas_activas.pop(ident, None)
+            peticion_en_curso.captura = None
+            try:
+                captura.terminar(estado[0])
+            except OSError:
+                app.logger.exception('No se pudo guardar la captura de perfilado')
+
+
+app.wsgi_app = PerfiladoMiddleware(app.wsgi_app)
+
+def motivo_perfil(peticion):
+    """Por qué perfilar esta petición con cProfile, o None"""
+    cabecera = peticion.headers.get('X-Profile')
+    con_cookie = app.config['SESSION_COOKIE_NAME'] in peticion.cookies
+    if cabecera:
+        # `in` no marca la sesión como leída, así que no agrega Vary: Cookie
+        if (con_cookie and 'user_id' in session) or (
+                PROFILE_TOKEN and hmac.compare_digest(cabecera.encode(), PROFILE_TOKEN.encode())):
+            return 'cabecera'
+    if con_cookie and 'perfilar' in session:
+        return 'admin'
+    if PROFILE_SAMPLE > 0 and random.random() < PROFILE_SAMPLE:
+        return 'muestreo'
+    return None
+
+@app.before_request
+def perfilar_si_se_pide():
+    captura = getattr(peticion_en_curso, 'captura', None)
+    if captura is not None and captura.perfil is None:
+        motivo = motivo_perfil(request)
+        if motivo:
+            captura.perfilar(motivo)
+
+def volcar_metricas_periodicamente():
+    """Hilo de fondo de cada worker que mantiene al día su archivo de métricas"""
+    def bucle():
+        while True:
+            time.sleep(METRICS_FLUSH)
+            try:
+                metricas.volcar()
+            except OSError:
+                pass
+    threading.Thread(target=bucle, daemon=True).start()
+
+# POOL DE CONEXIONES
+
+class PooledConnection(sqlite3.Connection):
+    """Conexión SQLite cuyo close() la devuelve al pool en lugar de cerrarla"""
+
+    _pool = None
+    _owner = None
+    _depth = 0
+
+    def cursor(self, factory=MeteredCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, filas):
+        return self.cursor().executemany(sql, filas)
+
+    def close(self):
+        if self._pool is None:
+            super().close()
+        else:
+            self._pool.release(self)
+
+    def close_real(self):
+        """Cierra de verdad la conexión subyacente"""
+        super().close()
+
+
+class PoolTimeout(RuntimeError):
+    """No se liberó ninguna conexión dentro del tiempo de espera"""
+
+
+class ConnectionPool:
+    """Pool acotado de conexiones SQLite reutilizables, una por hilo.
+
+    Cada hilo recibe siempre la misma conexión mientras la tenga prestada
+    (las llamadas anidadas a get_db_connection() no abren otra). Al liberarla
+    vuelve a una pila de conexiones ociosas que reutiliza el siguiente hilo,
+    de modo que los PRAGMA y la caché de sentencias se pagan una sola vez.
+    """
+
+    PRAGMAS = (
+        'PRAGMA journal_mode = WAL',
+        'PRAGMA synchronous = NORMAL',
+        'PRAGMA busy_timeout = 5000',
+        'PRAGMA mmap_size = 268435456',
+        'PRAGMA temp_store = MEMORY',
+        'PRAGMA cache_size = -16000',
+    )
+
+    def __init__(self, database, max_size=8, timeout=10.0, cached_statements=256):
+        self.database = database
+        self.max_size = max_size
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        self._cond = threading.Condition()
+        self._idle = []
+        self._held = {}
+        self._total = 0
+        self._closed = False
+        self._checkouts = 0
+        self._reused = 0
+        self._reentrant = 0
+        self._created = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._timeouts = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.database, factory=PooledConnection,
+                               check_same_thread=False,
+                               cached_statements=self.cached_statements)
+        conn.row_factory = sqlite3.Row
+        for pragma in self.PRAGMAS:
+            # Varios devuelven una fila: una sentencia de escritura sin
+            # terminar hace fallar los COMMIT de la conexión mientras algo
+            # retenga el cursor (p. ej. el marco que muestrea el perfilador)
+            conn.execute(pragma).fetchall()
+        conn._pool = self
+        return conn
+
+    def acquire(self):
+        """Presta una conexión al hilo actual"""
+        ident = threading.get_ident()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('El pool de conexiones está cerrado')
+            self._checkouts += 1
+            conn = self._held.get(ident)
+            if conn is not None:
+                conn._depth += 1
+                self._reentrant += 1
+                return conn
+            if not self._idle and self._total >= self.max_size:
+                self._waits += 1
+                inicio = time.monotonic()
+                ok = self._cond.wait_for(
+                    lambda: self._idle or self._total < self.max_size or self._closed,
+                    self.timeout)
+                self._wait_time += time.monotonic() - inicio
+                if not ok or self._closed:
+                    self._timeouts += 1
+                    raise PoolTimeout('Sin conexiones libres tras %.1fs' % self.timeout)
+            if self._idle:
+                conn = self._idle.pop()
+                self._reused += 1
+            else:
+                self._total += 1
+                self._created += 1
+        if conn is None:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._total -= 1
+                    self._cond.notify()
+                raise
+        conn._owner = ident
+        conn._depth = 1
+        with self._cond:
+            self._held[ident] = conn
+        return conn
+
+    def release(self, conn):
+        """Devuelve una conexión al pool (o baja un nivel si está anidada)"""
+        with self._cond:
+            if conn._owner is None:
+                return
+            conn._depth -= 1
+            if conn._depth > 0:
+                return
+            self._held.pop(conn._owner, None)
+            conn._owner = None
+        if conn.in_transaction:
+            conn.rollback()
+        with self._cond:
+            if self._closed:
+                self._total -= 1
+                conn.close_real()
+            else:
+                self._idle.append(conn)
+            self._cond.notify()
+
+    def release_thread(self):
+        """Libera la conexión que el hilo actual haya dejado prestada"""
+        with self._cond:
+            conn = self._held.get(threading.get_ident())
+            if conn is not None:
+                conn._depth = 1
+        if conn is not None:
+            self.release(conn)
+
+    def close_all(self):
+        """Cierra las conexiones ociosas; las prestadas se cierran al liberarse"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._total -= len(idle)
+            self._cond.notify_all()
+        for conn in idle:
+            conn.close_real()
+
+    def stats(self):
+        """Estadísticas para dimensionar el pool"""
+        with self._cond:
+            checkouts = self._checkouts
+            return {
+                'max_size': self.max_size,
+                'open': self._total,
+                'idle': len(self._idle),
+                'in_use': len(self._held),
+                'checkouts': checkouts,
+                'reused': self._reused,
+                'reentrant': self._reentrant,
+                'created': self._created,
+                'waits': self._waits,
+                'wait_time_ms': round(self._wait_time * 1000, 3),
+                'timeouts': self._timeouts,
+                'hit_rate': round((self._reused + self._reentrant) / checkouts, 4) if checkouts else 0.0,
+            }
+
+
+db_pool = ConnectionPool(DATABASE, max_size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT)
+
+def get_db_connection():
+    """Obtiene una conexión del pool (close() la devuelve al pool)"""
+    return db_pool.acquire()
+
+def iterar_servicios(bloque=1000):
+    """Generador con todos los servicios en orden de id, por bloques.
+
+    Cada bloque es una consulta aparte (WHERE id > último id) y la
+    conexión vuelve al pool en cuanto se lee: una exportación hacia un
+    cliente lento no retiene una conexión ni una lectura abierta que
+    frene el checkpoint del WAL. Ninguna fila sale dos veces; las que se
+    escriban mientras tanto pueden salir o no.
+    """
+    ultimo_id = 0
+    while True:
+        conn = get_db_connection()
+        try:
+            filas = conn.execute('SELECT * FROM servicios WHERE id > ? ORDER BY id LIMIT ?',
+                                 (ultimo_id, bloque)).fetchall()
+        finally:
+            conn.close()
+        yield from filas
+        if len(filas) < bloque:
+            break
+        ultimo_id = filas[-1]['id']
+
+@app.teardown_request
+def liberar_conexion(exc):
+    """Recupera conexiones que una ruta haya dejado sin cerrar (p. ej. por una excepción)"""
+    db_pool.release_thread()
+
+# CACHÉ DE PÁGINAS RENDERIZADAS
+
+class PageCache:
+    """Caché LRU en memoria acotada por bytes (no por número de entradas)"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, clave):
+        with self._lock:
+            entrada = self._entries.get(clave)
+            if entrada is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(clave)
+            self.hits += 1
+            return entrada[0]
+
+    def put(self, clave, valor):
+        tamano = len(valor) if isinstance(valor, bytes) else len(valor.encode('utf-8'))
+        if tamano > self.max_bytes:
+            return valor
+        with self._lock:
+            anterior = self._entries.pop(clave, None)
+            if anterior is not None:
+                self._bytes -= anterior[1]
+            self._entries[clave] = (valor, tamano)
+            self._bytes += tamano
+            while self._bytes > self.max_bytes:
+                _, (_, liberado) = self._entries.popitem(last=False)
+                self._bytes -= liberado
+                self.evictions += 1
+        return valor
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            consultas = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / consultas, 4) if consultas else 0.0,
+            }
+
+
+class CatalogState:
+    """Versión y fecha de última modificación del catálogo.
+
+    Las mantiene la tabla catalogo_estado (por triggers), así que son las
+    mismas en todos los procesos y sobreviven a un reinicio. Se guardan en
+    memoria y solo se vuelven a leer tras una escritura local o cuando
+    pasan CATALOG_STATE_TTL segundos, para detectar escrituras de otros
+    procesos sin consultar la base en cada petición.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._version = None
+        self._updated_at = None
+        self._checked = 0.0
+
+    def vigente(self):
+        """(version, updated_at) si la copia en memoria no venció; si no, None"""
+        with self._lock:
+            if self._version is not None and time.monotonic() - self._checked < self.ttl:
+                return self._version, self._updated_at
+        return None
+
+    def actual(self):
+        """Devuelve (version, updated_at como datetime UTC)"""
+        vigente = self.vigente()
+        if vigente is not None:
+            return vigente
+        conn = get_db_connection()
+        fila = conn.execute('SELECT version, updated_at FROM catalogo_estado WHERE id = 1').fetchone()
+        conn.close()
+        updated_at = fecha_sqlite(fila['updated_at'])
+        with self._lock:
+            self._version, self._updated_at = fila['version'], updated_at
+            self._checked = time.monotonic()
+        return self._version, self._updated_at
+
+    @property
+    def version(self):
+        return self.actual()[0]
+
+    def invalidate(self):
+        with self._lock:
+            self._version = None
+
+
+page_cache = PageCache(PAGE_CACHE_BYTES)
+# Despierta a los streams SSE tras una escritura local (las de otros
+# procesos se detectan por catalog_state en cada espera)
+cambios_nuevos = threading.Condition()
+fragment_cache = PageCache(PAGE_CACHE_BYTES // 4)
+catalog_state = CatalogState(CATALOG_STATE_TTL)
+
+def invalidar_catalogo():
+    """Llamar después de cada escritura sobre servicios.
+
+    No vacía page_cache: las claves de cada página llevan la versión de lo
+    que muestran (ver pagina_cacheada), así que una reserva solo deja
+    atrás la página de detalle del servicio reservado y las entradas que
+    quedan viejas salen por LRU.
+    """
+    catalog_state.invalidate()
+    with cambios_nuevos:
+        cambios_nuevos.notify_all()
+
+def pagina_cacheada(clave, renderizar):
+    """Devuelve la página de la caché o la renderiza y la guarda.
+
+    La clave debe terminar en la versión de los datos que muestra la
+    página, leída antes de consultarlos, así una escritura concurrente
+    nunca deja una página vieja bajo la versión nueva: version_paginas de
+    la foto para las listas, la version de la fila para un detalle.
+    renderizar() puede devolver una respuesta que no sea str (p. ej. una
+    redirección); esas no se guardan.
+    """
+    html = page_cache.get(clave)
+    if html is None:
+        html = renderizar()
+        if isinstance(html, str):
+            page_cache.put(clave, html)
+        elif not isinstance(html, Response):
+            return Response(cachear_al_terminar(clave, html), mimetype='text/html')
+    return html
+
+def cachear_al_terminar(clave, flujo):
+    """Reenvía un flujo de HTML y, si se completó, lo guarda en la caché.
+
+    Deja de acumular en cuanto la página supera el tamaño de la caché,
+    para que las páginas enormes se sirvan en streaming sin retenerlas.
+    """
+    partes = []
+    tamano = 0
+    for parte in flujo:
+        if partes is not None:
+            partes.append(parte)
+            tamano += len(parte)
+            if tamano > page_cache.max_bytes:
+                partes = None
+        yield parte
+    if partes is not None:
+        page_cache.put(clave, ''.join(partes))
+
+def fragmento_cacheado(servicio, renderizar):
+    """Fragmento HTML por servicio, indexado por el contenido de la fila.
+
+    No depende de la versión del catálogo: tras una escritura solo se
+    vuelven a formatear las tarjetas cuyos datos cambiaron.
+    """
+    clave = tuple(servicio)
+    html = fragment_cache.get(clave)
+    if html is None:
+        html = fragment_cache.put(clave, renderizar(servicio))
+    return html
+
+# CATÁLOGO EN MEMORIA
+# Las lecturas de /servicios, /detalle y /api/servicios salen de una copia
+# en memoria de la tabla servicios. Medido con tracemalloc, 100k servicios
+# con descripciones de ~25 caracteres ocupan unos 53 MB: 10 MB de registros
+# (~104 bytes cada uno con __slots__; un dict por fila serían 28 MB),
+# 9 MB de índices (dict por id y cinco listas ordenadas) y el resto en las
+# cadenas y números de cada fila.
+
+class Servicio:
+    """Fila de servicios en memoria; se accede como atributo o como sqlite3.Row"""
+
+    __slots__ = ('id', 'nombre', 'descripcion', 'precio', 'stock', 'promocion', 'icono', 'updated_at', 'version')
+
+    def __init__(self, id, nombre, descripcion, precio, stock, promocion, icono, updated_at, version):
+        self.id = id
+        self.nombre = nombre
+        self.descripcion = descripcion
+        self.precio = precio
+        self.stock = stock
+        self.promocion = promocion
+        self.icono = icono
+        self.updated_at = updated_at
+        self.version = version
+
+    def __getitem__(self, campo):
+        return getattr(self, campo)
+
+    def __iter__(self):
+        return (getattr(self, campo) for campo in self.__slots__)
+
+    def keys(self):
+        return self.__slots__
+
+
+SQL_CATALOGO = 'SELECT %s FROM servicios' % ', '.join(Servicio.__slots__)
+
+# Claves de los índices ordenados (mismo orden que ORDER BY campo, id)
+CLAVES_ORDEN = {
+    'id': lambda s: (s.id,),
+    'precio': lambda s: (s.precio, s.id),
+    'nombre': lambda s: (s.nombre, s.id),
+}
+# Campos que se ven en /servicios (el stock solo aparece en el detalle)
+CAMPOS_LISTA = ('nombre', 'descripcion', 'precio', 'promocion', 'icono')
+
+
+class IndicesCatalogo:
+    """Foto inmutable del catálogo: nunca se modifica después de publicarse,
+    así que los lectores la recorren sin bloqueo mientras se arma la siguiente"""
+
+    __slots__ = ('version', 'seq', 'version_paginas', 'por_id', 'orden', 'por_promocion', '_filtradas')
+
+    # Listas filtradas que se guardan por foto (ver filtradas())
+    MAX_FILTRADAS = 32
+
+    def __init__(self, version, seq, servicios):
+        self.version = version
+        self.seq = seq
+        # Versión de la última escritura que cambió algo de las listas
+        # públicas: las reservas (solo stock) no la mueven
+        self.version_paginas = version
+        self.por_id = {s.id: s for s in servicios}
+        # Listas ordenadas por (campo, id), como los índices de la tabla
+        self.orden = {campo: sorted(servicios, key=clave) for campo, clave in CLAVES_ORDEN.items()}
+        self.por_promocion = {
+            flag: [s for s in self.orden['precio'] if bool(s.promocion) == flag] for flag in (False, True)
+        }
+        self._filtradas = {}
+
+    def con_cambios(self, version, seq, quitados, nuevos):
+        """Copia de la foto sin los registros `quitados` y con los `nuevos`.
+
+        Copiar las listas y ubicar cada cambio con bisect cuesta ~15 ms con
+        100k servicios; volver a ordenarlas, ~130 ms.
+        """
+        copia = IndicesCatalogo.__new__(IndicesCatalogo)
+        copia.version, copia.seq = version, seq
+        anteriores = {s.id: s for s in quitados}
+        solo_stock = len(quitados) == len(nuevos) and all(
+            s.id in anteriores and all(getattr(s, campo) == getattr(anteriores[s.id], campo) for campo in CAMPOS_LISTA)
+            for s in nuevos)
+        copia.version_paginas = self.version_paginas if solo_stock else version
+        copia.por_id = dict(self.por_id)
+        copia.orden = {campo: list(filas) for campo, filas in self.orden.items()}
+        copia.por_promocion = {flag: list(filas) for flag, filas in self.por_promocion.items()}
+        copia._filtradas = {}
+        for s in quitados:
+            del copia.por_id[s.id]
+            for campo, clave in CLAVES_ORDEN.items():
+                filas = copia.orden[campo]
+                del filas[bisect.bisect_left(filas, clave(s), key=clave)]
+            filas = copia.por_promocion[bool(s.promocion)]
+            del filas[bisect.bisect_left(filas, CLAVES_ORDEN['precio'](s), key=CLAVES_ORDEN['precio'])]
+        for s in nuevos:
+            copia.por_id[s.id] = s
+            for campo, clave in CLAVES_ORDEN.items():
+                bisect.insort(copia.orden[campo], s, key=clave)
+            bisect.insort(copia.por_promocion[bool(s.promocion)], s, key=CLAVES_ORDEN['precio'])
+        return copia
+
+    def consultar(self, orden='id', desc=False, promocion=None, min_precio=None,
+                  max_precio=None, en_stock=None, despues_de=None):
+        """Itera servicios filtrados en el orden (campo, id) pedido.
+
+        despues_de es la posición (valor, id) del cursor de paginación. Los
+        límites de precio y el cursor se resuelven con bisect sobre la lista
+        ordenada; el resto de filtros se aplica al recorrerla.
+        """
+        clave = CLAVES_ORDEN[orden]
+        if orden == 'precio' and promocion is not None:
+            filas = self.por_promocion[promocion]
+        else:
+            filas = self.orden[orden]
+        inicio, fin = 0, len(filas)
+        if orden == 'precio':
+            if min_precio is not None:
+                inicio = bisect.bisect_left(filas, (min_precio,), key=clave)
+            if max_precio is not None:
+                fin = bisect.bisect_right(filas, (max_precio, float('inf')), key=clave)
+        if despues_de is not None:
+            if desc:
+                fin = min(fin, bisect.bisect_left(filas, despues_de, key=clave))
+            else:
+                inicio = max(inicio, bisect.bisect_right(filas, despues_de, key=clave))
+        posiciones = range(fin - 1, inicio - 1, -1) if desc else range(inicio, fin)
+        for i in posiciones:
+            s = filas[i]
+            if promocion is not None and bool(s.promocion) != promocion:
+                continue
+            if min_precio is not None and s.precio < min_precio:
+                continue
+            if max_precio is not None and s.precio > max_precio:
+                continue
+            if en_stock is not None and (s.stock > 0) != en_stock:
+                continue
+            yield s
+
+    def filtradas(self, orden='id', **filtros):
+        """Lista ascendente de consultar(orden, **filtros) para pedir ventanas por posición.
+
+        Sin filtros es la lista ordenada misma. Con filtros se arma una vez
+        por foto (la foto no cambia), así que desplazarse por el panel no
+        vuelve a recorrer el catálogo.
+        """
+        filtros = {campo: valor for campo, valor in filtros.items() if valor is not None}
+        if not filtros:
+            return self.orden[orden]
+        if orden == 'precio' and list(filtros) == ['promocion']:
+            return self.por_promocion[filtros['promocion']]
+        clave = (orden,) + tuple(sorted(filtros.items()))
+        return self.memorizar(clave, lambda: list(self.consultar(orden, **filtros)))
+
+    def memorizar(self, clave, calcular):
+        """calcular() una sola vez por foto y `clave` (hasta MAX_FILTRADAS resultados)"""
+        valor = self._filtradas.get(clave)
+        if valor is None:
+            valor = calcular()
+            if len(self._filtradas) >= self.MAX_FILTRADAS:
+                self._filtradas.clear()
+            self._filtradas[clave] = valor
+        return valor
+
+
+class CatalogStore:
+    """Copia en memoria de servicios con índices por id, promoción y precio.
+
+    Antes de cada lectura compara su versión con catalog_state (la de la
+    tabla catalogo_estado). Si cambió, lee de servicios_cambios las ids
+    tocadas desde la última secuencia aplicada y vuelve a leer solo esas
+    filas; las que ya no existen se descartan. Cambios grandes (una
+    importación) o un registro ya podado recargan la tabla entera.
+    """
+
+    # Fracción de filas cambiadas a partir de la cual conviene recargar todo
+    RECARGA_COMPLETA = 0.25
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._indices = None
+        self.cargas = 0
+        self.actualizaciones = 0
+        self.filas_leidas = 0
+
+    def indices(self):
+        """Devuelve la foto del catálogo al día con la versión actual"""
+        version = catalog_state.version
+        indices = self._indices
+        if indices is not None and indices.version == version:
+            return indices
+        with self._lock:
+            if self._indices is None or self._indices.version != version:
+                self._indices = self._refrescar(self._indices)
+            return self._indices
+
+    def _refrescar(self, anterior):
+        conn = get_db_connection()
+        try:
+            # Versión y filas en la misma transacción de lectura (misma foto WAL)
+            conn.execute('BEGIN')
+            version = conn.execute('SELECT version FROM catalogo_estado WHERE id = 1').fetchone()[0]
+            primero, seq = conn.execute('SELECT MIN(seq), COALESCE(MAX(seq), 0) FROM servicios_cambios').fetchone()
+            if anterior is not None and (primero is None or primero <= anterior.seq + 1):
+                ids = [fila[0] for fila in conn.execute(
+                    'SELECT DISTINCT servicio_id FROM servicios_cambios WHERE seq > ? AND seq <= ?',
+                    (anterior.seq, seq))]
+                if len(ids) <= len(anterior.por_id) * self.RECARGA_COMPLETA:
+                    quitados = [anterior.por_id[i] for i in ids if i in anterior.por_id]
+                    nuevos = []
+                    for i in range(0, len(ids), 900):
+                        parte = ids[i:i + 900]
+                        nuevos.extend(Servicio(*fila) for fila in conn.execute(
+                            SQL_CATALOGO + ' WHERE id IN (%s)' % ','.join('?' * len(parte)), parte))
+                    self.actualizaciones += 1
+                    self.filas_leidas += len(nuevos)
+                    return anterior.con_cambios(version, seq, quitados, nuevos)
+            servicios = [Servicio(*fila) for fila in conn.execute(SQL_CATALOGO)]
+            self.cargas += 1
+            self.filas_leidas += len(servicios)
+            return IndicesCatalogo(version, seq, servicios)
+        finally:
+            conn.rollback()
+            conn.close()
+
+    def obtener(self, servicio_id):
+        return self.indices().por_id.get(servicio_id)
+
+    def todos(self):
+        """Servicios ordenados por id"""
+        return self.indices().orden['id']
+
+    def vigentes(self, version):
+        """La foto actual si ya corresponde a `version` (sin tocar la base), o None"""
+        indices = self._indices
+        return indices if indices is not None and indices.version == version else None
+
+    def consultar(self, **filtros):
+        """Itera servicios filtrados; ver IndicesCatalogo.consultar"""
+        return self.indices().consultar(**filtros)
+
+    def stats(self):
+        indices = self._indices
+        return {
+            'version': indices.version if indices else None,
+            'seq': indices.seq if indices else None,
+            'servicios': len(indices.por_id) if indices else 0,
+            'cargas_completas': self.cargas,
+            'actualizaciones': self.actualizaciones,
+            'filas_leidas': self.filas_leidas,
+        }
+
+
+catalog_store = CatalogStore()
+
+# COMPRESIÓN DE RESPUESTAS
+# Se negocia con Accept-Encoding (br si está el módulo brotli, si no
+# gzip). Las respuestas dinámicas se comprimen en after_request con
+# niveles rápidos; las que llevan ETag guardan su versión comprimida en
+# una caché LRU, así que una página cacheada no vuelve a pagar la CPU.
+# Las respuestas en streaming se comprimen bloque a bloque con un flush
+# en cada uno para no retrasar el primer byte. La hoja de estilos se
+# precomprime al arrancar al nivel máximo.
+
+CODIFICACIONES = ('br', 'gzip') if brotli is not None else ('gzip',)
+TIPOS_COMPRIMIBLES = ('text/html', 'text/css', 'text/plain', 'text/csv', 'application/json',
+                      'application/x-ndjson', 'application/javascript', 'image/svg+xml')
+
+compressed_cache = PageCache(PAGE_CACHE_BYTES // 4)
+
+class Compresor:
+    """Compresor incremental de gzip o brotli con la misma interfaz"""
+
+    def __init__(self, codificacion, nivel=None):
+        if codificacion == 'br':
+            self._c = brotli.Compressor(quality=BROTLI_QUALITY if nivel is None else nivel)
+            self._bloque, self._fin = self._c.flush, self._c.finish
+            self._procesar = self._c.process
+        else:
+            # wbits 31: formato gzip (cabecera y CRC) en lugar de zlib
+            self._c = zlib.compressobj(GZIP_LEVEL if nivel is None else nivel, zlib.DEFLATED, 31)
+            self._bloque = lambda: self._c.flush(zlib.Z_SYNC_FLUSH)
+            self._fin = self._c.flush
+            self._procesar = self._c.compress
+
+    def bloque(self, datos):
+        """Comprime datos y vacía el buffer para que el cliente pueda decodificarlos ya"""
+        return self._procesar(datos) + self._bloque()
+
+    def completo(self, datos):
+        return self._procesar(datos) + self._fin()
+
+    def terminar(self):
+        return self._fin()
+
+def precomprimir(contenido):
+    """{codificación: bytes} al máximo nivel, para contenido que no cambia"""
+    variantes = {'gzip': Compresor('gzip', 9).completo(contenido)}
+    if brotli is not None:
+        variantes['br'] = Compresor('br', 11).completo(contenido)
+    return variantes
+
+def codificacion_aceptada(peticion):
+    """La codificación preferida que el cliente acepta, o None"""
+    return peticion.accept_encodings.best_match(CODIFICACIONES)
+
+def contar_compresion(codificacion, origen, entrada, salida, duracion=None):
+    etiquetas = (('encoding', codificacion),)
+    metricas.inc('techflow_compression_responses_total', etiquetas + (('origen', origen),))
+    metricas.inc('techflow_compression_input_bytes_total', etiquetas, entrada)
+    metricas.inc('techflow_compression_output_bytes_total', etiquetas, salida)
+    metricas.inc('techflow_compression_saved_bytes_total', etiquetas, entrada - salida)
+    if duracion is not None:
+        metricas.observar('techflow_compression_seconds', etiquetas, duracion)
+
+def comprimir_flujo(flujo, codificacion):
+    """Reenvía un flujo de bloques comprimiéndolo sobre la marcha"""
+    compresor = Compresor(codificacion)
+    entrada = salida = 0
+    duracion = 0.0
+    try:
+        for parte in flujo:
+            if isinstance(parte, str):
+                parte = parte.encode('utf-8')
+            if not parte:
+                continue
+            inicio = time.perf_counter()
+            comprimido = compresor.bloque(parte)
+            duracion += time.perf_counter() - inicio
+            entrada += len(parte)
+            salida += len(comprimido)
+            yield comprimido
+        inicio = time.perf_counter()
+        final = compresor.terminar()
+        duracion += time.perf_counter() - inicio
+        salida += len(final)
+        yield final
+    finally:
+        if hasattr(flujo, 'close'):
+            flujo.close()
+        contar_compresion(codificacion, 'stream', entrada, salida, duracion)
+
+def usar_codificacion(respuesta, codificacion):
+    """Marca la respuesta como codificada; el ETag pasa a débil porque
+    los bytes ya no son los de la representación sin comprimir"""
+    respuesta.headers['Content-Encoding'] = codificacion
+    etag, debil = respuesta.get_etag()
+    if etag and not debil:
+        respuesta.set_etag(etag, weak=True)
+
+@app.after_request
+def comprimir_respuesta(respuesta):
+    """Comprime las respuestas dinámicas si el cliente lo acepta"""
+    return comprimir(request, respuesta)
+
+def comprimir(peticion, respuesta):
+    if respuesta.mimetype not in TIPOS_COMPRIMIBLES:
+        return respuesta
+    respuesta.vary.add('Accept-Encoding')
+    if (respuesta.status_code < 200 or respuesta.status_code in (204, 206, 304)
+            or respuesta.direct_passthrough or 'Content-Encoding' in respuesta.headers
+            or peticion.method == 'HEAD'):
+        return respuesta
+    codificacion = codificacion_aceptada(peticion)
+    if codificacion is None:
+        return respuesta
+    if respuesta.is_streamed:
+        respuesta.response = comprimir_flujo(respuesta.response, codificacion)
+        respuesta.headers.pop('Content-Length', None)
+        usar_codificacion(respuesta, codificacion)
+        return respuesta
+    cuerpo = respuesta.get_data()
+    if len(cuerpo) < COMPRESS_MIN_BYTES:
+        return respuesta
+    etag, debil = respuesta.get_etag()
+    clave = (etag, codificacion) if etag and not debil else None
+    comprimido = compressed_cache.get(clave) if clave else None
+    if comprimido is not None:
+        contar_compresion(codificacion, 'cache', len(cuerpo), len(comprimido))
+    else:
+        inicio = time.perf_counter()
+        comprimido = Compresor(codificacion).completo(cuerpo)
+        contar_compresion(codificacion, 'dinamica', len(cuerpo), len(comprimido), time.perf_counter() - inicio)
+        if clave:
+            compressed_cache.put(clave, comprimido)
+    respuesta.set_data(comprimido)
+    usar_codificacion(respuesta, codificacion)
+    return respuesta
+
+# PLANTILLAS Y HOJA DE ESTILOS
+
+def cargar_hoja_estilos():
+    """Lee styles.css una vez y devuelve (contenido, nombre con huella)"""
+    with open(os.path.join(app.root_path, 'styles.css'), 'rb') as f:
+        contenido = f.read()
+    return contenido, 'styles.%s.css' % hashlib.sha256(contenido).hexdigest()[:10]
+
+STYLESHEET, STYLESHEET_NAME = cargar_hoja_estilos()
+STYLESHEET_COMPRIMIDA = precomprimir(STYLESHEET)
+CACHE_INMUTABLE = 'public, max-age=31536000, immutable'
+
+app.jinja_env.globals['stylesheet_url'] = '/assets/' + STYLESHEET_NAME
+# True mientras `main.py estatico` renderiza la copia para Firebase Hosting
+app.jinja_env.globals['estatico'] = False
+
+@app.template_filter('precio')
+def formato_precio(valor):
+    """Precio en pesos sin decimales: $2,500,000"""
+    return f'${valor:,.0f}'
+
+def stream_plantilla(nombre, **contexto):
+    """Como render_template, pero devuelve un generador de bloques HTML.
+
+    La cabecera y el navbar salen en el primer bloque; lo que venga de
+    generadores en el contexto se envía a medida que avanzan.
+    """
+    app.update_template_context(contexto)
+    flujo = app.jinja_env.get_template(nombre).stream(contexto)
+    flujo.enable_buffering(STREAM_BUFFER)
+    # En el modo asíncrono se renderiza fuera de una petición de Flask
+    return stream_with_context(flujo) if has_request_context() else flujo
+
+def precompilar_plantillas():
+    """Compila todas las plantillas al arrancar para no pagar el parseo en la primera visita"""
+    for nombre in app.jinja_env.list_templates():
+        app.jinja_env.get_template(nombre)
+
+precompilar_plantillas()
+
+@app.route('/assets/<nombre>')
+def hoja_estilos(nombre):
+    """Sirve la hoja de estilos con huella; su URL cambia con el contenido"""
+    if nombre != STYLESHEET_NAME:
+        abort(404)
+    codificacion = codificacion_aceptada(request)
+    if codificacion is None:
+        respuesta = Response(STYLESHEET, mimetype='text/css')
+        respuesta.set_etag(STYLESHEET_NAME)
+    else:
+        respuesta = Response(STYLESHEET_COMPRIMIDA[codificacion], mimetype='text/css')
+        usar_codificacion(respuesta, codificacion)
+        respuesta.set_etag(STYLESHEET_NAME, weak=True)
+        contar_compresion(codificacion, 'precomprimida', len(STYLESHEET), len(STYLESHEET_COMPRIMIDA[codificacion]))
+    respuesta.headers['Cache-Control'] = CACHE_INMUTABLE
+    return respuesta.make_conditional(request)
+
+# GET CONDICIONAL (ETag / Last-Modified / 304)
+
+def huella_build():
+    """Hash del código, las plantillas y la hoja de estilos desplegados"""
+    h = hashlib.sha1(open(__file__, 'rb').read())
+    carpeta = os.path.join(app.root_path, app.template_folder)
+    for nombre in sorted(os.listdir(carpeta)):
+        with open(os.path.join(carpeta, nombre), 'rb') as f:
+            h.update(nombre.encode() + f.read())
+    h.update(STYLESHEET)
+    return h.hexdigest()[:12]
+
+# Identifica el código desplegado: un cambio de plantilla invalida los ETag
+APP_BUILD = huella_build()
+
+CACHE_PUBLICA = 'public, max-age=60'
+CACHE_API = 'public, max-age=30'
+CACHE_PRIVADA = 'private, no-store'
+CACHE_REVALIDAR = 'public, no-cache'
+
+def etag_de(*partes):
+    """ETag fuerte a partir del build y del estado que determina la respuesta"""
+    return hashlib.sha1(repr((APP_BUILD,) + partes).encode()).hexdigest()[:20]
+
+def no_modificado(peticion, etag, modificado):
+    """True si las cabeceras condicionales permiten responder 304"""
+    if peticion.if_none_match:
+        return peticion.if_none_match.contains_weak(etag)
+    if modificado is not None and peticion.if_modified_since is not None:
+        return modificado <= peticion.if_modified_since
+    return False
+
+def con_validadores(respuesta, etag, modificado, cache_control):
+    respuesta.set_etag(etag)
+    if modificado is not None:
+        respuesta.last_modified = modificado
+    respuesta.headers['Cache-Control'] = cache_control
+    return respuesta
+
+def condicional(validadores, cache_control):
+    """Decorador: responde 304 sin ejecutar la vista si el cliente está al día.
+
+    validadores recibe los mismos argumentos que la vista y devuelve
+    (etag, last_modified o None); debe ser barato (no toca filas).
+    """
+    def decorador(vista):
+        @functools.wraps(vista)
+        def envoltura(*args, **kwargs):
+            etag, modificado = validadores(*args, **kwargs)
+            if no_modificado(request, etag, modificado):
+                respuesta = Response(status=304)
+            else:
+                respuesta = make_response(vista(*args, **kwargs))
+                if respuesta.status_code != 200:
+                    return respuesta
+            return con_validadores(respuesta, etag, modificado, cache_control)
+        return envoltura
+    return decorador
+
+def fecha_sqlite(texto):
+    """TIMESTAMP de SQLite (CURRENT_TIMESTAMP, en UTC) como datetime UTC"""
+    return datetime.strptime(texto, '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc) if texto else None
+
+def validadores_catalogo(*partes):
+    """Validadores de una vista que depende de todo el catálogo (las listas)"""
+    version, modificado = catalog_state.actual()
+    return etag_de(version, *partes), modificado
+
+def validadores_de(servicio, vista, servicio_id):
+    """Validadores de una vista de un solo servicio: su version y su
+    updated_at, así que editar otro servicio no los cambia. Si no existe,
+    la vista redirige o responde 404, que no llevan validadores."""
+    if servicio is None:
+        return etag_de(vista, servicio_id), None
+    return (etag_de(vista, servicio_id, servicio['version'], servicio['updated_at']),
+            fecha_sqlite(servicio['updated_at']))
+
+def validadores_servicio(vista, servicio_id):
+    return validadores_de(catalog_store.obtener(servicio_id), vista, servicio_id)
+
+@app.after_request
+def cache_privada(respuesta):
+    """Las páginas de sesión nunca se guardan en cachés compartidas"""
+    if request.path.startswith(('/admin', '/login', '/logout')):
+        respuesta.headers['Cache-Control'] = CACHE_PRIVADA
+    return respuesta
+
+# RUTAS PRINCIPALES (MOCKUPS)
+
+@app.route('/')
+@condicional(lambda: validadores_catalogo('home'), CACHE_PUBLICA)
+def home():
+    """MOCKUP 1: Página principal/home"""
+    return render_template('home.html', resumen=resumen_catalogo())
+
+def tarjeta_servicio(servicio):
+    """Tarjeta de un servicio para la lista pública"""
+    return app.jinja_env.get_template('_tarjeta_servicio.html').render(servicio=servicio)
+
+@app.route('/servicios')
+@condicional(lambda: validadores_catalogo('servicios', request.args.get('q', '')), CACHE_PUBLICA)
+def servicios():
+    """MOCKUP 2: Lista de servicios (con ?q= filtra por búsqueda de texto)"""
+    q = request.args.get('q', '').strip()
+    return pagina_cacheada(('servicios', q, catalog_store.indices().version_paginas), lambda: renderizar_servicios(q))
+
+def renderizar_servicios(q=''):
+    truncado = False
+    if q:
+        parametros = parametros_busqueda_pagina(q)
+        servicios = buscar_pagina(parametros) if parametros else []
+        truncado = bool(parametros) and busqueda_truncada(parametros[0])
+    else:
+        servicios = catalog_store.todos()
+    return stream_plantilla('servicios.html', tarjetas=tarjetas_servicios(servicios), q=q, truncado=truncado)
+
+def buscar_pagina(parametros):
+    """Filas de SQL_BUSQUEDA_PAGINA (como mucho BUSQUEDA_PAGINA_MAX), leídas de una vez"""
+    conn = get_db_connection()
+    try:
+        return conn.execute(SQL_BUSQUEDA_PAGINA, parametros).fetchall()
+    finally:
+        conn.close()
+
+def parametros_busqueda_pagina(q):
+    """Parámetros de SQL_BUSQUEDA_PAGINA para ?q=, o None si no tiene palabras"""
+    try:
+        return (expresion_busqueda(q), BUSQUEDA_CANDIDATOS, BUSQUEDA_PAGINA_MAX)
+    except ValueError:
+        return None
+
+def tarjetas_servicios(servicios):
+    return (Markup(fragmento_cacheado(servicio, tarjeta_servicio)) for servicio in servicios)
+
+@app.route('/detalle/<int:servicio_id>')
+@condicional(lambda servicio_id: validadores_servicio('detalle', servicio_id), CACHE_PUBLICA)
+def detalle_servicio(servicio_id):
+    """MOCKUP 3: Detalle de servicio"""
+    servicio = catalog_store.obtener(servicio_id)
+    
+    if not servicio:
+        return redirect(url_for('servicios'))
+    
+    return pagina_cacheada(('detalle', servicio_id, servicio.version),
+                           lambda: render_template('detalle.html', servicio=servicio))
+
+# CONTRASEÑAS Y LÍMITE DE INTENTOS DE LOGIN
+# Las contraseñas se guardan con el KDF de PASSWORD_METHOD (scrypt por
+# defecto, ~130 ms y 32 MB por verificación). Las filas MD5 heredadas y
+# las de un costo anterior se rehashean en el primer login correcto. El
+# costo queda acotado por dos lados: el limitador rechaza las ráfagas
+# antes de consultar o hashear nada, y PASSWORD_CONCURRENCY limita
+# cuántos hashes corren a la vez en cada proceso.
+
+class LimitadorDeslizante:
+    """Ventana deslizante exacta por clave: guarda los instantes de los
+    últimos `limite` intentos, así que la memoria por clave está acotada"""
+
+    MAX_CLAVES = 100000
+
+    def __init__(self, nombre, limite, ventana):
+        self.nombre = nombre
+        self.limite = limite
+        self.ventana = ventana
+        self._lock = threading.Lock()
+        self._intentos = {}
+        self.permitidos = 0
+        self.rechazados = 0
+
+    def permitir(self, clave):
+        """Registra un intento; devuelve 0 si se permite o los segundos hasta poder reintentar"""
+        if self.limite <= 0:
+            return 0
+        ahora = time.monotonic()
+        with self._lock:
+            intentos = self._intentos.get(clave)
+            if intentos is None:
+                if len(self._intentos) >= self.MAX_CLAVES:
+                    self._podar(ahora)
+                intentos = self._intentos[clave] = deque(maxlen=self.limite)
+            if len(intentos) == self.limite and ahora - intentos[0] < self.ventana:
+                self.rechazados += 1
+                return self.ventana - (ahora - intentos[0])
+            intentos.append(ahora)
+            self.permitidos += 1
+            return 0
+
+    def olvidar(self, clave):
+        with self._lock:
+            self._intentos.pop(clave, None)
+
+    def _podar(self, ahora):
+        for clave in [c for c, i in self._intentos.items() if ahora - i[-1] >= self.ventana]:
+            del self._intentos[clave]
+        # Con todas las claves activas se descartan las más antiguas
+        while len(self._intentos) >= self.MAX_CLAVES:
+            del self._intentos[next(iter(self._intentos))]
+
+    def claves(self):
+        with self._lock:
+            self._podar(time.monotonic())
+            return len(self._intentos)
+
+    def stats(self):
+        return {
+            'limite': self.limite,
+            'ventana': self.ventana,
+            'claves': self.claves(),
+            'permitidos': self.permitidos,
+            'rechazados': self.rechazados,
+        }
+
+
+# Detrás de un proxy REMOTE_ADDR es la del proxy y todos los clientes
+# compartirían la ventana por IP: ProxyFix la reemplaza por la que agregó
+# el último proxy de confianza en X-Forwarded-For
+if TRUSTED_PROXIES:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES, x_proto=TRUSTED_PROXIES)
+
+limitador_ip = LimitadorDeslizante('ip', LOGIN_MAX_PER_IP, LOGIN_WINDOW)
+limitador_usuario = LimitadorDeslizante('usuario', LOGIN_MAX_PER_USER, LOGIN_WINDOW)
+hashes_simultaneos = threading.BoundedSemaphore(PASSWORD_CONCURRENCY)
+
+def medir_hash(funcion, *args):
+    """Corre un hash o verificación con el semáforo de concurrencia"""
+    with hashes_simultaneos:
+        inicio = time.perf_counter()
+        try:
+            return funcion(*args)
+        finally:
+            metricas.observar('techflow_password_hash_seconds', (), time.perf_counter() - inicio)
+
+def hash_password(password):
+    return medir_hash(generate_password_hash, password, PASSWORD_METHOD)
+
+@functools.lru_cache(maxsize=1)
+def hash_señuelo():
+    """Hash aleatorio para verificar contra él cuando el usuario no existe (mismo costo)"""
+    return hash_password(secrets.token_hex(16))
+
+def es_md5(almacenado):
+    return len(almacenado) == 32 and '$' not in almacenado
+
+def verificar_password(almacenado, password):
+    """Devuelve (válida, hay que rehashear)"""
+    if es_md5(almacenado):
+        valida = hmac.compare_digest(almacenado, hashlib.md5(password.encode()).hexdigest())
+        return valida, valida
+    valida = medir_hash(check_password_hash, almacenado, password)
+    return valida, valida and almacenado.split('$', 1)[0] != hash_señuelo().split('$', 1)[0]
+
+def autenticar(username, password):
+    """Usuario si las credenciales son válidas, o None (rehashea si hace falta)"""
+    conn = get_db_connection()
+    try:
+        user = conn.execute('SELECT * FROM usuarios WHERE username = ?', (username,)).fetchone()
+        if user is None:
+            # Mismo trabajo que con un usuario real: no revela cuáles existen
+            medir_hash(check_password_hash, hash_señuelo(), password)
+            return None
+        valida, rehashear = verificar_password(user['password'], password)
+        if not valida:
+            return None
+        if rehashear:
+            conn.execute('UPDATE usuarios SET password = ? WHERE id = ?', (hash_password(password), user['id']))
+            conn.commit()
+            metricas.inc('techflow_password_rehash_total', ())
+        return user
+    finally:
+        conn.close()
+
+@app.route('/admin/limitador')
+def estado_limitador():
+    """Contadores del limitador de intentos de login en JSON"""
+    if 'user_id' not in session:
+        return redirect(url_for('login'))
+    return jsonify({'ip': limitador_ip.stats(), 'usuario': limitador_usuario.stats()})
+
+@app.route('/login', methods=['GET', 'POST'])
+def login():
+    """MOCKUP 4: Login de administrador"""
+    if request.method == 'POST':
+        username = request.form['username']
+        password = request.form['password']
+        
+        # Primero los limitadores: una ráfaga no llega ni a SQLite ni al KDF
+        for limitador, clave in ((limitador_ip, request.remote_addr), (limitador_usuario, username.strip().lower())):
+            espera = limitador.permitir(clave)
+            if espera:
+                metricas.inc('techflow_login_rate_limited_total', (('limitador', limitador.nombre),))
+                respuesta = make_response(render_template(
+                    'login.html', error='Demasiados intentos, espera %d segundos' % (espera + 1)), 429)
+                respuesta.headers['Retry-After'] = str(int(espera) + 1)
+                return respuesta
+        
+        user = autenticar(username, password)
+        metricas.inc('techflow_login_attempts_total', (('resultado', 'ok' if user else 'fallido'),))
+        if user:
+            limitador_usuario.olvidar(username.strip().lower())
+            session['user_id'] = user['id']
+            session['username'] = user['username']
+            return redirect(url_for('admin'))
+        else:
+            error = 'Credenciales incorrectas'
+    else:
+        error = None
+    
+    return render_template('login.html', error=error)
+
+@app.route('/admin')
+def admin():
+    """MOCKUP 5: Panel de administración (CRUD)"""
+    if 'user_id' not in session:
+        return redirect(url_for('login'))
+    
+    # La tabla la llena el navegador por ventanas desde /admin/servicios
+    return render_template('admin.html', resumen=resumen_catalogo(), ventana=ADMIN_VENTANA)
+
+ADMIN_VENTANA = 100
+
+@app.route('/admin/servicios')
+def admin_servicios():
+    """Ventana de la tabla del panel en JSON: {total, offset, version, truncado, servicios}.
+
+    Acepta offset, limit y los sort, promocion, in_stock de /api/servicios,
+    más q (búsqueda de texto completo). La ventana se corta por posición
+    sobre las listas ordenadas del catálogo en memoria, así que cuesta lo
+    mismo en la primera página que en la última.
+    """
+    if 'user_id' not in session:
+        return redirect(url_for('login'))
+    try:
+        filtros, limite, _ = consulta_servicios(request.args)
+        filtros.pop('despues_de', None)
+        offset = int(request.args.get('offset', 0))
+        if offset < 0:
+            raise ValueError('offset no puede ser negativo')
+        q = request.args.get('q', '').strip()
+        expresion = expresion_busqueda(q) if q else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    indices = catalog_store.indices()
+    desc = filtros.pop('desc')
+    filas = indices.filtradas(**filtros)
+    truncado = False
+    if expresion:
+        # Como filtradas(): la búsqueda y el recorrido del catálogo se hacen
+        # una vez por foto, no en cada ventana que pide la tabla al desplazarse
+        def buscar():
+            conn = get_db_connection()
+            ids = {fila[0] for fila in conn.execute(
+                'SELECT rowid FROM servicios_fts WHERE servicios_fts MATCH ? LIMIT ?', (expresion, BUSQUEDA_CANDIDATOS))}
+            conn.close()
+            return [s for s in filas if s.id in ids], busqueda_truncada(expresion)
+        filas, truncado = indices.memorizar(('q', expresion) + tuple(sorted(filtros.items())), buscar)
+    total = len(filas)
+    if desc:
+        ventana = filas[max(total - offset - limite, 0):max(total - offset, 0)][::-1]
+    else:
+        ventana = filas[offset:offset + limite]
+    return jsonify({
+        'total': total,
+        'offset': offset,
+        'version': indices.version,
+        'truncado': truncado,
+        'servicios': [servicio_a_dict(servicio) for servicio in ventana],
+    })
+
+# RUTAS CRUD ADICIONALES
+
+@app.route('/admin/agregar', methods=['GET', 'POST'])
+def agregar_servicio():
+    """Agregar nuevo servicio"""
+    if 'user_id' not in session:
+        return redirect(url_for('login'))
+    
+    if request.method == 'POST':
+        nombre = request.form['nombre']
+        descripcion = request.form['descripcion']
+        precio = float(request.form['precio'])
+        stock = int(request.form['stock'])
+        promocion = 1 if 'promocion' in request.form else 0
+        icono = request.form['icono']
+        
+        conn = get_db_connection()
+        try:
+            conn.execute('''INSERT INTO servicios (nombre, descripcion, precio, stock, promocion, icono) 
+                           VALUES (?, ?, ?, ?, ?, ?)''', 
+                        (nombre, descripcion, precio, stock, promocion, icono))
+            conn.commit()
+        except sqlite3.IntegrityError:
+            return render_template('agregar.html', error='Ya existe un servicio con ese nombre')
+        finally:
+            conn.close()
+        invalidar_catalogo()
+        
+        return redirect(url_for('admin'))
+    
+    return render_template('agregar.html')
+
+@app.route('/admin/editar/<int:servicio_id>', methods=['GET', 'POST'])
+def editar_servicio(servicio_id):
+    """Editar servicio; rechaza el cambio si otro lo modificó mientras tanto"""
+    if 'user_id' not in session:
+        return redirect(url_for('login'))
+    
+    if request.method == 'POST':
+        datos = dict(request.form, promocion='promocion' in request.form)
+        conn = get_db_connection()
+        try:
+            cambios = {campo: validar_campo(campo, datos.get(campo)) for campo in COLUMNAS_IMPORTACION}
+            estado, resultado = actualizar_servicio(conn, servicio_id, cambios, int(request.form['version']))
+            conn.commit()
+        except ValueError as e:
+            return render_template('editar.html', servicio=datos, error=str(e))
+        except sqlite3.IntegrityError:
+            return render_template('editar.html', servicio=datos, error='Ya existe un servicio con ese nombre')
+        finally:
+            conn.close()
+        if estado == 'conflicto':
+            # Se muestra la versión actual para que el cambio se rehaga sobre ella
+            return render_template('editar.html', servicio=servicio_actual(servicio_id),
+                                   error='Otro usuario modificó este servicio; revisa los datos actuales')
+        if estado == 'ok':
+            invalidar_catalogo()
+        return redirect(url_for('admin'))
+    
+    servicio = servicio_actual(servicio_id)
+    if servicio is None:
+        return redirect(url_for('admin'))
+    return render_template('editar.html', servicio=servicio)
+
+@app.route('/admin/eliminar/<int:servicio_id>')
+def eliminar_servicio(servicio_id):
+    """Eliminar servicio"""
+    if 'user_id' not in session:
+        return redirect(url_for('login'))
+    
+    conn = get_db_connection()
+    conn.execute('DELETE FROM servicios WHERE id = ?', (servicio_id,))
+    conn.commit()
+    conn.close()
+    invalidar_catalogo()
+    
+    return redirect(url_for('admin'))
+
+@app.route('/logout')
+def logout():
+    """Cerrar sesión"""
+    session.clear()
+    return redirect(url_for('home'))
+
+# IMPORTACIÓN Y EXPORTACIÓN MASIVA
+
+COLUMNAS_IMPORTACION = ('nombre', 'descripcion', 'precio', 'stock', 'promocion', 'icono')
+MAX_ERRORES_REPORTADOS = 1000
+
+# updated_at explícito evita el UPDATE por fila de trg_servicios_insert_updated_at
+# (y, en el upsert, el de trg_servicios_updated_at)
+SQL_IMPORTAR = {
+    'error': '''INSERT INTO servicios (nombre, descripcion, precio, stock, promocion, icono, updated_at)
+                 VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)''',
+    'omitir': '''INSERT INTO servicios (nombre, descripcion, precio, stock, promocion, icono, updated_at)
+                  VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP) ON CONFLICT (nombre) DO NOTHING''',
+    'actualizar': '''INSERT INTO servicios (nombre, descripcion, precio, stock, promocion, icono, updated_at)
+                      VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                      ON CONFLICT (nombre) DO UPDATE SET
+                          descripcion = excluded.descripcion, precio = excluded.precio,
+                          stock = excluded.stock, promocion = excluded.promocion,
+                          icono = excluded.icono, version = version + 1,
+                          updated_at = CURRENT_TIMESTAMP''',
+}
+
+def leer_filas(texto, formato):
+    """Genera (linea, datos o None, error o None) leyendo CSV o NDJSON como stream"""
+    if formato == 'csv':
+        # csv.reader + zip: el __next__ de DictReader está en Python y es
+        # un tercio del costo de leer el archivo
+        lector = csv.reader(texto)
+        campos = next(lector, [])
+        for fila in lector:
+            if fila:
+                yield lector.line_num, dict(zip(campos, fila)), None
+    elif formato == 'ndjson':
+        for linea, crudo in enumerate(texto, 1):
+            if not crudo.strip():
+                continue
+            try:
+                datos = json.loads(crudo)
+            except ValueError as e:
+                yield linea, None, 'JSON inválido: %s' % e
+                continue
+            if not isinstance(datos, dict):
+                yield linea, None, 'se esperaba un objeto JSON'
+                continue
+            yield linea, datos, None
+    else:
+        raise ValueError('formato debe ser csv o ndjson')
+
+def normalizar_nombre(valor):
+    valor = str(valor or '').strip()
+    if not valor:
+        raise ValueError('nombre es obligatorio')
+    return valor
+
+def normalizar_precio(valor):
+    try:
+        precio = float(valor)
+    except (TypeError, ValueError):
+        raise ValueError('precio inválido: %r' % valor)
+    if precio < 0:
+        raise ValueError('precio no puede ser negativo')
+    return precio
+
+def normalizar_stock(valor):
+    try:
+        stock = int(valor) if valor not in (None, '') else 0
+    except (TypeError, ValueError):
+        raise ValueError('stock inválido: %r' % valor)
+    if stock < 0:
+        raise ValueError('stock no puede ser negativo')
+    return stock
+
+def normalizar_promocion(valor):
+    if isinstance(valor, str):
+        valor = leer_bool(valor) if valor.strip() else False
+    return 1 if valor else 0
+
+# En el orden de COLUMNAS_IMPORTACION
+NORMALIZADORES = {
+    'nombre': normalizar_nombre,
+    'descripcion': lambda valor: str(valor or ''),
+    'precio': normalizar_precio,
+    'stock': normalizar_stock,
+    'promocion': normalizar_promocion,
+    'icono': lambda valor: str(valor or '🔧'),
+}
+NORMALIZADORES_FILA = tuple(NORMALIZADORES.items())
+
+def validar_campo(campo, valor):
+    """Normaliza un campo editable de servicios o lanza ValueError"""
+    if campo not in NORMALIZADORES:
+        raise ValueError('campo desconocido: %s' % campo)
+    return NORMALIZADORES[campo](valor)
+
+def validar_fila(datos):
+    """Normaliza una fila importada a la tupla de COLUMNAS_IMPORTACION o lanza ValueError"""
+    return tuple([normalizar(datos.get(campo)) for campo, normalizar in NORMALIZADORES_FILA])
+
+def importar_servicios(filas, conflicto='error', bloque=IMPORT_CHUNK):
+    """Inserta filas de leer_filas() con executemany en transacciones de `bloque` filas.
+
+    Las filas inválidas o con nombre repetido se reportan con su número de
+    línea y no abortan el resto. conflicto decide qué pasa con nombres que
+    ya existen: 'error' (reportar), 'omitir' o 'actualizar' (upsert).
+    """
+    if conflicto not in SQL_IMPORTAR:
+        raise ValueError('conflicto debe ser error, omitir o actualizar')
+    inicio = time.perf_counter()
+    reporte = {'filas_leidas': 0, 'aplicadas': 0, 'omitidas': 0, 'total_errores': 0, 'errores': []}
+
+    def error(linea, mensaje):
+        reporte['total_errores'] += 1
+        if len(reporte['errores']) < MAX_ERRORES_REPORTADOS:
+            reporte['errores'].append({'linea': linea, 'error': mensaje})
+
+    def aplicar(pendientes):
+        conn.execute('BEGIN IMMEDIATE')
+        ultimo_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM servicios').fetchone()[0]
+        if conflicto == 'error':
+            # Nombres ya presentes en la base (incluye bloques anteriores del mismo archivo)
+            existentes = set()
+            nombres = [fila[0] for _, fila in pendientes]
+            for i in range(0, len(nombres), 900):
+                parte = nombres[i:i + 900]
+                existentes.update(r[0] for r in conn.execute(
+                    'SELECT nombre FROM servicios WHERE nombre IN (%s)' % ','.join('?' * len(parte)), parte))
+            validas = []
+            for linea, fila in pendientes:
+                if fila[0] in existentes:
+                    error(linea, 'ya existe un servicio llamado %r' % fila[0])
+                else:
+                    validas.append(fila)
+        else:
+            validas = [fila for _, fila in pendientes]
+        # Con la marca, los triggers de inserción no hacen nada por fila
+        # (ver migracion_carga_masiva). No se borran: un DDL cambia el
+        # schema cookie e invalida las sentencias preparadas de todas las
+        # conexiones de todos los workers en cada bloque
+        conn.execute('INSERT INTO carga_masiva (id) VALUES (1)')
+        cursor = conn.executemany(SQL_IMPORTAR[conflicto], validas)
+        # Las filas nuevas se indexan juntas; las actualizadas ya pasaron por trg_servicios_fts_update
+        conn.execute('''INSERT INTO servicios_fts (rowid, nombre, descripcion)
+                        SELECT id, nombre, descripcion FROM servicios WHERE id > ?''', (ultimo_id,))
+        conn.execute('''INSERT INTO servicios_cambios (servicio_id, operacion)
+                        SELECT id, 'insert' FROM servicios WHERE id > ? ORDER BY id''', (ultimo_id,))
+        sumar_al_resumen(conn, ultimo_id)
+        conn.execute('DELETE FROM carga_masiva')
+        conn.execute('UPDATE catalogo_estado SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1')
+        conn.commit()
+        reporte['aplicadas'] += cursor.rowcount
+        reporte['omitidas'] += len(validas) - cursor.rowcount
+
+    conn = get_db_connection()
+    try:
+        pendientes = []
+        nombres_bloque = set()
+        for linea, datos, fallo in filas:
+            reporte['filas_leidas'] += 1
+            if fallo:
+                error(linea, fallo)
+                continue
+            try:
+                fila = validar_fila(datos)
+            except ValueError as e:
+                error(linea, str(e))
+                continue
+            if fila[0] in nombres_bloque:
+                if conflicto == 'error':
+                    error(linea, 'nombre repetido en el archivo: %r' % fila[0])
+                    continue
+                # omitir/actualizar: el repetido se resuelve en el bloque siguiente
+                aplicar(pendientes)
+                pendientes, nombres_bloque = [], set()
+            pendientes.append((linea, fila))
+            nombres_bloque.add(fila[0])
+            if len(pendientes) >= bloque:
+                aplicar(pendientes)
+                pendientes, nombres_bloque = [], set()
+        if pendientes:
+            aplicar(pendientes)
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+        if reporte['aplicadas']:
+            invalidar_catalogo()
+    duracion = time.perf_counter() - inicio
+    reporte['duracion_ms'] = round(duracion * 1000, 2)
+    reporte['filas_por_segundo'] = round(reporte['filas_leidas'] / duracion) if duracion else 0
+    return reporte
+
+def exportar_csv():
+    """Generador de CSV con las columnas de importación, por bloques de EXPORT_CHUNK filas"""
+    bufer = io.StringIO()
+    escritor = csv.writer(bufer)
+    escritor.writerow(COLUMNAS_IMPORTACION)
+    for i, servicio in enumerate(iterar_servicios(EXPORT_CHUNK), 1):
+        escritor.writerow([servicio['nombre'], servicio['descripcion'], servicio['precio'],
+                           servicio['stock'], servicio['promocion'], servicio['icono']])
+        if i % EXPORT_CHUNK == 0:
+            yield bufer.getvalue()
+            bufer.seek(0)
+            bufer.truncate()
+    yield bufer.getvalue()
+
+def formato_de(nombre_archivo, tipo):
+    """Deduce csv/ndjson de la extensión o del Content-Type"""
+    nombre_archivo = (nombre_archivo or '').lower()
+    if nombre_archivo.endswith(('.ndjson', '.jsonl')) or 'ndjson' in (tipo or ''):
+        return 'ndjson'
+    return 'csv'
+
+@app.route('/admin/importar', methods=['GET', 'POST'])
+def importar():
+    """Importación masiva desde CSV o NDJSON (formulario o cuerpo crudo)"""
+    if 'user_id' not in session:
+        return redirect(url_for('login'))
+    if request.method == 'GET':
+        return render_template('importar.html')
+    
+    archivo = request.files.get('archivo')
+    if archivo:
+        flujo, formato = archivo.stream, formato_de(archivo.filename, archivo.mimetype)
+    else:
+        flujo, formato = request.stream, formato_de('', request.mimetype)
+    formato = request.values.get('formato') or formato
+    conflicto = request.values.get('conflicto', 'error')
+    try:
+        texto = io.TextIOWrapper(flujo, encoding='utf-8-sig', newline='')
+        reporte = importar_servicios(leer_filas(texto, formato), conflicto)
+    except (ValueError, UnicodeDecodeError) as e:
+        if archivo:
+            return render_template('importar.html', error=str(e)), 400
+        return jsonify({'error': str(e)}), 400
+    if archivo:
+        return render_template('importar.html', reporte=reporte)
+    return jsonify(reporte)
+
+@app.route('/admin/exportar')
+def exportar():
+    """Exportación completa en streaming (csv por defecto, o ndjson)"""
+    if 'user_id' not in session:
+        return redirect(url_for('login'))
+    formato = request.args.get('formato', 'csv')
+    if formato == 'ndjson':
+        flujo, tipo = exportar_servicios(ndjson=True), 'application/x-ndjson'
+    elif formato == 'csv':
+        flujo, tipo = exportar_csv(), 'text/csv'
+    else:
+        return jsonify({'error': 'formato debe ser csv o ndjson'}), 400
+    respuesta = Response(flujo, mimetype=tipo)
+    respuesta.headers['Content-Disposition'] = 'attachment; filename=servicios.%s' % formato
+    return respuesta
+
+# API JSON para datos
+
+API_LIMIT_DEFAULT = 100
+API_LIMIT_MAX = 1000
+EXPORT_CHUNK = 1000
+API_ORDENES = ('id', 'precio', 'nombre')
+# Máximo de ids por multi-get (?ids= o POST)
+API_IDS_MAX = 1000
+
+def servicio_a_dict(servicio):
+    """Convierte una fila de servicios al formato público de la API"""
+    return {
+        'id': servicio['id'],
+        'nombre': servicio['nombre'],
+        'descripcion': servicio['descripcion'],
+        'precio': servicio['precio'],
+        'stock': servicio['stock'],
+        'promocion': bool(servicio['promocion']),
+        'icono': servicio['icono'],
+        'version': servicio['version']
+    }
+
+def codificar_cursor(orden, servicio):
+    """Cursor opaco con la posición (valor de orden, id) de la última fila"""
+    campo = orden.lstrip('-')
+    datos = {'o': orden, 'id': servicio['id']}
+    if campo != 'id':
+        datos['v'] = servicio[campo]
+    crudo = json.dumps(datos, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(crudo).decode().rstrip('=')
+
+# Tipo del valor `v` de un cursor según el orden (id no lleva valor)
+TIPOS_CURSOR = {'id': type(None), 'precio': (int, float), 'nombre': str, 'relevancia': (int, float)}
+
+def decodificar_cursor(cursor, orden):
+    """Devuelve (valor, id) del cursor o lanza ValueError si no es válido"""
+    try:
+        crudo = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        datos = json.loads(crudo)
+        if datos['o'] != orden:
+            raise ValueError('el cursor pertenece a otro ordenamiento')
+        valor, ultimo_id = datos.get('v'), datos['id']
+        # El valor se compara con bisect contra la clave del orden: un tipo
+        # distinto (cursor manipulado) lanzaría TypeError dentro de la consulta
+        if type(ultimo_id) is not int or not isinstance(valor, TIPOS_CURSOR[orden.lstrip('-')]) \
+                or isinstance(valor, bool) or isinstance(valor, float) and not math.isfinite(valor):
+            raise ValueError('tipo inesperado en el cursor')
+        return valor, ultimo_id
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        raise ValueError('cursor inválido') from e
+
+def leer_bool(valor):
+    """Interpreta parámetros booleanos de la query string"""
+    valor = valor.strip().lower()
+    if valor in ('1', 'true', 'si', 'sí', 'yes'):
+        return True
+    if valor in ('0', 'false', 'no'):
+        return False
+    raise ValueError('valor booleano inválido: %s' % valor)
+
+def consulta_servicios(args):
+    """Valida la query string de /api/servicios.
+
+    Devuelve (filtros, limite, orden): filtros son los argumentos de
+    catalog_store.consultar(). La paginación es por cursor sobre
+    (orden, id), así que cada página cuesta lo mismo sin importar cuántas
+    filas haya antes.
+    """
+    orden = args.get('sort', 'id')
+    campo = orden.lstrip('-')
+    if campo not in API_ORDENES or orden.count('-') > 1:
+        raise ValueError('sort debe ser uno de: %s (prefijo - para descendente)' % ', '.join(API_ORDENES))
+
+    limite = int(args.get('limit', API_LIMIT_DEFAULT))
+    if limite < 1:
+        raise ValueError('limit debe ser mayor que 0')
+    limite = min(limite, API_LIMIT_MAX)
+
+    filtros = {'orden': campo, 'desc': orden.startswith('-')}
+    if 'promocion' in args:
+        filtros['promocion'] = leer_bool(args['promocion'])
+    for nombre in ('min_precio', 'max_precio'):
+        if nombre in args:
+            # float() acepta nan e inf, que romperían el bisect por precio
+            filtros[nombre] = float(args[nombre])
+            if not math.isfinite(filtros[nombre]):
+                raise ValueError('%s debe ser un número finito' % nombre)
+    if 'in_stock' in args:
+        filtros['en_stock'] = leer_bool(args['in_stock'])
+
+    if args.get('cursor'):
+        valor, ultimo_id = decodificar_cursor(args['cursor'], orden)
+        filtros['despues_de'] = (ultimo_id,) if campo == 'id' else (valor, ultimo_id)
+    return filtros, limite, orden
+
+def codificar_servicios(servicios, ndjson=False):
+    """Generador que codifica servicios en JSON por bloques de EXPORT_CHUNK filas"""
+    codificar = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+    servicios = iter(servicios)
+    if not ndjson:
+        yield '['
+    primero = True
+    while True:
+        filas = list(itertools.islice(servicios, EXPORT_CHUNK))
+        if not filas:
+            break
+        if ndjson:
+            yield ''.join(codificar(servicio_a_dict(f)) + '\n' for f in filas)
+        else:
+            bloque = ','.join(codificar(servicio_a_dict(f)) for f in filas)
+            yield bloque if primero else ',' + bloque
+            primero = False
+    if not ndjson:
+        yield ']'
+
+def exportar_servicios(ndjson=False):
+    """Exporta el catálogo completo leyendo por bloques de la base.
+
+    Nunca hay más de EXPORT_CHUNK filas en memoria, así que el consumo se
+    mantiene plano sin importar el tamaño del catálogo; iterar_servicios
+    toma una conexión por bloque dentro del generador, que corre después
+    de que la ruta haya retornado.
+    """
+    return codificar_servicios(iterar_servicios(EXPORT_CHUNK), ndjson)
+
+@app.route('/api/servicios')
+@condicional(lambda: validadores_catalogo('api', request.query_string), CACHE_API)
+def api_servicios():
+    """API REST para obtener servicios en JSON (paginada por cursor).
+
+    Parámetros: limit, cursor, sort (id, precio, nombre; prefijo - para
+    descendente), promocion, min_precio, max_precio, in_stock. El cuerpo
+    sigue siendo una lista; el cursor de la página siguiente viaja en las
+    cabeceras X-Next-Cursor y Link.
+    
+    Con stream=1 (arreglo JSON) o stream=ndjson (un objeto por línea) se
+    exporta el catálogo completo en streaming, respetando filtros, orden
+    y cursor pero ignorando limit.
+    
+    Con ids=1,2,3 devuelve solo esos servicios (ver servicios_por_id).
+    """
+    return responder_api_servicios(request, catalog_store.indices())
+
+def responder_api_servicios(peticion, indices):
+    """Cuerpo de /api/servicios sobre una foto del catálogo (lo comparte la vista async)"""
+    try:
+        if 'ids' in peticion.args:
+            return app.json.response(servicios_por_id(leer_ids(peticion.args.getlist('ids')), indices))
+        filtros, limite, orden = consulta_servicios(peticion.args)
+    except ValueError as e:
+        respuesta = app.json.response({'error': str(e)})
+        respuesta.status_code = 400
+        return respuesta
+    
+    modo = peticion.args.get('stream', '').lower()
+    if modo in ('1', 'true', 'json'):
+        return Response(codificar_servicios(indices.consultar(**filtros)), mimetype='application/json')
+    if modo == 'ndjson':
+        return Response(codificar_servicios(indices.consultar(**filtros), ndjson=True),
+                        mimetype='application/x-ndjson')
+    
+    servicios = list(itertools.islice(indices.consultar(**filtros), limite + 1))
+    
+    hay_mas = len(servicios) > limite
+    servicios = servicios[:limite]
+    servicios_list = [servicio_a_dict(servicio) for servicio in servicios]
+    
+    respuesta = app.json.response(servicios_list)
+    if hay_mas:
+        siguiente = codificar_cursor(orden, servicios[-1])
+        args = peticion.args.to_dict()
+        args['cursor'] = siguiente
+        respuesta.headers['X-Next-Cursor'] = siguiente
+        respuesta.headers['Link'] = '<%s>; rel="next"' % url_de(peticion, 'api_servicios', **args)
+    return respuesta
+
+def url_de(peticion, endpoint, **valores):
+    """url_for() que funciona también fuera de una petición de Flask"""
+    return app.url_map.bind_to_environ(peticion.environ).build(endpoint, valores)
+
+def leer_ids(valores):
+    """Ids de un multi-get: "1,2,3", valores repetidos o una lista JSON.
+
+    Conserva el orden pedido y descarta repetidas.
+    """
+    ids = []
+    for valor in valores:
+        for parte in valor.split(',') if isinstance(valor, str) else [valor]:
+            if isinstance(parte, str) and not parte.strip():
+                continue
+            if not isinstance(parte, (str, int)) or isinstance(parte, bool):
+                raise ValueError('id inválido: %r' % (parte,))
+            try:
+                ids.append(int(parte))
+            except ValueError:
+                raise ValueError('id inválido: %r' % parte)
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        raise ValueError('ids no puede estar vacío')
+    if len(ids) > API_IDS_MAX:
+        raise ValueError('como máximo %d ids por petición' % API_IDS_MAX)
+    return ids
+
+def servicios_por_id(ids, indices):
+    """{'servicios': [...] en el orden de ids, 'faltantes': [ids que no existen]}
+
+    Sale del índice por id del catálogo en memoria: una búsqueda en un
+    dict por servicio, sin consultas a la base.
+    """
+    servicios, faltantes = [], []
+    for servicio_id in ids:
+        servicio = indices.por_id.get(servicio_id)
+        if servicio is None:
+            faltantes.append(servicio_id)
+        else:
+            servicios.append(servicio_a_dict(servicio))
+    return {'servicios': servicios, 'faltantes': faltantes}
+
+@app.route('/api/servicios', methods=['POST'])
+def api_servicios_lote():
+    """Multi-get para listas largas que no caben en la URL.
+
+    Acepta el formulario ids=1,2,3 (o ids repetido) o JSON {"ids": [1, 2, 3]}
+    y responde como GET /api/servicios?ids=. Solo lee: no requiere sesión.
+    """
+    datos = request.get_json(silent=True)
+    if isinstance(datos, dict):
+        valores = datos.get('ids')
+        valores = valores if isinstance(valores, list) else [valores] if valores is not None else []
+    else:
+        valores = request.form.getlist('ids')
+    try:
+        ids = leer_ids(valores)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    respuesta = jsonify(servicios_por_id(ids, catalog_store.indices()))
+    respuesta.headers['Cache-Control'] = CACHE_PRIVADA
+    return respuesta
+
+@app.route('/api/servicios/<int:servicio_id>')
+@condicional(lambda servicio_id: validadores_servicio('api-servicio', servicio_id), CACHE_API)
+def api_servicio(servicio_id):
+    """Un servicio en JSON (el mismo objeto que en la lista, con su versión)"""
+    servicio = catalog_store.obtener(servicio_id)
+    if not servicio:
+        return jsonify({'error': 'servicio no encontrado'}), 404
+    return jsonify(servicio_a_dict(servicio))
+
+def resumen_catalogo():
+    """Totales, precios e histograma del catálogo leídos de catalogo_resumen.
+
+    Son dos lecturas de una fila y de len(TRAMOS_PRECIO) filas, sin
+    importar el tamaño del catálogo.
+    """
+    conn = get_db_connection()
+    resumen = conn.execute('SELECT * FROM catalogo_resumen WHERE id = 1').fetchone()
+    tramos = conn.execute('SELECT desde, hasta, servicios FROM catalogo_tramos_precio ORDER BY tramo').fetchall()
+    conn.close()
+    total = resumen['servicios']
+    return {
+        'servicios': total,
+        'stock_total': resumen['stock_total'],
+        'en_promocion': resumen['en_promocion'],
+        'precio': {
+            'min': resumen['precio_min'],
+            'max': resumen['precio_max'],
+            'promedio': round(resumen['suma_precios'] / total, 2) if total else None,
+        },
+        'tramos_precio': [dict(tramo) for tramo in tramos],
+    }
+
+@app.route('/api/servicios/stats')
+@condicional(lambda: validadores_catalogo('api-stats'), CACHE_API)
+def api_servicios_stats():
+    """Resumen del catálogo mantenido por triggers (migración 11)"""
+    return jsonify(resumen_catalogo())
+
+# EDICIÓN CON CONCURRENCIA OPTIMISTA
+# Cada UPDATE incrementa servicios.version. Quien edita envía la versión
+# que leyó y el UPDATE solo aplica si sigue siendo la misma (WHERE
+# version = ?), así una escritura basada en datos viejos se rechaza sin
+# bloquear la tabla mientras el cliente decide.
+
+CAMPOS_MASIVOS = ('precio', 'stock', 'promocion')
+
+SQL_PATCH_MASIVO = '''
+    UPDATE servicios SET
+        precio = COALESCE(?, precio), stock = COALESCE(?, stock),
+        promocion = COALESCE(?, promocion), version = version + 1
+    WHERE id = ? AND version = COALESCE(?, version)
+'''
+
+def servicio_actual(servicio_id):
+    """Fila de servicios leída de la base (no del catálogo en memoria)"""
+    conn = get_db_connection()
+    servicio = conn.execute('SELECT * FROM servicios WHERE id = ?', (servicio_id,)).fetchone()
+    conn.close()
+    return servicio
+
+def actualizar_servicio(conn, servicio_id, cambios, version=None):
+    """UPDATE parcial de `cambios` ya validados (sin COMMIT).
+
+    Devuelve ('ok', fila actualizada), ('conflicto', versión actual) o
+    ('no_existe', None). Con version=None la escritura es incondicional.
+    """
+    sql = 'UPDATE servicios SET %s, version = version + 1 WHERE id = ?' % ', '.join(
+        '%s = ?' % campo for campo in cambios)
+    params = list(cambios.values()) + [servicio_id]
+    if version is not None:
+        sql += ' AND version = ?'
+        params.append(version)
+    filas = conn.execute(sql + ' RETURNING *', params).fetchall()
+    if filas:
+        return 'ok', filas[0]
+    actual = conn.execute('SELECT version FROM servicios WHERE id = ?', (servicio_id,)).fetchone()
+    if actual is None:
+        return 'no_existe', None
+    return 'conflicto', actual['version']
+
+class PrecondicionFallida(Exception):
+    """If-Match no corresponde a la versión actual del servicio (412)"""
+
+    def __init__(self, version_actual):
+        super().__init__('el servicio no coincide con If-Match')
+        self.version_actual = version_actual
+
+def version_esperada(datos):
+    """Versión enviada en el cuerpo como "version", o None"""
+    version = datos.pop('version', None)
+    try:
+        return int(version) if version is not None else None
+    except (TypeError, ValueError):
+        raise ValueError('version inválida: %r' % version)
+
+def version_if_match(servicio_id):
+    """Versión del servicio si If-Match la describe, o None con "*".
+
+    Vale el ETag de GET /api/servicios/<id> o la versión como etiqueta
+    ("3"). La comparación es débil porque la compresión marca como débil
+    el ETag de la respuesta (ver usar_codificacion) sin cambiar el
+    servicio. Lanza PrecondicionFallida si no coincide o no se entiende.
+    """
+    etiquetas = request.if_match
+    servicio = servicio_actual(servicio_id)
+    if servicio is None:
+        raise PrecondicionFallida(None)
+    if etiquetas.star_tag:
+        return None
+    etag, _ = validadores_de(servicio, 'api-servicio', servicio_id)
+    if etiquetas.contains_weak(etag) or etiquetas.contains_weak(str(servicio['version'])):
+        return servicio['version']
+    raise PrecondicionFallida(servicio['version'])
+
+@app.route('/api/servicios/<int:servicio_id>', methods=['PATCH'])
+def patch_servicio(servicio_id):
+    """Actualización parcial de un servicio (JSON con los campos a cambiar).
+
+    Con "version" en el cuerpo responde 409 si el servicio cambió desde
+    que el cliente lo leyó; con If-Match (ETag o versión) responde 412.
+    Devuelve el servicio con su nueva versión.
+    """
+    if 'user_id' not in session:
+        return jsonify({'error': 'no autorizado'}), 401
+    datos = request.get_json(silent=True)
+    if not isinstance(datos, dict):
+        return jsonify({'error': 'se esperaba un objeto JSON'}), 400
+    if_match = 'version' not in datos and 'If-Match' in request.headers
+    conn = get_db_connection()
+    try:
+        version = version_if_match(servicio_id) if if_match else version_esperada(datos)
+        cambios = {campo: validar_campo(campo, valor) for campo, valor in datos.items() if campo != 'id'}
+        if not cambios:
+            raise ValueError('nada que actualizar')
+        estado, resultado = actualizar_servicio(conn, servicio_id, cambios, version)
+        conn.commit()
+    except PrecondicionFallida as e:
+        return jsonify({'error': str(e), 'version_actual': e.version_actual}), 412
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except sqlite3.IntegrityError:
+        return jsonify({'error': 'Ya existe un servicio con ese nombre'}), 409
+    finally:
+        conn.close()
+    if estado == 'no_existe':
+        return jsonify({'error': 'servicio no encontrado'}), 404
+    if estado == 'conflicto':
+        # Cambió entre la lectura de If-Match y el UPDATE (WHERE version = ?)
+        return jsonify({'error': 'el servicio cambió desde que se leyó', 'version_actual': resultado}), \
+            412 if if_match else 409
+    invalidar_catalogo()
+    return jsonify(servicio_a_dict(resultado))
+
+@app.route('/api/servicios', methods=['PATCH'])
+def patch_servicios():
+    """Cambios de precio, stock o promoción de muchos servicios en una transacción.
+
+    Cuerpo: lista (o {"cambios": lista}) de objetos con "id", alguno de
+    precio/stock/promocion y, opcionalmente, "version". Todo o nada: si
+    alguna fila no existe o tiene otra versión se revierte el lote y se
+    responde 409 con las ids en conflicto. Cada fila aplicada sube su
+    versión en 1.
+    """
+    if 'user_id' not in session:
+        return jsonify({'error': 'no autorizado'}), 401
+    datos = request.get_json(silent=True)
+    if isinstance(datos, dict):
+        datos = datos.get('cambios')
+    if not isinstance(datos, list) or not datos:
+        return jsonify({'error': 'se esperaba una lista de cambios'}), 400
+
+    inicio = time.perf_counter()
+    filas, errores, vistas = [], [], set()
+    for indice, cambio in enumerate(datos):
+        try:
+            if not isinstance(cambio, dict):
+                raise ValueError('se esperaba un objeto JSON')
+            try:
+                servicio_id = int(cambio.get('id'))
+            except (TypeError, ValueError):
+                raise ValueError('id inválido: %r' % cambio.get('id'))
+            if servicio_id in vistas:
+                raise ValueError('id repetido: %d' % servicio_id)
+            vistas.add(servicio_id)
+            desconocidos = set(cambio) - set(CAMPOS_MASIVOS) - {'id', 'version'}
+            if desconocidos:
+                raise ValueError('campos no admitidos: %s' % ', '.join(sorted(desconocidos)))
+            valores = [validar_campo(campo, cambio[campo]) if campo in cambio else None for campo in CAMPOS_MASIVOS]
+            if all(valor is None for valor in valores):
+                raise ValueError('nada que actualizar')
+            version = cambio.get('version')
+            filas.append(valores + [servicio_id, int(version) if version is not None else None])
+        except (TypeError, ValueError) as e:
+            errores.append({'indice': indice, 'error': str(e)})
+    if errores:
+        return jsonify({'error': 'cambios inválidos', 'errores': errores[:MAX_ERRORES_REPORTADOS]}), 400
+
+    conn = get_db_connection()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        aplicadas = conn.executemany(SQL_PATCH_MASIVO, filas).rowcount
+        if aplicadas != len(filas):
+            conn.rollback()
+            conflictos = conflictos_patch(conn, filas)
+            return jsonify({'error': 'ningún cambio aplicado: hay filas inexistentes o modificadas',
+                            'conflictos': conflictos[:MAX_ERRORES_REPORTADOS]}), 409
+        conn.commit()
+    finally:
+        conn.close()
+    invalidar_catalogo()
+    return jsonify({'actualizados': aplicadas, 'duracion_ms': round((time.perf_counter() - inicio) * 1000, 2)})
+
+def conflictos_patch(conn, filas):
+    """Filas de un PATCH masivo que no aplicaron: [{'id', 'version_actual'}] (None si no existe)"""
+    esperadas = {fila[-2]: fila[-1] for fila in filas}
+    ids = list(esperadas)
+    actuales = {}
+    for i in range(0, len(ids), 900):
+        parte = ids[i:i + 900]
+        actuales.update(conn.execute('SELECT id, version FROM servicios WHERE id IN (%s)'
+                                     % ','.join('?' * len(parte)), parte).fetchall())
+    return [{'id': i, 'version_actual': actuales.get(i)} for i, version in esperadas.items()
+            if i not in actuales or (version is not None and actuales[i] != version)]
+
+# BÚSQUEDA DE TEXTO COMPLETO
+
+BUSQUEDA_PAGINA_MAX = 100
+# Máximo de coincidencias que se puntúan con bm25 por consulta. Ordenar
+# por relevancia obliga a puntuar cada coincidencia, así que una palabra
+# presente en medio catálogo costaría cientos de ms (~500 ms con 200k
+# servicios); con el tope, las búsquedas amplias cuestan lo mismo que las
+# específicas. Ojo: los candidatos son las primeras BUSQUEDA_CANDIDATOS
+# coincidencias por rowid, no las más relevantes, así que el resultado se
+# marca como truncado (cabecera X-Search-Truncated, aviso en /servicios)
+# para que el cliente afine la búsqueda.
+BUSQUEDA_CANDIDATOS = int(os.environ.get('TECHFLOW_SEARCH_CANDIDATES', '2000'))
+SQL_CANDIDATOS = '''
+    (SELECT rowid, rank FROM servicios_fts WHERE servicios_fts MATCH ? LIMIT ?) f
+    JOIN servicios s ON s.id = f.rowid
+'''
+SQL_BUSQUEDA_PAGINA = 'SELECT s.* FROM' + SQL_CANDIDATOS + 'ORDER BY f.rank, f.rowid LIMIT ?'
+# ¿Hay más coincidencias que candidatos? Sin pedir rank no se puntúa nada
+SQL_BUSQUEDA_TRUNCADA = 'SELECT 1 FROM servicios_fts WHERE servicios_fts MATCH ? LIMIT 1 OFFSET ?'
+
+def busqueda_truncada(expresion):
+    """True si la búsqueda tiene más de BUSQUEDA_CANDIDATOS coincidencias"""
+    conn = get_db_connection()
+    try:
+        return conn.execute(SQL_BUSQUEDA_TRUNCADA, (expresion, BUSQUEDA_CANDIDATOS)).fetchone() is not None
+    finally:
+        conn.close()
+
+def expresion_busqueda(texto):
+    """Convierte lo que escribe el usuario en una consulta FTS5 segura.
+
+    Cada palabra se cita (así los operadores de FTS5 no se interpretan) y
+    se busca como prefijo; todas las palabras deben aparecer.
+    """
+    terminos = re.findall(r'\w+', texto)[:10]
+    if not terminos:
+        raise ValueError('q debe contener al menos una palabra')
+    return ' '.join('"%s"*' % termino for termino in terminos)
+
+@app.route('/api/servicios/search')
+@condicional(lambda: validadores_catalogo('search', request.query_string), CACHE_API)
+def buscar_servicios():
+    """Búsqueda por relevancia (bm25) en nombre y descripción.
+
+    Parámetros: q (obligatorio), limit y cursor, con la misma paginación
+    por cabeceras X-Next-Cursor/Link que /api/servicios.
+    """
+    try:
+        expresion = expresion_busqueda(request.args.get('q', ''))
+        limite = min(int(request.args.get('limit', API_LIMIT_DEFAULT)), API_LIMIT_MAX)
+        if limite < 1:
+            raise ValueError('limit debe ser mayor que 0')
+        sql = 'SELECT s.*, f.rank AS relevancia FROM' + SQL_CANDIDATOS
+        params = [expresion, BUSQUEDA_CANDIDATOS]
+        if request.args.get('cursor'):
+            relevancia, ultimo_id = decodificar_cursor(request.args['cursor'], 'relevancia')
+            sql += 'WHERE (f.rank, f.rowid) > (?, ?)'
+            params += [relevancia, ultimo_id]
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    conn = get_db_connection()
+    servicios = conn.execute(sql + ' ORDER BY f.rank, f.rowid LIMIT ?', params + [limite + 1]).fetchall()
+    conn.close()
+    
+    hay_mas = len(servicios) > limite
+    servicios = servicios[:limite]
+    respuesta = jsonify([servicio_a_dict(servicio) for servicio in servicios])
+    if busqueda_truncada(expresion):
+        respuesta.headers['X-Search-Truncated'] = str(BUSQUEDA_CANDIDATOS)
+    if hay_mas:
+        siguiente = codificar_cursor('relevancia', servicios[-1])
+        args = request.args.to_dict()
+        args['cursor'] = siguiente
+        respuesta.headers['X-Next-Cursor'] = siguiente
+        respuesta.headers['Link'] = '<%s>; rel="next"' % url_for('buscar_servicios', **args)
+    return respuesta
+
+# SINCRONIZACIÓN INCREMENTAL (REGISTRO DE CAMBIOS Y SSE)
+
+class CambiosExpirados(LookupError):
+    """El registro ya no conserva los cambios pedidos; hay que resincronizar"""
+
+    def __init__(self, head):
+        super().__init__('los cambios anteriores a esta secuencia ya no están disponibles')
+        self.head = head
+
+def leer_cambios(desde, limite):
+    """Cambios con seq > desde, como (cambios, siguiente, head, hay_mas).
+
+    Cada servicio aparece una sola vez, en la posición de su último cambio
+    y con sus datos actuales: 'upsert' si sigue existiendo, 'delete' si no.
+    """
+    conn = get_db_connection()
+    try:
+        conn.execute('BEGIN')
+        primero, head = conn.execute('SELECT MIN(seq), COALESCE(MAX(seq), 0) FROM servicios_cambios').fetchone()
+        if primero is not None and desde < primero - 1:
+            raise CambiosExpirados(head)
+        filas = conn.execute('''
+            SELECT c.seq, c.servicio_id, s.*
+            FROM servicios_cambios c LEFT JOIN servicios s ON s.id = c.servicio_id
+            WHERE c.seq > ? ORDER BY c.seq LIMIT ?
+        ''', (desde, limite)).fetchall()
+    finally:
+        conn.rollback()
+        conn.close()
+    ultimos = OrderedDict()
+    for fila in filas:
+        ultimos.pop(fila['servicio_id'], None)
+        if fila['id'] is None:
+            ultimos[fila['servicio_id']] = {'seq': fila['seq'], 'op': 'delete', 'id': fila['servicio_id']}
+        else:
+            ultimos[fila['servicio_id']] = {'seq': fila['seq'], 'op': 'upsert', 'id': fila['id'],
+                                            'servicio': servicio_a_dict(fila)}
+    siguiente = filas[-1]['seq'] if filas else max(desde, 0)
+    return list(ultimos.values()), siguiente, head, len(filas) == limite
+
+@app.route('/api/servicios/changes')
+@condicional(lambda: validadores_catalogo('changes', request.query_string), CACHE_REVALIDAR)
+def cambios_servicios():
+    """Cambios del catálogo posteriores a ?since=<seq> (paginado con limit).
+
+    Un cliente descarga /api/servicios una vez, guarda 'head' de esta ruta
+    (leído antes de la descarga) y desde entonces pide solo las
+    diferencias con since=<next>. Si se atrasó más de lo que guarda el
+    registro recibe 410 con el 'head' actual para volver a empezar.
+    """
+    try:
+        desde = int(request.args['since'])
+        limite = min(int(request.args.get('limit', API_LIMIT_MAX)), API_LIMIT_MAX)
+        if desde < 0 or limite < 1:
+            raise ValueError
+    except (KeyError, ValueError):
+        return jsonify({'error': 'since debe ser una secuencia >= 0 y limit mayor que 0'}), 400
+    try:
+        cambios, siguiente, head, hay_mas = leer_cambios(desde, limite)
+    except CambiosExpirados as e:
+        return jsonify({'error': str(e), 'head': e.head}), 410
+    return jsonify({'since': desde, 'next': siguiente, 'head': head, 'more': hay_mas, 'changes': cambios})
+
+sse_clientes = threading.BoundedSemaphore(SSE_MAX_CLIENTS)
+
+def stream_cambios(desde, codificar):
+    """Eventos SSE con los cambios posteriores a `desde` mientras dure la conexión.
+
+    Entre consultas espera la notificación de una escritura local o, como
+    mucho, CATALOG_STATE_TTL segundos para ver escrituras de otros
+    procesos; solo vuelve a leer el registro si cambió la versión del
+    catálogo. Cierra tras SSE_MAX_DURATION para liberar el hilo: el
+    navegador reconecta solo con Last-Event-ID.
+    """
+    fin = time.monotonic() + SSE_MAX_DURATION
+    ultimo_envio = time.monotonic()
+    yield 'retry: 3000\n\n'
+    version = None
+    while time.monotonic() < fin:
+        if catalog_state.version != version:
+            version = catalog_state.version
+            while True:
+                try:
+                    cambios, desde, head, hay_mas = leer_cambios(desde, EXPORT_CHUNK)
+                except CambiosExpirados as e:
+                    yield 'event: reset\ndata: %s\n\n' % codificar({'head': e.head})
+                    cambios, desde, hay_mas = [], e.head, False
+                if cambios:
+                    yield ''.join('id: %d\nevent: change\ndata: %s\n\n' % (c['seq'], codificar(c))
+                                  for c in cambios)
+                    ultimo_envio = time.monotonic()
+                if not hay_mas:
+                    break
+        if time.monotonic() - ultimo_envio > 15:
+            # Comentario SSE: mantiene viva la conexión y detecta clientes caídos
+            yield ': ping\n\n'
+            ultimo_envio = time.monotonic()
+        with cambios_nuevos:
+            cambios_nuevos.wait(CATALOG_STATE_TTL)
+
+@app.route('/api/servicios/changes/stream')
+def stream_cambios_servicios():
+    """Server-Sent Events con cada cambio del catálogo en vivo.
+
+    Empieza en ?since=<seq>, en la cabecera Last-Event-ID al reconectar
+    o, sin ninguno de los dos, en el cambio más reciente.
+    """
+    desde = request.headers.get('Last-Event-ID') or request.args.get('since')
+    try:
+        desde = int(desde) if desde is not None else None
+    except ValueError:
+        return jsonify({'error': 'since debe ser una secuencia'}), 400
+    if not sse_clientes.acquire(blocking=False):
+        respuesta = jsonify({'error': 'demasiadas conexiones de cambios abiertas'})
+        respuesta.status_code = 503
+        respuesta.headers['Retry-After'] = '5'
+        return respuesta
+    try:
+        if desde is None:
+            conn = get_db_connection()
+            desde = conn.execute('SELECT COALESCE(MAX(seq), 0) FROM servicios_cambios').fetchone()[0]
+            conn.close()
+    except BaseException:
+        sse_clientes.release()
+        raise
+    codificar = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+    respuesta = Response(stream_cambios(desde, codificar), mimetype='text/event-stream')
+    respuesta.headers['Cache-Control'] = 'no-cache'
+    respuesta.headers['X-Accel-Buffering'] = 'no'
+    respuesta.call_on_close(sse_clientes.release)
+    return respuesta
+
+# RESERVAS Y COTIZACIONES
+# SQLite admite un solo escritor, así que las reservas no compiten por el
+# lock desde cada hilo: se encolan y un único hilo escritor las confirma
+# en lotes (group commit). Mientras confirma un lote se acumula el
+# siguiente, de modo que con carga alta cada COMMIT cubre cientos de
+# reservas y con carga baja cada una sale sola, sin espera añadida.
+
+class Reserva:
+    """Reserva pendiente; el hilo escritor rellena `resultado` y avisa por `hecha`.
+
+    `tomada` y `cancelada` se cambian bajo el lock del grupo: el escritor
+    no aplica una reserva cancelada y quien espera no cancela una tomada.
+    """
+
+    __slots__ = ('servicio_id', 'cantidad', 'nombre', 'email', 'hecha', 'resultado', 'tomada', 'cancelada')
+
+    def __init__(self, servicio_id, cantidad, nombre, email):
+        self.servicio_id = servicio_id
+        self.cantidad = cantidad
+        self.nombre = nombre
+        self.email = email
+        self.hecha = threading.Event()
+        self.resultado = None
+        self.tomada = False
+        self.cancelada = False
+
+
+class ReservasSaturadas(RuntimeError):
+    """La cola de reservas está llena o el escritor no respondió a tiempo"""
+
+
+class GrupoReservas:
+    """Confirma reservas en transacciones cortas desde un solo hilo escritor.
+
+    El stock se descuenta con un UPDATE condicional (stock >= cantidad) y
+    RETURNING, sin leer y luego escribir, así que nunca queda negativo
+    aunque varios procesos reserven a la vez.
+    """
+
+    def __init__(self, max_lote, espera, max_cola):
+        self.max_lote = max_lote
+        self.espera = espera
+        self._cola = queue.Queue(max_cola)
+        self._lock = threading.Lock()
+        self._hilo = None
+
+    def reservar(self, servicio_id, cantidad, nombre, email, timeout=DB_POOL_TIMEOUT):
+        """Devuelve (estado, datos): 'ok', 'sin_stock' o 'no_existe'"""
+        reserva = Reserva(servicio_id, cantidad, nombre, email)
+        self._arrancar()
+        try:
+            self._cola.put_nowait(reserva)
+        except queue.Full:
+            raise ReservasSaturadas('demasiadas reservas en cola')
+        if not reserva.hecha.wait(timeout):
+            with self._lock:
+                reserva.cancelada = not reserva.tomada
+            if reserva.cancelada:
+                raise ReservasSaturadas('la reserva no se confirmó a tiempo')
+            # Ya está en una transacción: el resultado llega con su COMMIT
+            reserva.hecha.wait()
+        if isinstance(reserva.resultado, Exception):
+            raise reserva.resultado
+        return reserva.resultado
+
+    def _arrancar(self):
+        with self._lock:
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._escritor, name='reservas', daemon=True)
+                self._hilo.start()
+
+    def _escritor(self):
+        try:
+            while True:
+                lote = [self._cola.get()]
+                limite = time.monotonic() + self.espera
+                while len(lote) < self.max_lote:
+                    try:
+                        restante = limite - time.monotonic()
+                        lote.append(self._cola.get(timeout=restante) if restante > 0 else self._cola.get_nowait())
+                    except queue.Empty:
+                        break
+                self._confirmar(lote)
+        finally:
+            # Si el hilo muere, la próxima reserva arranca otro
+            with self._lock:
+                self._hilo = None
+
+    def _confirmar(self, lote):
+        with self._lock:
+            vigentes = [reserva for reserva in lote if not reserva.cancelada]
+            for reserva in vigentes:
+                reserva.tomada = True
+        for _ in range(len(lote) - len(vigentes)):
+            metricas.inc('techflow_reservations_total', (('resultado', 'cancelada'),))
+        if not vigentes:
+            return
+        inicio = time.perf_counter()
+        # Cada reserva recibe su propia excepción: se relanzan en hilos distintos
+        resultados = [ReservasSaturadas('el escritor de reservas se detuvo') for _ in vigentes]
+        try:
+            conn = get_db_connection()
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                aplicadas = [self._aplicar_aislada(conn, reserva) for reserva in vigentes]
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            finally:
+                conn.close()
+            resultados = aplicadas
+        except Exception as e:
+            traceback.print_exc()
+            resultados = [ReservasSaturadas('no se pudo confirmar la reserva: %s' % e) for _ in vigentes]
+        finally:
+            metricas.observar('techflow_reservation_commit_seconds', (), time.perf_counter() - inicio)
+            metricas.inc('techflow_reservation_batches_total', ())
+            if any(r[0] == 'ok' for r in resultados if isinstance(r, tuple)):
+                invalidar_catalogo()
+            for reserva, resultado in zip(vigentes, resultados):
+                estado = resultado[0] if isinstance(resultado, tuple) else 'error'
+                metricas.inc('techflow_reservations_total', (('resultado', estado),))
+                reserva.resultado = resultado
+                reserva.hecha.set()
+
+    @classmethod
+    def _aplicar_aislada(cls, conn, reserva):
+        """_aplicar dentro de un SAVEPOINT: si falla, solo se pierde esta reserva"""
+        conn.execute('SAVEPOINT reserva')
+        try:
+            resultado = cls._aplicar(conn, reserva)
+        except sqlite3.DatabaseError as e:
+            # Si el error ya abortó la transacción, esto falla y cae todo el lote
+            conn.execute('ROLLBACK TO reserva')
+            resultado = e
+        conn.execute('RELEASE reserva')
+        return resultado
+
+    @staticmethod
+    def _aplicar(conn, reserva):
+        fila = conn.execute('''
+            UPDATE servicios SET stock = stock - ?, version = version + 1
+            WHERE id = ? AND stock >= ?
+            RETURNING stock
+        ''', (reserva.cantidad, reserva.servicio_id, reserva.cantidad)).fetchall()
+        if not fila:
+            actual = conn.execute('SELECT stock FROM servicios WHERE id = ?', (reserva.servicio_id,)).fetchone()
+            if actual is None:
+                return 'no_existe', {}
+            return 'sin_stock', {'stock_disponible': actual['stock']}
+        cursor = conn.execute('''
+            INSERT INTO reservas (servicio_id, cantidad, nombre, email) VALUES (?, ?, ?, ?)
+        ''', (reserva.servicio_id, reserva.cantidad, reserva.nombre, reserva.email))
+        return 'ok', {'reserva_id': cursor.lastrowid, 'stock_restante': fila[0]['stock']}
+
+
+grupo_reservas = GrupoReservas(RESERVAS_LOTE, RESERVAS_ESPERA_MS / 1000, RESERVAS_COLA)
+
+def datos_reserva(valores):
+    """Valida cantidad, nombre y email de un formulario o JSON de reserva"""
+    try:
+        cantidad = int(valores.get('cantidad', 1))
+    except (TypeError, ValueError):
+        raise ValueError('cantidad debe ser un número entero')
+    if cantidad < 1:
+        raise ValueError('cantidad debe ser mayor que 0')
+    nombre = str(valores.get('nombre') or '').strip()
+    email = str(valores.get('email') or '').strip()
+    if not nombre:
+        raise ValueError('nombre es obligatorio')
+    if '@' not in email:
+        raise ValueError('email inválido')
+    return cantidad, nombre, email
+
+@app.route('/api/servicios/<int:servicio_id>/reservas', methods=['POST'])
+def reservar_servicio(servicio_id):
+    """Reserva `cantidad` unidades de stock (JSON o formulario).
+
+    201 con la reserva y el stock restante, 409 si no alcanza el stock,
+    404 si el servicio no existe y 503 si la cola de reservas está llena.
+    """
+    valores = request.get_json(silent=True) if request.is_json else request.form
+    try:
+        cantidad, nombre, email = datos_reserva(valores or {})
+        estado, datos = grupo_reservas.reservar(servicio_id, cantidad, nombre, email)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except ReservasSaturadas as e:
+        return jsonify({'error': str(e)}), 503
+    if estado == 'no_existe':
+        return jsonify({'error': 'servicio no encontrado'}), 404
+    if estado == 'sin_stock':
+        return jsonify(dict(datos, error='stock insuficiente')), 409
+    return jsonify(dict(datos, servicio_id=servicio_id, cantidad=cantidad)), 201
+
+@app.route('/detalle/<int:servicio_id>/cotizar', methods=['POST'])
+def cotizar_servicio(servicio_id):
+    """Formulario "Solicitar Cotización" de la página de detalle"""
+    mensaje = error = None
+    estado = 400
+    try:
+        cantidad, nombre, email = datos_reserva(request.form)
+        resultado, datos = grupo_reservas.reservar(servicio_id, cantidad, nombre, email)
+    except ValueError as e:
+        error = str(e)
+    except ReservasSaturadas:
+        error, estado = 'Hay demasiadas solicitudes en este momento, intenta de nuevo', 503
+    else:
+        if resultado == 'no_existe':
+            return redirect(url_for('servicios'))
+        if resultado == 'sin_stock':
+            error, estado = 'Solo quedan %d disponibles' % datos['stock_disponible'], 409
+        else:
+            mensaje, estado = 'Solicitud #%d registrada, te contactaremos a %s' % (datos['reserva_id'], email), 200
+    servicio = catalog_store.obtener(servicio_id)
+    if servicio is None:
+        return redirect(url_for('servicios'))
+    return render_template('detalle.html', servicio=servicio, mensaje=mensaje, error=error), estado
+
+@app.route('/admin/pool')
+def estado_pool():
+    """Estadísticas del pool de conexiones en JSON"""
+    if 'user_id' not in session:
+        return redirect(url_for('login'))
+    return jsonify(db_pool.stats())
+
+@app.route('/metrics')
+def metrics():
+    """Métricas en formato de texto de Prometheus, sumadas entre workers"""
+    respuesta = Response(metricas.texto_prometheus(), mimetype='text/plain; version=0.0.4')
+    respuesta.headers['Cache-Control'] = CACHE_PRIVADA
+    return respuesta
+
+@app.route('/admin/cache')
+def estado_cache():
+    """Contadores de la caché de páginas y fragmentos en JSON"""
+    if 'user_id' not in session:
+        return redirect(url_for('login'))
+    return jsonify({
+        'catalog_version': catalog_state.version,
+        'store': catalog_store.stats(),
+        'pages': page_cache.stats(),
+        'fragments': fragment_cache.stats(),
+        'compressed': compressed_cache.stats(),
+    })
+
+@app.route('/admin/perfiles', methods=['GET', 'POST'])
+def perfiles():
+    """Capturas de perfilado guardadas e interruptor de cProfile para esta sesión"""
+    if 'user_id' not in session:
+        return redirect(url_for('login'))
+    if request.method == 'POST':
+        if request.form.get('perfilar') == '1':
+            session['perfilar'] = True
+        else:
+            session.pop('perfilar', None)
+        return redirect(url_for('perfiles'))
+    capturas = []
+    for nombre in sorted(listar_nombres_capturas(), reverse=True):
+        try:
+            with open(os.path.join(PROFILE_DIR, nombre + '.json'), encoding='utf-8') as f:
+                capturas.append(json.load(f))
+        except (OSError, ValueError):  # rotada o a medio escribir por otro worker
+            continue
+    return render_template('perfiles.html', capturas=capturas, perfilando='perfilar' in session,
+                           umbral=SLOW_REQUEST_MS, muestreo=PROFILE_SAMPLE, carpeta=PROFILE_DIR)
+
+@app.route('/admin/perfiles/<nombre>')
+def descargar_perfil(nombre):
+    """Descarga el JSON, el .prof (pstats) o las pilas colapsadas de una captura"""
+    if 'user_id' not in session:
+        return redirect(url_for('login'))
+    if not re.fullmatch(r'[\w-]+\.(json|prof|pilas\.txt)', nombre):
+        abort(404)
+    return send_from_directory(os.path.abspath(PROFILE_DIR), nombre, as_attachment=True)
+
+# EXPORTACIÓN ESTÁTICA (FIREBASE HOSTING)
+# `main.py estatico` pre-renderiza las páginas públicas con las mismas
+# rutas y plantillas que sirve Flask, en la estructura que espera
+# firebase.json (cleanUrls: /detalle/3 -> detalle/3.html). Un manifiesto
+# guarda la huella de cada archivo (build + datos del servicio), así que
+# las corridas siguientes solo renderizan lo que cambió y borran las
+# páginas de servicios eliminados. Los formularios y enlaces dinámicos
+# (login, admin, cotizar) los reenvía firebase.json a Flask en Cloud
+# Run; la búsqueda se quita de la copia estática porque Hosting sirve
+# servicios.html sin mirar ?q=. La foto de la API se publica solo como
+# /api/servicios.json: /api/servicios (con sus parámetros, el POST del
+# lote y el PATCH masivo) llega siempre a Flask. No se generan variantes
+# .gz/.br: Hosting comprime solo y las serviría como archivos sueltos.
+
+ESTATICO_DIR = os.environ.get('TECHFLOW_STATIC_DIR', 'dist')
+MANIFIESTO_ESTATICO = '.techflow-manifest.json'
+
+def paginas_estaticas():
+    """Genera (archivo, url, huella) de cada página que se pre-renderiza"""
+    version = catalog_state.version
+    yield 'index.html', '/', etag_de('home', version)
+    yield 'servicios.html', '/servicios', etag_de('servicios', version)
+    yield 'api/servicios.json', '/api/servicios?stream=1', etag_de('api', version)
+    yield 'assets/' + STYLESHEET_NAME, app.jinja_env.globals['stylesheet_url'], STYLESHEET_NAME
+    for servicio in catalog_store.todos():
+        yield 'detalle/%d.html' % servicio.id, '/detalle/%d' % servicio.id, etag_de('detalle', *servicio)
+
+def escribir_atomico(destino, contenido):
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    temporal = destino + '.tmp'
+    with open(temporal, 'wb') as f:
+        f.write(contenido)
+    os.replace(temporal, destino)
+
+def exportar_estatico(salida=ESTATICO_DIR, completo=False):
+    """Pre-renderiza el sitio público en `salida`; devuelve un reporte"""
+    inicio = time.perf_counter()
+    ruta_manifiesto = os.path.join(salida, MANIFIESTO_ESTATICO)
+    anterior = {}
+    if not completo and os.path.exists(ruta_manifiesto):
+        with open(ruta_manifiesto) as f:
+            anterior = json.load(f)
+    actual = {}
+    reporte = {'renderizadas': 0, 'sin_cambios': 0, 'borradas': 0, 'bytes': 0}
+    cliente = app.test_client()
+    app.jinja_env.globals['estatico'] = True
+    try:
+        exportar_paginas(salida, cliente, anterior, actual, reporte)
+    finally:
+        app.jinja_env.globals['estatico'] = False
+    for archivo in set(anterior) - set(actual):
+        try:
+            os.remove(os.path.join(salida, archivo))
+        except FileNotFoundError:
+            pass
+        reporte['borradas'] += 1
+    shutil.copyfile(os.path.join(app.root_path, '404.html'), os.path.join(salida, '404.html'))
+    escribir_atomico(ruta_manifiesto, json.dumps(actual, sort_keys=True).encode())
+    reporte['duracion_ms'] = round((time.perf_counter() - inicio) * 1000, 2)
+    return reporte
+
+def exportar_paginas(salida, cliente, anterior, actual, reporte):
+    for archivo, url, huella in paginas_estaticas():
+        destino = os.path.join(salida, archivo)
+        actual[archivo] = huella
+        if anterior.get(archivo) == huella and os.path.exists(destino):
+            reporte['sin_cambios'] += 1
+            continue
+        respuesta = cliente.get(url)
+        if respuesta.status_code != 200:
+            raise RuntimeError('%s respondió %d' % (url, respuesta.status_code))
+        contenido = respuesta.get_data()
+        escribir_atomico(destino, contenido)
+        reporte['bytes'] += len(contenido)
+        reporte['renderizadas'] += 1
+
+# SERVIDOR DE PRODUCCIÓN
+# Un proceso maestro abre el socket y lanza TECHFLOW_WORKERS procesos
+# hijos (python main.py worker) que lo heredan y atienden con un número
+# acotado de hilos cada uno. SIGHUP lanza una generación nueva de
+# workers (con el código recién desplegado) y, cuando están listos,
+# retira la anterior; SIGTERM/SIGINT drenan y apagan.
+
+class ManejadorPeticiones(WSGIRequestHandler):
+    """Cierra conexiones keep-alive ociosas para que el drenado no se cuelgue"""
+    protocol_version = 'HTTP/1.1'
+    timeout = KEEPALIVE_TIMEOUT
+
+
+class ServidorWorker(ThreadedWSGIServer):
+    """Servidor WSGI con un máximo de hilos y cierre que espera a las peticiones en curso"""
+
+    daemon_threads = False
+    block_on_close = True
+
+    def __init__(self, app, fd, hilos):
+        super().__init__('', 0, app, handler=ManejadorPeticiones, fd=fd)
+        self._cupos = threading.BoundedSemaphore(hilos)
+
+    def process_request(self, request, client_address):
+        self._cupos.acquire()
+        try:
+            super().process_request(request, client_address)
+        except Exception:
+            self._cupos.release()
+            raise
+
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            self._cupos.release()
+
+
+# MODO ASÍNCRONO (asyncio)
+# Con `serve --async` cada worker atiende el socket con un bucle asyncio
+# en lugar de un hilo por conexión: una conexión keep-alive ociosa o un
+# cliente lento solo cuesta una corrutina y sus buffers. /servicios,
+# /detalle/<id>, /api/servicios, /api/servicios/<id> y /api/servicios/stats
+# tienen versiones async que nunca bloquean el bucle: lo que toca SQLite, renderiza o
+# comprime corre en el executor de BaseAsincrona. Las demás rutas pasan por la app WSGI de
+# siempre, cada petición entera en un hilo de un pool de THREADS hilos
+# (igual que en el modo con hilos), así que no cambian.
+
+class BaseAsincrona:
+    """Acceso a SQLite para corrutinas sobre un executor dedicado.
+
+    Cada llamada corre completa en un hilo del executor, que toma y
+    devuelve su conexión del pool, así que ninguna conexión queda
+    prestada entre dos awaits. El estado y la foto del catálogo se
+    devuelven sin salir del bucle mientras sigan vigentes.
+    """
+
+    def __init__(self, hilos):
+        self.executor = ThreadPoolExecutor(hilos, thread_name_prefix='techflow-db')
+
+    async def ejecutar(self, funcion, *args, **kwargs):
+        """Corre una función bloqueante en el executor"""
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, functools.partial(funcion, *args, **kwargs))
+
+    async def consultar(self, sql, params=()):
+        def leer():
+            conn = get_db_connection()
+            try:
+                return conn.execute(sql, params).fetchall()
+            finally:
+                conn.close()
+        return await self.ejecutar(leer)
+
+    async def estado_catalogo(self):
+        """(version, updated_at) del catálogo, como catalog_state.actual()"""
+        vigente = catalog_state.vigente()
+        return vigente if vigente is not None else await self.ejecutar(catalog_state.actual)
+
+    async def indices(self):
+        """La foto del catálogo en memoria al día, como catalog_store.indices()"""
+        version, _ = await self.estado_catalogo()
+        indices = catalog_store.vigentes(version)
+        return indices if indices is not None else await self.ejecutar(catalog_store.indices)
+
+    def cerrar(self):
+        self.executor.shutdown(wait=True)
+
+
+base_asincrona = BaseAsincrona(ASYNC_DB_THREADS)
+VISTAS_ASINCRONAS = {}
+
+def vista_asincrona(endpoint):
+    """Registra la versión async de la vista de Flask `endpoint`"""
+    def decorador(vista):
+        VISTAS_ASINCRONAS[endpoint] = vista
+        return vista
+    return decorador
+
+async def validadores_catalogo_async(*partes):
+    version, modificado = await base_asincrona.estado_catalogo()
+    return etag_de(version, *partes), modificado
+
+async def validadores_servicio_async(vista, servicio_id):
+    return validadores_de((await base_asincrona.indices()).por_id.get(servicio_id), vista, servicio_id)
+
+def condicional_async(validadores, cache_control):
+    """condicional() para vistas async; validadores es una corrutina"""
+    def decorador(vista):
+        @functools.wraps(vista)
+        async def envoltura(peticion, **kwargs):
+            etag, modificado = await validadores(peticion, **kwargs)
+            if no_modificado(peticion, etag, modificado):
+                return con_validadores(Response(status=304), etag, modificado, cache_control)
+            respuesta = await vista(peticion, **kwargs)
+            if respuesta.status_code != 200:
+                return respuesta
+            return con_validadores(respuesta, etag, modificado, cache_control)
+        return envoltura
+    return decorador
+
+def en_contexto_app(funcion, *args, **kwargs):
+    """Las plantillas necesitan el contexto de la app (no el de una petición)"""
+    with app.app_context():
+        return funcion(*args, **kwargs)
+
+@vista_asincrona('servicios')
+@condicional_async(lambda p: validadores_catalogo_async('servicios', p.args.get('q', '')), CACHE_PUBLICA)
+async def servicios_async(peticion):
+    q = peticion.args.get('q', '').strip()
+    indices = await base_asincrona.indices()
+    clave = ('servicios', q, indices.version_paginas)
+    html = page_cache.get(clave)
+    if html is None:
+        truncado = False
+        if q:
+            parametros = parametros_busqueda_pagina(q)
+            # La búsqueda se lee entera (son BUSQUEDA_PAGINA_MAX filas como
+            # mucho) para no dejar un cursor abierto entre bloques
+            servicios = await base_asincrona.consultar(SQL_BUSQUEDA_PAGINA, parametros) if parametros else []
+            if parametros:
+                truncado = bool(await base_asincrona.consultar(SQL_BUSQUEDA_TRUNCADA,
+                                                               (parametros[0], BUSQUEDA_CANDIDATOS)))
+        else:
+            servicios = indices.orden['id']
+        flujo = await base_asincrona.ejecutar(en_contexto_app, stream_plantilla, 'servicios.html',
+                                              tarjetas=tarjetas_servicios(servicios), q=q, truncado=truncado)
+        html = cachear_al_terminar(clave, flujo)
+    return Response(html, mimetype='text/html')
+
+@vista_asincrona('detalle_servicio')
+@condicional_async(lambda p, servicio_id: validadores_servicio_async('detalle', servicio_id), CACHE_PUBLICA)
+async def detalle_servicio_async(peticion, servicio_id):
+    servicio = (await base_asincrona.indices()).por_id.get(servicio_id)
+    if not servicio:
+        return redirect(url_de(peticion, 'servicios'))
+    clave = ('detalle', servicio_id, servicio.version)
+    html = page_cache.get(clave)
+    if html is None:
+        html = page_cache.put(clave, await base_asincrona.ejecutar(
+            en_contexto_app, render_template, 'detalle.html', servicio=servicio))
+    return Response(html, mimetype='text/html')
+
+@vista_asincrona('api_servicios')
+@condicional_async(lambda p: validadores_catalogo_async('api', p.query_string), CACHE_API)
+async def api_servicios_async(peticion):
+    indices = await base_asincrona.indices()
+    return await base_asincrona.ejecutar(responder_api_servicios, peticion, indices)
+
+@vista_asincrona('api_servicio')
+@condicional_async(lambda p, servicio_id: validadores_servicio_async('api-servicio', servicio_id), CACHE_API)
+async def api_servicio_async(peticion, servicio_id):
+    servicio = (await base_asincrona.indices()).por_id.get(servicio_id)
+    respuesta = app.json.response(servicio_a_dict(servicio) if servicio else {'error': 'servicio no encontrado'})
+    if not servicio:
+        respuesta.status_code = 404
+    return respuesta
+
+@vista_asincrona('api_servicios_stats')
+@condicional_async(lambda p: validadores_catalogo_async('api-stats'), CACHE_API)
+async def api_servicios_stats_async(peticion):
+    return app.json.response(await base_asincrona.ejecutar(resumen_catalogo))
+
+
+class SalidaHTTP:
+    """Línea de estado, cabeceras y framing (Content-Length o chunked) de una respuesta"""
+
+    def __init__(self, environ, estado, cabeceras, cerrando):
+        codigo = int(estado[:3])
+        self.estado = estado
+        self.cabeceras = [(n, v) for n, v in cabeceras if n.lower() not in ('connection', 'transfer-encoding')]
+        self.con_cuerpo = environ['REQUEST_METHOD'] != 'HEAD' and codigo >= 200 and codigo not in (204, 304)
+        con_largo = any(n.lower() == 'content-length' for n, _ in self.cabeceras)
+        persistente = (environ['SERVER_PROTOCOL'] == 'HTTP/1.1'
+                       and 'close' not in environ.get('HTTP_CONNECTION', '').lower())
+        self.fragmentado = self.con_cuerpo and not con_largo and persistente
+        self.mantener = persistente and not cerrando and (con_largo or not self.con_cuerpo or self.fragmentado)
+
+    def inicio(self):
+        cabeceras = self.cabeceras + [('Date', http_date())]
+        if self.fragmentado:
+            cabeceras.append(('Transfer-Encoding', 'chunked'))
+        if not self.mantener:
+            cabeceras.append(('Connection', 'close'))
+        lineas = ['HTTP/1.1 %s\r\n' % self.estado] + ['%s: %s\r\n' % c for c in cabeceras] + ['\r\n']
+        return ''.join(lineas).encode('latin-1')
+
+    def bloque(self, parte):
+        if not self.con_cuerpo or not parte:
+            return b''
+        return b'%x\r\n%s\r\n' % (len(parte), parte) if self.fragmentado else parte
+
+    def fin(self):
+        return b'0\r\n\r\n' if self.fragmentado else b''
+
+
+class ServidorAsincrono:
+    """Servidor HTTP/1.1 sobre asyncio con la interfaz de ServidorWorker.
+
+    La cabecera de cada petición debe llegar completa dentro de
+    KEEPALIVE_TIMEOUT desde que la conexión queda libre; el cuerpo, sin
+    pausas de más de KEEPALIVE_TIMEOUT entre lecturas.
+    """
+
+    MAX_CABECERA = 64 * 1024
+
+    def __init__(self, app, fd, hilos):
+        self.app = app
+        self.socket = socket.socket(fileno=fd)
+        self.socket.setblocking(False)
+        self.wsgi = ThreadPoolExecutor(hilos, thread_name_prefix='techflow-wsgi')
+        self.conexiones = set()
+        self.ociosas = set()
+        self.cerrando = False
+        self._loop = None
+        self._detener = None
+        self._terminado = threading.Event()
+
+    def serve_forever(self):
+        try:
+            asyncio.run(self._servir())
+        finally:
+            self._terminado.set()
+
+    def shutdown(self):
+        """Deja de aceptar, cierra las conexiones ociosas y espera a las activas"""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._detener.set)
+        self._terminado.wait()
+
+    def server_close(self):
+        self.wsgi.shutdown(wait=True)
+        base_asincrona.cerrar()
+
+    async def _servir(self):
+        self._loop = asyncio.get_running_loop()
+        self._detener = asyncio.Event()
+        servidor = await asyncio.start_server(self.atender, sock=self.socket, limit=self.MAX_CABECERA)
+        await self._detener.wait()
+        self.cerrando = True
+        servidor.close()
+        for escritor in list(self.ociosas):
+            escritor.close()
+        while self.conexiones:
+            await asyncio.sleep(0.05)
+
+    async def atender(self, lector, escritor):
+        if len(self.conexiones) >= ASYNC_MAX_CONNECTIONS or self.cerrando:
+            escritor.write(b'HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+            escritor.close()
+            return
+        self.conexiones.add(escritor)
+        try:
+            while not self.cerrando:
+                self.ociosas.add(escritor)
+                try:
+                    cabecera = await asyncio.wait_for(lector.readuntil(b'\r\n\r\n'), KEEPALIVE_TIMEOUT)
+                except asyncio.LimitOverrunError:
+                    await self.error(escritor, '431 Request Header Fields Too Large')
+                    break
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                finally:
+                    self.ociosas.discard(escritor)
+                environ = self.environ(cabecera, escritor)
+                if environ is None:
+                    await self.error(escritor, '400 Bad Request')
+                    break
+                if 'chunked' in environ.get('HTTP_TRANSFER_ENCODING', '').lower():
+                    await self.error(escritor, '411 Length Required')
+                    break
+                try:
+                    largo = int(environ.get('CONTENT_LENGTH') or 0)
+                except ValueError:
+                    await self.error(escritor, '400 Bad Request')
+                    break
+                if largo and environ.get('HTTP_EXPECT', '').lower() == '100-continue':
+                    escritor.write(b'HTTP/1.1 100 Continue\r\n\r\n')
+                cuerpo = await self.leer_cuerpo(lector, largo)
+                if cuerpo is None:
+                    break
+                environ['wsgi.input'] = io.BytesIO(cuerpo)
+                if not await self.responder(environ, escritor):
+                    break
+        except ConnectionError:
+            pass
+        except Exception:
+            traceback.print_exc()
+        finally:
+            self.conexiones.discard(escritor)
+            escritor.close()
+
+    async def leer_cuerpo(self, lector, largo):
+        partes = []
+        while largo > 0:
+            try:
+                parte = await asyncio.wait_for(lector.read(min(largo, 65536)), KEEPALIVE_TIMEOUT)
+            except asyncio.TimeoutError:
+                return None
+            if not parte:
+                return None
+            partes.append(parte)
+            largo -= len(parte)
+        return b''.join(partes)
+
+    def environ(self, cabecera, escritor):
+        """Arma el environ WSGI de una cabecera HTTP/1.x, o None si es inválida"""
+        lineas = cabecera.decode('latin-1').split('\r\n')
+        try:
+            metodo, destino, protocolo = lineas[0].split(' ')
+        except ValueError:
+            return None
+        if protocolo not in ('HTTP/1.0', 'HTTP/1.1') or not destino.startswith('/'):
+            return None
+        ruta, _, query = destino.partition('?')
+        local = escritor.get_extra_info('sockname') or ('', 0)
+        remoto = escritor.get_extra_info('peername') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': metodo,
+            'SCRIPT_NAME': '',
+            'PATH_INFO': unquote_to_bytes(ruta).decode('latin-1'),
+            'QUERY_STRING': query,
+            'REQUEST_URI': destino,
+            'RAW_URI': destino,
+            'SERVER_NAME': str(local[0]),
+            'SERVER_PORT': str(local[1]),
+            'SERVER_PROTOCOL': protocolo,
+            'REMOTE_ADDR': str(remoto[0]),
+            'REMOTE_PORT': str(remoto[1]),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        for linea in lineas[1:]:
+            if not linea:
+                continue
+            nombre, separador, valor = linea.partition(':')
+            # Como werkzeug: los guiones bajos harían ambiguo el nombre en el environ
+            if not separador or '_' in nombre:
+                continue
+            clave = nombre.strip().upper().replace('-', '_')
+            if clave not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                clave = 'HTTP_' + clave
+            valor = valor.strip()
+            environ[clave] = environ[clave] + ',' + valor if clave in environ else valor
+        return environ
+
+    async def error(self, escritor, estado):
+        escritor.write(('HTTP/1.1 %s\r\nContent-Length: 0\r\nConnection: close\r\n\r\n' % estado).encode())
+        await escritor.drain()
+
+    async def escribir(self, escritor, datos):
+        if datos:
+            escritor.write(datos)
+            await escritor.drain()
+
+    async def responder(self, environ, escritor):
+        """Atiende una petición; devuelve False si hay que cerrar la conexión"""
+        vista, endpoint, argumentos = self.resolver(environ)
+        if vista is None:
+            return await self._loop.run_in_executor(self.wsgi, self.responder_wsgi, environ, escritor)
+        inicio = time.perf_counter()
+        peticion = Request(environ)
+        estado = '500'
+        try:
+            try:
+                respuesta = await vista(peticion, **argumentos)
+                # Comprimir una página grande tarda: también va al executor
+                respuesta = await base_asincrona.ejecutar(comprimir, peticion, respuesta)
+            except Exception:
+                traceback.print_exc()
+                respuesta = Response('Internal Server Error', status=500, mimetype='text/plain')
+            cuerpo, estado, cabeceras = respuesta.get_wsgi_response(environ)
+            salida = SalidaHTTP(environ, estado, cabeceras, self.cerrando)
+            estado = estado.split(' ', 1)[0]
+            await self.escribir(escritor, salida.inicio())
+            iterador = iter(cuerpo)
+            fin = object()
+            try:
+                while True:
+                    # Los cuerpos en streaming se renderizan a medida que se envían
+                    if respuesta.is_streamed:
+                        parte = await base_asincrona.ejecutar(next, iterador, fin)
+                    else:
+                        parte = next(iterador, fin)
+                    if parte is fin:
+                        break
+                    await self.escribir(escritor, salida.bloque(parte))
+                await self.escribir(escritor, salida.fin())
+            finally:
+                if hasattr(cuerpo, 'close'):
+                    cuerpo.close()
+            return salida.mantener
+        finally:
+            contar_peticion(endpoint, environ['REQUEST_METHOD'], estado, time.perf_counter() - inicio)
+
+    def resolver(self, environ):
+        """(vista async, endpoint, argumentos) o (None, None, None) si la atiende la app WSGI"""
+        if environ['REQUEST_METHOD'] not in ('GET', 'HEAD'):
+            return None, None, None
+        try:
+            endpoint, argumentos = self.app.url_map.bind_to_environ(environ).match()
+        except HTTPException:
+            return None, None, None
+        vista = VISTAS_ASINCRONAS.get(endpoint)
+        return (vista, endpoint, argumentos) if vista else (None, None, None)
+
+    def responder_wsgi(self, environ, escritor):
+        """Corre en un hilo de self.wsgi: la app entera, incluido el cuerpo.
+
+        Cada bloque se escribe desde el bucle y el hilo espera a que salga,
+        así que un cliente lento frena a la vista como en el modo con hilos.
+        """
+        def escribir(datos):
+            asyncio.run_coroutine_threadsafe(self.escribir(escritor, datos), self._loop).result()
+
+        inicio = []
+
+        def start_response(estado, cabeceras, exc_info=None):
+            if exc_info and salida:
+                raise exc_info[1].with_traceback(exc_info[2])
+            inicio[:] = [estado, cabeceras]
+
+        salida = None
+        cuerpo = self.app(environ, start_response)
+        try:
+            for parte in cuerpo:
+                if salida is None:
+                    salida = SalidaHTTP(environ, inicio[0], inicio[1], self.cerrando)
+                    escribir(salida.inicio() + salida.bloque(parte))
+                else:
+                    escribir(salida.bloque(parte))
+            if salida is None:
+                salida = SalidaHTTP(environ, inicio[0], inicio[1], self.cerrando)
+                escribir(salida.inicio())
+            escribir(salida.fin())
+        finally:
+            if hasattr(cuerpo, 'close'):
+                cuerpo.close()
+        return salida.mantener
+
+
+def ejecutar_worker(fd, ready_fd, hilos, asincrono=False):
+    """Proceso hijo: atiende el socket heredado hasta recibir SIGTERM"""
+    init_db()
+    # La primera carga del catálogo (~1 s con 200k servicios) se paga antes
+    # de avisar al maestro, no en la primera petición que le toque al worker
+    catalog_store.indices()
+    servidor = (ServidorAsincrono if asincrono else ServidorWorker)(app, fd, hilos)
+    padre = os.getppid()
+
+    def apagar(*_):
+        threading.Thread(target=servidor.shutdown, daemon=True).start()
+
+    def vigilar_padre():
+        # Si el maestro muere sin avisar, el worker no debe quedar huérfano
+        while os.getppid() == padre:
+            time.sleep(1)
+        apagar()
+
+    signal.signal(signal.SIGTERM, apagar)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    threading.Thread(target=vigilar_padre, daemon=True).start()
+
+    os.write(ready_fd, b'1')
+    os.close(ready_fd)
+    volcar_metricas_periodicamente()
+    try:
+        servidor.serve_forever()
+    finally:
+        servidor.server_close()  # espera a que terminen las peticiones en curso
+        db_pool.close_all()
+        metricas.volcar()
+
+
+class Maestro:
+    """Supervisa los workers: los reemplaza si mueren y los recarga sin cortar tráfico"""
+
+    def __init__(self, host, port, workers, hilos, graceful_timeout, asincrono=False):
+        self.workers = workers
+        self.hilos = hilos
+        self.asincrono = asincrono
+        self.graceful_timeout = graceful_timeout
+        self.socket = socket.create_server((host, port), backlog=2048)
+        self.socket.set_inheritable(True)
+        self.activos = []
+        self.drenando = []
+        self._recargar = False
+        self._salir = False
+
+    def lanzar(self):
+        """Arranca un worker y espera su señal de listo; devuelve el Popen o None"""
+        leer, escribir = os.pipe()
+        proceso = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), 'worker',
+             '--fd', str(self.socket.fileno()), '--ready-fd', str(escribir),
+             '--threads', str(self.hilos)] + (['--async'] if self.asincrono else []),
+            pass_fds=(self.socket.fileno(), escribir))
+        os.close(escribir)
+        try:
+            listo, _, _ = select.select([leer], [], [], self.graceful_timeout)
+            if listo and os.read(leer, 1) == b'1':
+                return proceso
+        finally:
+            os.close(leer)
+        proceso.kill()
+        proceso.wait()
+        return None
+
+    def retirar(self, procesos):
+        for proceso in procesos:
+            if proceso.poll() is None:
+                proceso.terminate()
+            self.drenando.append((proceso, time.monotonic() + self.graceful_timeout))
+
+    def recargar(self):
+        nuevos = [self.lanzar() for _ in range(self.workers)]
+        if all(nuevos):
+            viejos, self.activos = self.activos, nuevos
+            self.retirar(viejos)
+            print(f"🔄 Recarga completa: {len(nuevos)} workers nuevos")
+        else:
+            # La generación nueva no arrancó: se descarta y sigue la anterior
+            self.retirar([p for p in nuevos if p])
+            print("⚠️ Recarga abortada: los workers nuevos no arrancaron", file=sys.stderr)
+
+    def vigilar(self):
+        for proceso in list(self.activos):
+            if proceso.poll() is not None:
+                self.activos.remove(proceso)
+                consolidar_metricas(proceso.pid)
+                if not self._salir:
+                    nuevo = self.lanzar()
+                    if nuevo:
+                        self.activos.append(nuevo)
+        ahora = time.monotonic()
+        for proceso, limite in list(self.drenando):
+            if proceso.poll() is not None:
+                self.drenando.remove((proceso, limite))
+                consolidar_metricas(proceso.pid)
+            elif ahora > limite:
+                proceso.kill()
+
+    def ejecutar(self):
+        signal.signal(signal.SIGHUP, lambda *_: setattr(self, '_recargar', True))
+        signal.signal(signal.SIGTERM, lambda *_: setattr(self, '_salir', True))
+        signal.signal(signal.SIGINT, lambda *_: setattr(self, '_salir', True))
+
+        self.activos = [p for p in (self.lanzar() for _ in range(self.workers)) if p]
+        while not self._salir:
+            if self._recargar:
+                self._recargar = False
+                self.recargar()
+            self.vigilar()
+            time.sleep(0.2)
+
+        print("🛑 Apagando: drenando peticiones en curso")
+        self.retirar(self.activos)
+        self.activos = []
+        while self.drenando:
+            self.vigilar()
+            time.sleep(0.1)
+        self.socket.close()
+
+
+def comando_importar(args):
+    formato = args.formato or formato_de(args.archivo, None)
+    if args.archivo == '-':
+        texto = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8-sig', newline='')
+    else:
+        texto = open(args.archivo, encoding='utf-8-sig', newline='')
+    with texto:
+        reporte = importar_servicios(leer_filas(texto, formato), args.conflicto)
+    for fallo in reporte['errores']:
+        print(f"   línea {fallo['linea']}: {fallo['error']}", file=sys.stderr)
+    print(f"📥 {reporte['aplicadas']} servicios importados de {reporte['filas_leidas']} filas "
+          f"({reporte['omitidas']} omitidas, {reporte['total_errores']} errores) "
+          f"en {reporte['duracion_ms']} ms · {reporte['filas_por_segundo']} filas/s", file=sys.stderr)
+    if reporte['total_errores']:
+        sys.exit(1)
+
+def comando_exportar(args):
+    if args.formato == 'csv':
+        flujo = exportar_csv()
+    else:
+        flujo = exportar_servicios(ndjson=True)
+    salida = open(args.salida, 'w', encoding='utf-8', newline='') if args.salida else sys.stdout
+    try:
+        for bloque in flujo:
+            salida.write(bloque)
+    finally:
+        if args.salida:
+            salida.close()
+
+def comando_estatico(args):
+    reporte = exportar_estatico(args.salida, args.completo)
+    print(f"🗂️  {reporte['renderizadas']} páginas renderizadas, {reporte['sin_cambios']} sin cambios, "
+          f"{reporte['borradas']} borradas en {reporte['duracion_ms']} ms "
+          f"({reporte['bytes']} bytes) → {args.salida}", file=sys.stderr)
+
+def cli(argv=None):
+    parser = argparse.ArgumentParser(description='TechFlow Solutions')
+    comandos = parser.add_subparsers(dest='comando')
+    comandos.add_parser('dev', help='servidor de desarrollo de Flask (por defecto)')
+    serve = comandos.add_parser('serve', help='servidor de producción con varios workers')
+    serve.add_argument('--workers', type=int, default=WORKERS)
+    serve.add_argument('--threads', type=int, default=THREADS)
+    serve.add_argument('--async', dest='asincrono', action='store_true', default=ASYNC_MODE,
+                       help='atender con asyncio (las rutas del catálogo no ocupan un hilo por conexión)')
+    importar = comandos.add_parser('importar', help='importar servicios desde CSV o NDJSON')
+    importar.add_argument('archivo', help='ruta del archivo, o - para leer de stdin')
+    importar.add_argument('--formato', choices=('csv', 'ndjson'))
+    importar.add_argument('--conflicto', choices=tuple(SQL_IMPORTAR), default='error')
+    exportar = comandos.add_parser('exportar', help='exportar el catálogo a CSV o NDJSON')
+    exportar.add_argument('--formato', choices=('csv', 'ndjson'), default='csv')
+    exportar.add_argument('--salida', help='archivo de salida (por defecto, stdout)')
+    estatico = comandos.add_parser('estatico', help='pre-renderizar el sitio público para Firebase Hosting')
+    estatico.add_argument('--salida', default=ESTATICO_DIR, help='directorio de salida (por defecto, %(default)s)')
+    estatico.add_argument('--completo', action='store_true', help='ignorar el manifiesto y renderizar todo')
+    worker = comandos.add_parser('worker', help=argparse.SUPPRESS)
+    worker.add_argument('--fd', type=int, required=True)
+    worker.add_argument('--ready-fd', type=int, required=True)
+    worker.add_argument('--threads', type=int, default=THREADS)
+    worker.add_argument('--async', dest='asincrono', action='store_true')
+    args = parser.parse_args(argv)
+
+    if args.comando == 'worker':
+        ejecutar_worker(args.fd, args.ready_fd, args.threads, args.asincrono)
+        return
+
+    if args.comando in ('importar', 'exportar', 'estatico'):
+        init_db()
+        if args.comando == 'importar':
+            comando_importar(args)
+        elif args.comando == 'exportar':
+            comando_exportar(args)
+        else:
+            comando_estatico(args)
+        return
+
+    # Inicializar base de datos
+    imprimir_reporte_inicio(init_db())
+
+    if args.comando == 'serve':
+        # Los workers heredan el directorio de métricas por el entorno
+        global METRICS_DIR
+        temporal = METRICS_DIR is None
+        if temporal:
+            METRICS_DIR = os.environ['TECHFLOW_METRICS_DIR'] = tempfile.mkdtemp(prefix='techflow-metrics-')
+        else:
+            os.makedirs(METRICS_DIR, exist_ok=True)
+            for nombre in os.listdir(METRICS_DIR):
+                os.remove(os.path.join(METRICS_DIR, nombre))
+        modo = 'asyncio + %d hilos para rutas síncronas' % args.threads if args.asincrono else '%d hilos' % args.threads
+        print(f"🚀 Servidor iniciando en http://{HOST}:{PORT} "
+              f"({args.workers} workers × {modo}, pid {os.getpid()})")
+        print("   kill -HUP <pid> recarga sin cortes; kill -TERM <pid> drena y apaga")
+        try:
+            Maestro(HOST, PORT, args.workers, args.threads, GRACEFUL_TIMEOUT, args.asincrono).ejecutar()
+        finally:
+            if temporal:
+                shutil.rmtree(METRICS_DIR, ignore_errors=True)
+        return
+
+    print(f"🚀 Servidor iniciando en http://localhost:{PORT}")
+    print("📝 Credenciales: admin / admin123")
+    
+    # Ejecutar servidor
+    app.run(debug=DEBUG, host=HOST, port=PORT)
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,76 @@
+# ARCHIVO: tests/conftest.py
+"""Fixtures comunes: cada prueba corre contra su propia techflow.db.
+
+main lee la configuración del entorno al importarse, así que se fija
+antes del import: el estado del catálogo sin TTL (cada lectura ve la
+escritura anterior) y un proxy de confianza delante, como en Cloud Run
+detrás de Firebase Hosting.
+"""
+import os
+import sqlite3
+
+os.environ.setdefault('TECHFLOW_CATALOG_STATE_TTL', '0')
+os.environ.setdefault('TECHFLOW_TRUSTED_PROXIES', '1')
+
+import pytest
+
+import main
+
+
+@pytest.fixture
+def base(tmp_path, monkeypatch):
+    """Base nueva con las migraciones y el catálogo de ejemplo; devuelve su ruta"""
+    ruta = str(tmp_path / 'techflow.db')
+    pool = main.ConnectionPool(ruta, max_size=main.DB_POOL_SIZE, timeout=main.DB_POOL_TIMEOUT)
+    monkeypatch.setattr(main, 'DATABASE', ruta)
+    monkeypatch.setattr(main, 'PROFILE_DIR', str(tmp_path / 'perfiles'))
+    monkeypatch.setattr(main, 'db_pool', pool)
+    monkeypatch.setattr(main, 'catalog_state', main.CatalogState(main.CATALOG_STATE_TTL))
+    monkeypatch.setattr(main, 'catalog_store', main.CatalogStore())
+    for cache in (main.page_cache, main.fragment_cache, main.compressed_cache):
+        cache.clear()
+    main.init_db()
+    yield ruta
+    pool.close_all()
+
+
+@pytest.fixture
+def client(base):
+    return main.app.test_client()
+
+
+@pytest.fixture
+def admin(base):
+    """Test client con la sesión de admin iniciada"""
+    cliente = main.app.test_client()
+    with cliente.session_transaction() as sesion:
+        sesion['user_id'] = 1
+        sesion['username'] = 'admin'
+    return cliente
+
+
+@pytest.fixture
+def resumen_recorriendo(base):
+    """Calcula lo mismo que main.resumen_catalogo() recorriendo servicios,
+    para comparar con lo que mantienen los triggers"""
+    def calcular():
+        conn = sqlite3.connect(base)
+        servicios, stock, promocion, suma, minimo, maximo = conn.execute('''
+            SELECT COUNT(*), COALESCE(SUM(stock), 0), COALESCE(SUM(promocion != 0), 0),
+                   SUM(precio), MIN(precio), MAX(precio)
+            FROM servicios''').fetchone()
+        limites = list(main.TRAMOS_PRECIO)
+        tramos = [{'desde': desde, 'hasta': hasta, 'servicios': conn.execute(
+                      'SELECT COUNT(*) FROM servicios WHERE precio >= ? AND (? IS NULL OR precio < ?)',
+                      (desde, hasta, hasta)).fetchone()[0]}
+                  for desde, hasta in zip(limites, limites[1:] + [None])]
+        conn.close()
+        return {
+            'servicios': servicios,
+            'stock_total': stock,
+            'en_promocion': promocion,
+            'precio': {'min': minimo, 'max': maximo,
+                       'promedio': round(suma / servicios, 2) if servicios else None},
+            'tramos_precio': tramos,
+        }
+    return calcular
@@ -0,0 +1,98 @@
+# ARCHIVO: tests/test_api_pagination.py
+"""Paginación por cursor de /api/servicios: recorrer todas las páginas da cada fila una vez"""
+import base64
+import io
+import json
+import sqlite3
+
+import pytest
+
+import main
+
+
+@pytest.fixture
+def catalogo(base):
+    """Catálogo de ejemplo más filas con precios repetidos, para probar los empates"""
+    texto = 'nombre,precio,stock,promocion\n' + ''.join(
+        'Plan %02d,%d,%d,%d\n' % (i, 1000000 * (i % 4 + 1), i % 3, i % 2) for i in range(1, 41))
+    assert main.importar_servicios(main.leer_filas(io.StringIO(texto), 'csv'))['aplicadas'] == 40
+    return base
+
+
+def recorrer(cliente, **params):
+    params.setdefault('limit', 7)
+    respuesta = cliente.get('/api/servicios', query_string=params)
+    filas = []
+    while True:
+        assert respuesta.status_code == 200
+        filas += respuesta.get_json()
+        siguiente = respuesta.headers.get('X-Next-Cursor')
+        if not siguiente:
+            return filas
+        assert 'cursor=' in respuesta.headers['Link']
+        respuesta = cliente.get('/api/servicios', query_string=dict(params, cursor=siguiente))
+
+
+def clave(orden):
+    campo = orden.lstrip('-')
+    if campo == 'id':
+        return lambda s: s['id']
+    return lambda s: (s[campo], s['id'])
+
+
+@pytest.mark.parametrize('orden', ['id', '-id', 'precio', '-precio', 'nombre', '-nombre'])
+@pytest.mark.parametrize('filtros', [{}, {'promocion': '1'}, {'min_precio': '2000000', 'max_precio': '3000000'},
+                                     {'in_stock': '1'}])
+def test_recorrer_todas_las_paginas(client, catalogo, orden, filtros):
+    completo = client.get('/api/servicios', query_string=dict(filtros, limit=main.API_LIMIT_MAX)).get_json()
+    filas = recorrer(client, sort=orden, **filtros)
+    assert len({s['id'] for s in filas}) == len(filas)
+    assert sorted(s['id'] for s in filas) == sorted(s['id'] for s in completo)
+    assert filas == sorted(filas, key=clave(orden), reverse=orden.startswith('-'))
+
+
+def cursor_de(datos):
+    return base64.urlsafe_b64encode(json.dumps(datos).encode()).decode().rstrip('=')
+
+
+@pytest.mark.parametrize('sort, cursor', [
+    ('id', 'no-es-base64!'),
+    ('id', cursor_de(['lista'])),
+    ('id', cursor_de({'o': 'id'})),
+    ('id', cursor_de({'o': 'id', 'id': '3'})),
+    ('precio', cursor_de({'o': 'id', 'id': 3})),
+    ('precio', cursor_de({'o': 'precio', 'id': 3, 'v': 'caro'})),
+    ('precio', cursor_de({'o': 'precio', 'id': 3, 'v': True})),
+    ('nombre', cursor_de({'o': 'nombre', 'id': 3, 'v': 42})),
+    ('precio', base64.urlsafe_b64encode(b'{"o":"precio","id":3,"v":NaN}').decode()),
+])
+def test_cursor_manipulado_da_400(client, sort, cursor):
+    respuesta = client.get('/api/servicios', query_string={'sort': sort, 'cursor': cursor})
+    assert respuesta.status_code == 400
+    assert 'error' in respuesta.get_json()
+
+
+def test_cursor_de_otra_pagina_sigue_valido_tras_editar(client, admin):
+    primera = client.get('/api/servicios?sort=precio&limit=3')
+    cursor = primera.headers['X-Next-Cursor']
+    ultimo = primera.get_json()[-1]
+    assert admin.patch('/api/servicios/%d' % ultimo['id'], json={'precio': 1}).status_code == 200
+    siguiente = client.get('/api/servicios', query_string={'sort': 'precio', 'limit': 3, 'cursor': cursor})
+    assert siguiente.status_code == 200
+    assert all((s['precio'], s['id']) > (ultimo['precio'], ultimo['id']) for s in siguiente.get_json())
+
+
+@pytest.mark.parametrize('params', [{'min_precio': 'nan'}, {'max_precio': 'inf'}, {'min_precio': '-Infinity'},
+                                    {'max_precio': 'abc'}])
+def test_precio_no_finito_da_400(client, params):
+    respuesta = client.get('/api/servicios', query_string=params)
+    assert respuesta.status_code == 400
+    assert 'error' in respuesta.get_json()
+
+
+def test_sin_indices_de_filtros_en_sql(base):
+    conn = sqlite3.connect(base)
+    indices = {fila[0] for fila in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    conn.close()
+    assert 'idx_servicios_precio' in indices
+    assert not indices & {'idx_servicios_promocion', 'idx_servicios_en_stock'}
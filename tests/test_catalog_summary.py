@@ -0,0 +1,66 @@
+# ARCHIVO: tests/test_catalog_summary.py
+"""catalogo_resumen y catalogo_tramos_precio siguen a servicios tras cada tipo de escritura"""
+import io
+
+import main
+
+
+def stats(cliente):
+    respuesta = cliente.get('/api/servicios/stats')
+    assert respuesta.status_code == 200
+    return respuesta.get_json()
+
+
+def test_resumen_tras_insertar_editar_y_borrar(client, admin, resumen_recorriendo):
+    assert stats(client) == resumen_recorriendo()
+
+    admin.post('/admin/agregar', data={'nombre': 'Soporte Básico', 'descripcion': 'Horario de oficina',
+                                       'precio': '150000', 'stock': '30', 'icono': '🔧', 'promocion': 'on'})
+    resumen = stats(client)
+    assert resumen == resumen_recorriendo()
+    assert resumen['precio']['min'] == 150000
+
+    # Sube el precio de la fila con el mínimo: el mínimo se recalcula
+    minimo = next(s['id'] for s in admin.get('/api/servicios?sort=precio&limit=1').get_json())
+    assert admin.patch('/api/servicios/%d' % minimo, json={'precio': 7000000, 'promocion': False}).status_code == 200
+    assert stats(client) == resumen_recorriendo()
+
+    # Cambios de tramo, stock y promoción en lote
+    lote = [{'id': 1, 'precio': 450000}, {'id': 2, 'stock': 0}, {'id': 3, 'promocion': False},
+            {'id': 4, 'precio': 30000000, 'stock': 1}]
+    assert admin.patch('/api/servicios', json=lote).status_code == 200
+    resumen = stats(client)
+    assert resumen == resumen_recorriendo()
+    assert resumen['precio']['max'] == 30000000
+
+    # Una reserva solo cambia el stock
+    assert client.post('/api/servicios/5/reservas', json={'cantidad': 2, 'nombre': 'Ana',
+                                                          'email': 'ana@ejemplo.com'}).status_code == 201
+    assert stats(client) == resumen_recorriendo()
+
+    # Borrar la fila con el máximo lo recalcula
+    admin.get('/admin/eliminar/4')
+    resumen = stats(client)
+    assert resumen == resumen_recorriendo()
+    assert resumen['precio']['max'] != 30000000
+
+    for servicio in admin.get('/api/servicios?limit=1000').get_json():
+        admin.get('/admin/eliminar/%d' % servicio['id'])
+    resumen = stats(client)
+    assert resumen == resumen_recorriendo()
+    assert resumen['servicios'] == 0
+    assert resumen['precio'] == {'min': None, 'max': None, 'promedio': None}
+
+
+def test_resumen_tras_importar(base, resumen_recorriendo):
+    texto = 'nombre,precio,stock,promocion\n' + ''.join(
+        'Importado %d,%d,%d,%d\n' % (i, 90000 * i, i, i % 2) for i in range(1, 301))
+    reporte = main.importar_servicios(main.leer_filas(io.StringIO(texto), 'csv'), bloque=64)
+    assert reporte['aplicadas'] == 300
+    assert main.resumen_catalogo() == resumen_recorriendo()
+
+    texto = 'nombre,precio,stock,promocion\n' + ''.join(
+        'Importado %d,%d,0,0\n' % (i, 10000000 + i) for i in range(1, 301, 3))
+    reporte = main.importar_servicios(main.leer_filas(io.StringIO(texto), 'csv'), 'actualizar', bloque=16)
+    assert reporte['aplicadas'] == 100
+    assert main.resumen_catalogo() == resumen_recorriendo()
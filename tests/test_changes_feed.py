@@ -0,0 +1,85 @@
+# ARCHIVO: tests/test_changes_feed.py
+"""servicios_cambios: una fila por escritura y /api/servicios/changes en orden"""
+import io
+import sqlite3
+
+import main
+
+
+def registro(base, desde=0):
+    conn = sqlite3.connect(base)
+    filas = conn.execute('SELECT seq, servicio_id, operacion FROM servicios_cambios WHERE seq > ? ORDER BY seq',
+                         (desde,)).fetchall()
+    conn.close()
+    return filas
+
+
+def head(cliente):
+    return cliente.get('/api/servicios/changes?since=0&limit=1').get_json()['head']
+
+
+def test_cada_escritura_deja_una_sola_fila(base, client, admin):
+    desde = registro(base)[-1][0]
+
+    assert admin.patch('/api/servicios/1', json={'precio': 999000}).status_code == 200
+    assert [fila[1:] for fila in registro(base, desde)] == [(1, 'update')]
+    desde = registro(base)[-1][0]
+
+    # Un lote escribe una fila por servicio, en el orden del lote
+    assert admin.patch('/api/servicios', json=[{'id': 3, 'stock': 1}, {'id': 2, 'stock': 2}]).status_code == 200
+    assert [fila[1:] for fila in registro(base, desde)] == [(3, 'update'), (2, 'update')]
+    desde = registro(base)[-1][0]
+
+    assert client.post('/api/servicios/4/reservas', json={'cantidad': 1, 'nombre': 'Ana',
+                                                          'email': 'ana@ejemplo.com'}).status_code == 201
+    assert [fila[1:] for fila in registro(base, desde)] == [(4, 'update')]
+    desde = registro(base)[-1][0]
+
+    admin.get('/admin/eliminar/5')
+    assert [fila[1:] for fila in registro(base, desde)] == [(5, 'delete')]
+    desde = registro(base)[-1][0]
+
+    texto = 'nombre,precio,stock\nNuevo A,100000,1\nNuevo B,200000,2\nSoporte Básico,-1,0\n'
+    reporte = main.importar_servicios(main.leer_filas(io.StringIO(texto), 'csv'), bloque=2)
+    assert reporte['aplicadas'] == 2
+    nuevos = [fila[1:] for fila in registro(base, desde)]
+    assert [operacion for _, operacion in nuevos] == ['insert', 'insert']
+    assert len({servicio_id for servicio_id, _ in nuevos}) == 2
+
+
+def test_changes_devuelve_cada_servicio_una_vez_en_su_ultimo_cambio(base, client, admin):
+    desde = head(client)
+    for precio in (111000, 222000, 333000):
+        assert admin.patch('/api/servicios/1', json={'precio': precio}).status_code == 200
+    assert admin.patch('/api/servicios/2', json={'stock': 0}).status_code == 200
+    admin.get('/admin/eliminar/3')
+    assert admin.patch('/api/servicios/1', json={'stock': 7}).status_code == 200
+
+    respuesta = client.get('/api/servicios/changes?since=%d' % desde).get_json()
+    assert respuesta['next'] == respuesta['head'] == registro(base)[-1][0]
+    assert respuesta['more'] is False
+    cambios = respuesta['changes']
+    assert [(c['id'], c['op']) for c in cambios] == [(2, 'upsert'), (3, 'delete'), (1, 'upsert')]
+    assert [c['seq'] for c in cambios] == sorted(c['seq'] for c in cambios)
+    assert cambios[-1]['servicio']['precio'] == 333000
+    assert cambios[-1]['servicio']['stock'] == 7
+
+    # Desde el último next no queda nada pendiente
+    siguiente = client.get('/api/servicios/changes?since=%d' % respuesta['next']).get_json()
+    assert siguiente['changes'] == []
+    assert siguiente['next'] == respuesta['next']
+
+
+def test_changes_pagina_con_limit(client, admin):
+    desde = head(client)
+    for servicio_id in (1, 2, 3, 4, 5):
+        assert admin.patch('/api/servicios/%d' % servicio_id, json={'stock': 3}).status_code == 200
+    vistos = []
+    while True:
+        pagina = client.get('/api/servicios/changes?since=%d&limit=2' % desde).get_json()
+        vistos += [c['id'] for c in pagina['changes']]
+        desde = pagina['next']
+        if not pagina['more']:
+            break
+    assert vistos == [1, 2, 3, 4, 5]
+    assert client.get('/api/servicios/changes?since=-1').status_code == 400
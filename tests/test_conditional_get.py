@@ -0,0 +1,33 @@
+# ARCHIVO: tests/test_conditional_get.py
+"""ETag y Last-Modified: por fila en los detalles, por catálogo en las listas"""
+import pytest
+
+
+@pytest.mark.parametrize('ruta', ['/detalle/1', '/api/servicios/1'])
+def test_editar_otro_servicio_no_invalida_el_detalle(client, admin, ruta):
+    primera = client.get(ruta)
+    etag, modificado = primera.headers['ETag'], primera.headers['Last-Modified']
+
+    assert admin.patch('/api/servicios/2', json={'precio': 999000}).status_code == 200
+    assert client.get(ruta, headers={'If-None-Match': etag}).status_code == 304
+    assert client.get(ruta).headers['Last-Modified'] == modificado
+    assert client.get(ruta, headers={'If-Modified-Since': modificado}).status_code == 304
+
+    assert admin.patch('/api/servicios/1', json={'precio': 999000}).status_code == 200
+    cambiada = client.get(ruta, headers={'If-None-Match': etag})
+    assert cambiada.status_code == 200
+    assert cambiada.headers['ETag'] != etag
+
+
+def test_las_listas_cambian_con_cualquier_servicio(client, admin):
+    etag = client.get('/servicios').headers['ETag']
+    assert client.get('/servicios', headers={'If-None-Match': etag}).status_code == 304
+    assert admin.patch('/api/servicios/2', json={'precio': 999000}).status_code == 200
+    assert client.get('/servicios', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_detalle_inexistente_no_lleva_validadores(client):
+    assert client.get('/api/servicios/999999').status_code == 404
+    respuesta = client.get('/detalle/999999')
+    assert respuesta.status_code == 302
+    assert 'ETag' not in respuesta.headers
@@ -0,0 +1,67 @@
+# ARCHIVO: tests/test_export_memory.py
+"""La exportación en streaming de /api/servicios no crece con el catálogo.
+
+Siembra TECHFLOW_TEST_EXPORT_ROWS servicios (1M por defecto) con
+benchmarks.catalogo y exporta el catálogo completo en un subproceso
+limpio. El catálogo en memoria se carga antes de medir (es residente por
+diseño); lo que se compara es el pico de RSS durante la exportación
+(VmHWM, reiniciado con /proc/self/clear_refs) contra el RSS previo.
+
+    python -m pytest tests/test_export_memory.py
+"""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks.catalogo import RAIZ, sembrar
+
+FILAS = int(os.environ.get('TECHFLOW_TEST_EXPORT_ROWS', '1000000'))
+# Techo del crecimiento de RSS durante la exportación (MB)
+TECHO_MB = float(os.environ.get('TECHFLOW_TEST_EXPORT_RSS_MB', '64'))
+
+MEDIR = r'''
+import gc, json, sys
+import main
+
+def kb(campo):
+    with open('/proc/self/status') as f:
+        for linea in f:
+            if linea.startswith(campo + ':'):
+                return int(linea.split()[1])
+
+main.catalog_store.indices()
+cliente = main.app.test_client()
+gc.collect()
+with open('/proc/self/clear_refs', 'w') as f:
+    f.write('5')
+antes = kb('VmRSS')
+respuesta = cliente.get('/api/servicios?stream=' + sys.argv[1], buffered=False)
+filas = bytes_enviados = 0
+for bloque in respuesta.response:
+    bytes_enviados += len(bloque)
+    filas += bloque.count(b'\n') if sys.argv[1] == 'ndjson' else bloque.count(b'"id":')
+respuesta.close()
+print(json.dumps({'filas': filas, 'bytes': bytes_enviados, 'antes_kb': antes, 'pico_kb': kb('VmHWM')}))
+'''
+
+
+@pytest.fixture(scope='module')
+def base(tmp_path_factory):
+    ruta = str(tmp_path_factory.mktemp('exportacion') / 'techflow.db')
+    sembrar(ruta, FILAS)
+    return ruta
+
+
+@pytest.mark.skipif(not os.path.exists('/proc/self/clear_refs'), reason='necesita /proc de Linux')
+@pytest.mark.parametrize('modo', ['ndjson', '1'])
+def test_exportacion_en_streaming_con_rss_acotado(base, modo, tmp_path):
+    entorno = dict(os.environ, TECHFLOW_DB=base, TECHFLOW_PROFILE_DIR=str(tmp_path / 'perfiles'))
+    salida = subprocess.run([sys.executable, '-c', MEDIR, modo], cwd=RAIZ, env=entorno,
+                            check=True, capture_output=True, text=True)
+    medida = json.loads(salida.stdout.strip().splitlines()[-1])
+    crecimiento_mb = (medida['pico_kb'] - medida['antes_kb']) / 1024
+    assert medida['filas'] == FILAS
+    assert crecimiento_mb < TECHO_MB, 'la exportación hizo crecer el RSS %.1f MB' % crecimiento_mb
@@ -0,0 +1,44 @@
+# ARCHIVO: tests/test_export_stream.py
+"""Las exportaciones en streaming no retienen una conexión del pool entre bloques"""
+import csv
+import io
+import json
+
+import pytest
+
+import main
+
+FILAS = 2500
+
+
+@pytest.fixture
+def catalogo(base):
+    texto = 'nombre,precio,stock\n' + ''.join('Plan %04d,%d,%d\n' % (i, 100000 + i, i % 5) for i in range(FILAS))
+    assert main.importar_servicios(main.leer_filas(io.StringIO(texto), 'csv'))['aplicadas'] == FILAS
+    return base
+
+
+def nombres(cuerpo, formato):
+    cuerpo = cuerpo.decode()
+    if formato == 'csv':
+        return [fila['nombre'] for fila in csv.DictReader(io.StringIO(cuerpo))]
+    return [json.loads(linea)['nombre'] for linea in cuerpo.splitlines()]
+
+
+@pytest.mark.parametrize('formato', ['csv', 'ndjson'])
+def test_exportar_libera_la_conexion_entre_bloques(catalogo, admin, formato):
+    total = len(main.SERVICIOS_EJEMPLO) + FILAS
+    respuesta = admin.get('/admin/exportar?formato=' + formato, buffered=False)
+    bloques = iter(respuesta.response)
+    primero = next(bloques)
+    assert main.db_pool.stats()['in_use'] == 0
+
+    # Los bloques siguientes leen de nuevo: ven lo escrito mientras tanto
+    assert admin.patch('/api/servicios/1', json={'stock': 99}).status_code == 200
+    admin.get('/admin/eliminar/%d' % total)
+
+    cuerpo = primero + b''.join(bloques)
+    respuesta.close()
+    assert main.db_pool.stats()['in_use'] == 0
+    exportados = nombres(cuerpo, formato)
+    assert len(exportados) == len(set(exportados)) == total - 1
@@ -0,0 +1,44 @@
+# ARCHIVO: tests/test_if_match.py
+"""PATCH /api/servicios/<id> con If-Match: ETag del GET, versión o "*"; si no coincide, 412"""
+import pytest
+
+
+def editar(cliente, if_match, **cambios):
+    return cliente.patch('/api/servicios/1', json=cambios or {'stock': 3}, headers={'If-Match': if_match})
+
+
+@pytest.mark.parametrize('debil', [False, True])
+def test_etag_del_get_sirve_una_sola_vez(admin, debil):
+    etag = admin.get('/api/servicios/1').headers['ETag']
+    # Una respuesta comprimida lleva el mismo ETag marcado como débil
+    if debil:
+        etag = 'W/' + etag
+    assert editar(admin, etag).status_code == 200
+    segunda = editar(admin, etag, stock=4)
+    assert segunda.status_code == 412
+    assert segunda.get_json()['version_actual'] == 2
+
+
+def test_version_como_etiqueta_y_listas(admin):
+    assert editar(admin, '"1"').status_code == 200
+    assert editar(admin, 'W/"2"').status_code == 200
+    assert editar(admin, '"7", "3"').status_code == 200
+    assert editar(admin, '"3"').status_code == 412
+
+
+def test_asterisco_solo_pide_que_exista(admin):
+    assert admin.patch('/api/servicios/2', json={'stock': 1}).status_code == 200
+    assert editar(admin, '*').status_code == 200
+    respuesta = admin.patch('/api/servicios/999999', json={'stock': 1}, headers={'If-Match': '*'})
+    assert respuesta.status_code == 412
+
+
+@pytest.mark.parametrize('if_match', ['W/', '"', ',', 'version-1', '"1" "2"'])
+def test_if_match_malformado_da_412(admin, if_match):
+    assert editar(admin, if_match).status_code == 412
+    assert admin.get('/api/servicios/1').get_json()['version'] == 1
+
+
+def test_version_en_el_cuerpo_sigue_dando_409(admin):
+    assert admin.patch('/api/servicios/1', json={'stock': 3, 'version': 1}).status_code == 200
+    assert admin.patch('/api/servicios/1', json={'stock': 4, 'version': 1}).status_code == 409
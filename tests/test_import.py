@@ -0,0 +1,70 @@
+# ARCHIVO: tests/test_import.py
+"""Importación masiva: reporte por línea, resumen del catálogo y esquema intacto"""
+import sqlite3
+
+import main
+
+CSV = '''nombre,descripcion,precio,stock,promocion,icono
+Auditoría Cloud,Revisión de costos en la nube,1500000,3,si,☁️
+,Sin nombre,100000,1,0,🔧
+Soporte Premium,Atención 24/7,abc,2,0,🔧
+Desarrollo Web,Ya está en el catálogo de ejemplo,100000,1,0,💻
+Capacitación,Cursos para equipos,-5,1,0,📚
+Capacitación,Cursos para equipos,800000,10,no,📚
+Capacitación,Otra vez el mismo nombre,900000,1,0,📚
+Migración SAP,Proyecto ERP completo,25000000,0,1,🔄
+'''
+
+
+def schema_version(ruta):
+    conn = sqlite3.connect(ruta)
+    version = conn.execute('PRAGMA schema_version').fetchone()[0]
+    conn.close()
+    return version
+
+
+def test_importar_reporta_cada_linea_y_actualiza_el_resumen(base, admin, resumen_recorriendo):
+    antes = main.resumen_catalogo()
+    respuesta = admin.post('/admin/importar', data=CSV.encode(), content_type='text/csv')
+    assert respuesta.status_code == 200
+    reporte = respuesta.get_json()
+    assert (reporte['filas_leidas'], reporte['aplicadas'], reporte['total_errores']) == (8, 3, 5)
+    errores = {fallo['linea']: fallo['error'] for fallo in reporte['errores']}
+    assert sorted(errores) == [3, 4, 5, 6, 8]
+    assert 'nombre es obligatorio' in errores[3]
+    assert 'precio inválido' in errores[4]
+    assert 'ya existe' in errores[5]
+    assert 'negativo' in errores[6]
+    assert 'repetido' in errores[8]
+
+    resumen = main.resumen_catalogo()
+    assert resumen == resumen_recorriendo()
+    assert resumen['servicios'] == antes['servicios'] + 3
+    assert resumen['en_promocion'] == antes['en_promocion'] + 2
+    assert resumen['precio']['max'] == 25000000
+    assert resumen['tramos_precio'][-1]['servicios'] == 1
+
+    # Las filas nuevas se buscan y quedan en el registro de cambios
+    encontrados = admin.get('/api/servicios/search', query_string={'q': 'capacitacion'}).get_json()
+    assert [s['nombre'] for s in encontrados] == ['Capacitación']
+    conn = sqlite3.connect(base)
+    nuevas = conn.execute("SELECT COUNT(*) FROM servicios_cambios WHERE operacion = 'insert'").fetchone()[0]
+    conn.close()
+    assert nuevas == len(main.SERVICIOS_EJEMPLO) + 3
+
+
+def test_importar_en_bloques_no_toca_el_esquema(base, resumen_recorriendo):
+    filas = [{'nombre': 'Servicio %03d' % i, 'descripcion': 'Importado', 'precio': 400000 * i,
+              'stock': i % 4, 'promocion': i % 3 == 0} for i in range(1, 41)]
+    antes = schema_version(base)
+    reporte = main.importar_servicios(((i, fila, None) for i, fila in enumerate(filas, 2)), bloque=7)
+    assert reporte['aplicadas'] == 40
+    assert schema_version(base) == antes
+    assert main.resumen_catalogo() == resumen_recorriendo()
+
+    # El upsert pasa por los triggers de UPDATE, también sin marca
+    cambios = [dict(fila, precio=fila['precio'] + 50000, stock=9) for fila in filas[:10]]
+    reporte = main.importar_servicios(((i, fila, None) for i, fila in enumerate(cambios, 2)), 'actualizar', bloque=4)
+    assert reporte['aplicadas'] == 10
+    assert schema_version(base) == antes
+    assert main.resumen_catalogo() == resumen_recorriendo()
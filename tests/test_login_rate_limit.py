@@ -0,0 +1,21 @@
+# ARCHIVO: tests/test_login_rate_limit.py
+"""El límite de intentos de login por IP usa la IP del cliente, no la del proxy"""
+import main
+
+
+def intentar(cliente, ip, usuario):
+    return cliente.post('/login', data={'username': usuario, 'password': 'incorrecta'},
+                        headers={'X-Forwarded-For': ip}, environ_base={'REMOTE_ADDR': '10.0.0.1'})
+
+
+def test_cada_cliente_detras_del_proxy_tiene_su_ventana(client, monkeypatch):
+    monkeypatch.setattr(main, 'limitador_ip', main.LimitadorDeslizante('ip', 3, 60))
+    monkeypatch.setattr(main, 'limitador_usuario', main.LimitadorDeslizante('usuario', 100, 60))
+    for n in range(3):
+        assert intentar(client, '203.0.113.7', 'atacante%d' % n).status_code == 200
+    bloqueado = intentar(client, '203.0.113.7', 'atacante3')
+    assert bloqueado.status_code == 429
+    assert 'Retry-After' in bloqueado.headers
+    # Mismo proxy (REMOTE_ADDR), otro cliente: su ventana está intacta
+    assert intentar(client, '198.51.100.20', 'admin').status_code == 200
+    assert main.limitador_ip.claves() == 2
@@ -0,0 +1,31 @@
+# ARCHIVO: tests/test_profiling.py
+"""Capturas de peticiones lentas: solo las que de verdad tardan en el servidor"""
+import os
+
+import pytest
+
+import main
+
+
+def capturas():
+    return sorted(main.listar_nombres_capturas())
+
+
+def test_peticion_rapida_no_guarda_captura(client):
+    for ruta in ('/', '/servicios', '/api/servicios', '/api/servicios/1', '/detalle/1'):
+        assert client.get(ruta).status_code == 200
+    assert capturas() == []
+    assert not os.path.exists(main.PROFILE_DIR)
+
+
+@pytest.mark.parametrize('ruta', ['/api/servicios?stream=1', '/api/servicios?stream=ndjson',
+                                  '/admin/exportar?formato=csv', '/admin/exportar?formato=ndjson'])
+def test_exportaciones_en_streaming_no_cuentan_como_lentas(admin, monkeypatch, ruta):
+    # Con un umbral de 1 µs toda petición normal es lenta
+    monkeypatch.setattr(main, 'SLOW_REQUEST_MS', 0.001)
+    respuesta = admin.get(ruta)
+    assert respuesta.status_code == 200 and respuesta.data
+    assert capturas() == []
+
+    assert admin.get('/api/servicios').status_code == 200
+    assert len(capturas()) == 1
@@ -0,0 +1,28 @@
+# ARCHIVO: tests/test_reservas.py
+"""Reservas concurrentes sobre un mismo servicio: el stock nunca queda negativo.
+
+Usa el mismo estrés que `python -m benchmarks reservas --mode client`,
+con poco stock y muchos más hilos que conexiones en el pool.
+"""
+import main
+from benchmarks import escenarios, reservas
+
+STOCK = 25
+PETICIONES = 400
+CONCURRENCIA = 48
+
+
+def test_reservas_concurrentes_nunca_dejan_stock_negativo(base):
+    servicio_id = reservas.preparar(base, STOCK)
+    conteo, _ = reservas.estresar(escenarios.ClienteFlask(main.app), servicio_id, PETICIONES, CONCURRENCIA)
+    assert reservas.verificar(base, servicio_id, STOCK, conteo) == []
+    assert conteo == {'201': STOCK, '409': PETICIONES - STOCK}
+
+
+def test_reserva_de_servicio_inexistente_o_invalida(client):
+    datos = {'cantidad': 1, 'nombre': 'Ana', 'email': 'ana@ejemplo.com'}
+    assert client.post('/api/servicios/999999/reservas', json=datos).status_code == 404
+    assert client.post('/api/servicios/1/reservas', json=dict(datos, cantidad=0)).status_code == 400
+    respuesta = client.post('/api/servicios/1/reservas', json=dict(datos, cantidad=10 ** 6))
+    assert respuesta.status_code == 409
+    assert respuesta.get_json()['stock_disponible'] == main.SERVICIOS_EJEMPLO[0][3]
@@ -0,0 +1,24 @@
+# ARCHIVO: tests/test_static_export.py
+"""`main.py estatico`: solo las páginas, sin variantes .gz/.br que Hosting serviría sueltas"""
+import os
+
+import main
+
+
+def archivos(carpeta):
+    return {os.path.relpath(os.path.join(raiz, nombre), carpeta)
+            for raiz, _, nombres in os.walk(carpeta) for nombre in nombres}
+
+
+def test_exportacion_estatica_sin_variantes_comprimidas(admin, tmp_path):
+    salida = str(tmp_path / 'dist')
+    reporte = main.exportar_estatico(salida)
+    generados = archivos(salida)
+    assert 'index.html' in generados and 'api/servicios.json' in generados and 'detalle/1.html' in generados
+    assert not [nombre for nombre in generados if nombre.endswith(('.gz', '.br'))]
+    assert reporte['renderizadas'] == len(generados) - 2  # 404.html y el manifiesto
+
+    admin.get('/admin/eliminar/1')
+    reporte = main.exportar_estatico(salida)
+    assert reporte['borradas'] == 1
+    assert 'detalle/1.html' not in archivos(salida)